@@ -0,0 +1,1099 @@
+# run -> python bench.py [benchmark]
+#     -> python bench.py scopes
+#     -> python bench.py reparse
+#     -> python bench.py dump
+#     -> python bench.py memory
+#     -> python bench.py lists
+#     -> python bench.py startup
+#     -> python bench.py parallel
+#     -> python bench.py eval
+#     -> python bench.py vm
+#     -> python bench.py lex
+#     -> python bench.py tokens
+#     -> python bench.py offsets
+#     -> python bench.py mmap
+#     -> python bench.py stream
+#     -> python bench.py lines
+#     -> python bench.py incremental
+#     -> python bench.py cache
+#     -> python bench.py binary
+#     -> python bench.py json
+#     -> python bench.py server
+#     -> python bench.py load
+#     -> python bench.py dense
+#     -> python bench.py codegen
+#     -> python bench.py lean
+
+# Benchmarks del analizador sobre programas generados
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import copy
+import glob
+import io
+import os
+import asyncio
+import json
+import random
+import re
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import ply.yacc
+import rust_ast
+import rust_batch
+import rust_binary
+import rust_cache
+import rust_client
+import rust_codegen
+import rust_dense
+import rust_eval
+import rust_incremental
+import rust_json
+import rust_lean
+import rust_lex
+import rust_parallel
+import rust_scanner
+import rust_stream
+import rust_vm
+import rust_yacc
+
+# -- Generadores de programas -- #
+
+# n bloques: grupos de 10 bloques anidados, uno tras otro (hermanos)
+def gen_blocks(n):
+    out = [ "fn main() {\n" ]
+    depth = 10
+    for g in range(n // depth):
+        for d in range(depth):
+            out.append("{ let v%d_%d = %d;\n" % (g, d, d))
+        out.append("}" * depth + ";\n")
+    out.append("}\n")
+    return "".join(out)
+
+# 2n sentencias dentro de main
+def gen_stmts(n):
+    out = [ "fn main() {\n" ]
+    for i in range(n):
+        out.append("let mut v%d: i32 = %d;\nv%d += %d;\n" % (i, i, i, i))
+    out.append("}\n")
+    return "".join(out)
+
+# Programa como ../tests/loop_if.rs con un ciclo de n iteraciones
+def gen_loop_if(n):
+    return """fn main() {
+    let x = 5;
+    let mut y = %d;
+    let mut n = 0;
+
+    if x > y {
+        return true;
+    } else if x < y {
+        while true {
+            y -= 1;
+            n += 1;
+            if y <= 0 {
+                break;
+            }
+        }
+    };
+    return n;
+}
+""" % n
+
+# Ciclo while con aritmética y un if por iteración
+def gen_while(n):
+    return """fn main() {
+    let mut i = 0;
+    let mut s = 0;
+    while i < %d {
+        s += i %% 7 * 3;
+        if s > 1000 { s -= 1000; };
+        i += 1;
+    };
+    return s;
+}
+""" % n
+
+# loop con break y continue
+def gen_loop(n):
+    return """fn main() {
+    let mut i = 0;
+    let mut odd = 0;
+    loop {
+        i += 1;
+        if i > %d { break; };
+        if i %% 2 == 0 { continue; };
+        odd += 1;
+    };
+    return odd;
+}
+""" % n
+
+# n líneas con muchos identificadores (para medir el costo de sus valores)
+def gen_idents(n):
+    out = [ "fn main() {\n" ]
+    for i in range(n):
+        out.append("let counter_%d = alpha_beta + gamma_delta * epsilon_zeta - eta_theta_%d;\n" % (i, i))
+    out.append("}\n")
+    return "".join(out)
+
+# n funciones de 13 líneas con bloques anidados
+def gen_fns(n):
+    out = [ ]
+    for i in range(n):
+        out.append("""fn func%d() {
+    let mut i = 0;
+    let mut s = %d;
+    while i < 10 {
+        if i %% 2 == 0 {
+            s += i;
+        } else {
+            s -= 1;
+        };
+        i += 1;
+    };
+    s
+}
+""" % (i, i))
+    return "".join(out)
+
+# Funciones anidadas (una recursiva) llamadas en un ciclo
+def gen_nested(n):
+    return """fn main() {
+    fn fib(k) { if k < 2 { k } else { fib(k - 1) + fib(k - 2) } }
+    fn step(k) { fib(k %% 5) + 1 }
+    let mut i = 0;
+    let mut s = 0;
+    while i < %d {
+        s += step(i);
+        i += 1;
+    };
+    return s;
+}
+""" % (n // 10)
+
+# Una función anidada no ve las variables locales de la que la contiene (como en
+# Rust), pero sí a las funciones de su bloque aunque se declaren después: el
+# evaluador y la máquina virtual deben dar el mismo resultado o el mismo error
+scope_programs = (
+    ('captura', """fn main() {
+    let a = 3;
+    fn inner() { a }
+    inner()
+}
+"""),
+    ('hermanas', """fn main() {
+    fn a() { b() }
+    fn b() { 7 }
+    a()
+}
+"""),
+)
+
+loop_programs = (
+    ('loop_if', gen_loop_if),
+    ('while',   gen_while),
+    ('loop',    gen_loop),
+    ('nested',  gen_nested),
+)
+
+# -- Benchmarks -- #
+
+# Tiempo de análisis contra número de bloques (debe crecer linealmente)
+def bench_scopes():
+    print("%10s %10s %14s" % ("bloques", "seg", "us/bloque"))
+    for n in (12500, 25000, 50000, 100000):
+        data = gen_blocks(n)
+        start = time.perf_counter()
+        rust_yacc.parse(data)
+        elapsed = time.perf_counter() - start
+        print("%10d %10.2f %14.1f" % (n, elapsed, elapsed / n * 1e6))
+
+# Programas de ejemplo en ../tests (sin los que tienen errores)
+def test_files():
+    here = os.path.dirname(os.path.abspath(__file__))
+    return sorted(glob.glob(os.path.join(here, "..", "tests", "*.rs")))
+
+def read_tests():
+    data = [ ]
+    for name in test_files():
+        with open(name, 'r') as file:
+            data.append(file.read())
+    return data
+
+# Memoria después de muchos análisis con la misma sesión (debe mantenerse plana)
+def bench_reparse():
+    data = read_tests()
+    session = rust_yacc.RustParser(verbose=False)
+    tracemalloc.start()
+    start = time.perf_counter()
+    print("%10s %14s" % ("análisis", "KiB en uso"))
+    for i in range(1, 10001):
+        session.parse(data[i % len(data)])
+        if i % 1000 == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print("%10d %14.1f" % (i, current / 1024))
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    print("%.1f análisis/seg" % (10000 / elapsed))
+
+# Escritura del AST en archivo (tiempo lineal en el tamaño de la salida)
+def bench_dump():
+    print("%10s %10s %10s %10s" % ("sentencias", "MB", "seg", "MB/seg"))
+    for n in (500, 1000, 2000, 4000):
+        ast = rust_yacc.parse(gen_stmts(n))
+        with tempfile.TemporaryFile('w+') as out:
+            start = time.perf_counter()
+            ast.write(out)
+            elapsed = time.perf_counter() - start
+            size = out.tell() / 1e6
+        print("%10d %10.1f %10.2f %10.1f" % (2 * n, size, elapsed, size / elapsed))
+
+# Memoria pico (tracemalloc) al analizar un corpus grande
+def bench_memory():
+    data = gen_stmts(20000)
+    session = rust_yacc.RustParser(verbose=False)
+    tracemalloc.start()
+    start = time.perf_counter()
+    ast = session.parse(data)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nodes = len(ast.arena)
+    print("%d nodos en %.2f seg" % (nodes, elapsed))
+    print("AST: %.1f MB (%.1f bytes/nodo), pico: %.1f MB" % (current / 1e6, current / nodes, peak / 1e6))
+
+# Tiempo, memoria pico y profundidad máxima de la pila del analizador
+# para un archivo con muchas sentencias seguidas
+def bench_lists():
+    print("%12s %10s %10s %10s" % ("sentencias", "seg", "pico MB", "pila máx"))
+    for n in (10000, 100000, 1000000):
+        data = gen_stmts(n // 2)
+        session = rust_yacc.RustParser(verbose=False)
+        lexer, parser = session.lexer, session.parser
+        depth = [ 0 ]
+        # medir la pila en cada token
+        def token():
+            if len(parser.statestack) > depth[0]:
+                depth[0] = len(parser.statestack)
+            return lexer.token()
+        session.reset()
+        parser.arena = rust_ast.Arena()
+        lexer.input(data)
+        tracemalloc.start()
+        start = time.perf_counter()
+        parser.parse(lexer=lexer, tokenfunc=token)
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("%12d %10.2f %10.1f %10d" % (n, elapsed, peak / 1e6, depth[0]))
+
+# Tiempo de arranque de pyrust.py con la caché de tablas vacía (frío) y llena (caliente)
+def bench_startup():
+    here = os.path.dirname(os.path.abspath(__file__))
+    cmd = [ sys.executable, os.path.join(here, "pyrust.py"), test_files()[0] ]
+    runs = 5
+
+    def run(tables, cwd):
+        env = dict(os.environ, RUST_TABLES=tables, PYTHONPATH=os.path.dirname(here))
+        env.pop('PYTHONDONTWRITEBYTECODE', None) # medir con .pyc, como en uso normal
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold = 0
+        for i in range(runs):
+            cold += run(os.path.join(tmp, "cold%d" % i), tmp)
+        warm_dir = os.path.join(tmp, "warm")
+        run(warm_dir, tmp) # llenar la caché
+        warm = 0
+        for i in range(runs):
+            warm += run(warm_dir, tmp)
+    print("frío:     %.1f ms" % (cold / runs * 1000))
+    print("caliente: %.1f ms" % (warm / runs * 1000))
+
+# Archivos por segundo con 1..N procesos sobre un corpus sintético
+def bench_parallel():
+    files = 400
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(files):
+            with open(os.path.join(tmp, "f%d.rs" % i), 'w') as out:
+                out.write(gen_stmts(100))
+        corpus = list(rust_batch.collect([ tmp ]))
+
+        def measure(results):
+            start = time.perf_counter()
+            for result in results:
+                assert result.ok, result.errors
+            return files / (time.perf_counter() - start)
+
+        base = measure(rust_batch.results(corpus))
+        print("%8s %14s %10s" % ("procesos", "archivos/seg", "aceleración"))
+        print("%8s %14.1f %10.2f" % ("serial", base, 1.0))
+        jobs = 1
+        while True:
+            rate = measure(rust_parallel.results(corpus, None, jobs, chunksize=4))
+            print("%8d %14.1f %10.2f" % (jobs, rate, rate / base))
+            if jobs >= rust_parallel.cpu_count():
+                break
+            jobs = min(jobs * 2, rust_parallel.cpu_count())
+
+# Iteraciones por segundo del evaluador sobre programas con ciclos
+def bench_eval():
+    n = 100000
+    print("%10s %12s %10s %14s" % ("programa", "resultado", "seg", "iter/seg"))
+    for name, gen in loop_programs:
+        ast = rust_yacc.parse(gen(n))
+        start = time.perf_counter()
+        value = rust_eval.run(ast)
+        elapsed = time.perf_counter() - start
+        print("%10s %12s %10.2f %14.0f" % (name, rust_eval.display(value), elapsed, n / elapsed))
+
+# Evaluador contra máquina virtual (compilación incluida) en los mismos programas;
+# los resultados deben ser iguales (si no, termina con código 1)
+def bench_vm():
+    n = 100000
+    print("%10s %12s %10s %10s %10s" % ("programa", "resultado", "eval seg", "vm seg", "aceleración"))
+    same = True
+    for name, gen in loop_programs:
+        ast = rust_yacc.parse(gen(n))
+        start = time.perf_counter()
+        expected = rust_eval.run(ast)
+        eval_time = time.perf_counter() - start
+        start = time.perf_counter()
+        value = rust_vm.run(ast)
+        vm_time = time.perf_counter() - start
+        if value != expected:
+            print("%10s resultado distinto: %r (eval) != %r (vm)" % (name, expected, value))
+            same = False
+            continue
+        print("%10s %12s %10.2f %10.2f %9.1fx" % (name, rust_eval.display(value), eval_time, vm_time, eval_time / vm_time))
+    for name, source in scope_programs:
+        ast = rust_yacc.parse(source)
+        results = [ ]
+        for run in (rust_eval.run, rust_vm.run):
+            try:
+                results.append(rust_eval.display(run(ast)))
+            except rust_eval.RustError as e:
+                results.append("error: %s" % e)
+        if results[0] != results[1]:
+            print("%10s resultado distinto: %s (eval) != %s (vm)" % (name, results[0], results[1]))
+            same = False
+            continue
+        print("%10s %s" % (name, results[0]))
+    if not same:
+        exit(1)
+
+# Tokens por segundo del lexer de ply contra el de rust_scanner en una entrada de
+# varios MB; antes se revisa que la secuencia de tokens sea la misma (si no, termina
+# con código 1)
+def bench_lex():
+    data = gen_stmts(50000) * 2
+    a = rust_lex.lexer.clone()
+    b = rust_scanner.lexer.clone()
+    a.input(data)
+    b.input(data)
+    while True:
+        ta, tb = a.token(), b.token()
+        if ta is None or tb is None:
+            same = ta is tb
+            break
+        if (ta.type, ta.value, ta.lineno, ta.lexpos) != (tb.type, tb.value, tb.lineno, tb.lexpos):
+            same = False
+            break
+    print("entrada: %.1f MB, tokens iguales: %s" % (len(data) / 1e6, "sí" if same else "NO"))
+    rates = [ ]
+    for name, lexer in (("ply.lex", rust_lex.lexer.clone()), ("rust_scanner", rust_scanner.lexer.clone())):
+        lexer.input(data)
+        token = lexer.token
+        count = 0
+        start = time.perf_counter()
+        while token() is not None:
+            count += 1
+        elapsed = time.perf_counter() - start
+        rates.append(count / elapsed)
+        print("%14s %10d tokens %8.2f seg %12.0f tokens/seg" % (name, count, elapsed, count / elapsed))
+    print("aceleración: %.1fx" % (rates[1] / rates[0]))
+    if not same:
+        exit(1)
+
+# Tokenización por columnas (rust_scanner.tokenize) contra una lista de objetos
+# LexToken: tokens por segundo y bytes por token (medidos con tracemalloc en una
+# entrada más chica)
+def bench_tokens():
+    def objects(data):
+        lexer = rust_scanner.lexer.clone()
+        lexer.input(data)
+        return list(iter(lexer.token, None))
+
+    # las columnas de la entrada como bytes y como mmap deben dar los mismos tokens
+    # (si no, termina con código 1)
+    same = True
+    for path in test_files():
+        with open(path, 'rb') as file:
+            data = file.read()
+        text = list(rust_scanner.tokenize(data.decode()))
+        same = (same and text == list(rust_scanner.tokenize(data))
+                and text == list(rust_scanner.tokenize(rust_scanner.map_file(path))))
+    print("../tests iguales (bytes, mmap): %s" % ("sí" if same else "NO"))
+
+    data = gen_stmts(50000) * 2
+    small = gen_stmts(5000)
+    for name, function in (("LexToken", objects), ("columnas", rust_scanner.tokenize)):
+        start = time.perf_counter()
+        count = len(function(data))
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        result = function(small)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print("%10s %10d tokens %8.2f seg %12.0f tokens/seg %6.1f bytes/token" % (name, count, elapsed, count / elapsed, size / len(result)))
+        del result
+    if not same:
+        exit(1)
+
+# Lexer con valores (LexToken) contra tokens con posiciones (OffsetToken) en una
+# entrada con muchos identificadores: tiempo y asignaciones de memoria por token
+def bench_offsets():
+    data = gen_idents(100000)
+    small = gen_idents(5000)
+    lexers = (("ply.lex", rust_lex.lexer.clone()),
+              ("valores", rust_scanner.Scanner()),
+              ("offsets", rust_scanner.Scanner(offsets=True)))
+    print("%10s %10s %8s %12s %14s" % ("lexer", "tokens", "seg", "tokens/seg", "asignaciones"))
+    for name, lexer in lexers:
+        lexer.input(data)
+        token = lexer.token
+        count = 0
+        start = time.perf_counter()
+        while token() is not None:
+            count += 1
+        elapsed = time.perf_counter() - start
+        # bloques de memoria vivos por token al guardar todos los tokens
+        lexer.input(small)
+        tracemalloc.start()
+        tokens = list(iter(lexer.token, None))
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        tracemalloc.stop()
+        print("%10s %10d %8.2f %12.0f %14.2f" % (name, count, elapsed, count / elapsed, blocks / len(tokens)))
+        del tokens
+
+# Memoria residente máxima al analizar léxicamente un archivo grande leído completo
+# como str contra el mismo archivo en un mmap (modo de bytes), cada uno en su proceso
+def bench_mmap():
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = """
+import resource, sys, time
+sys.path.insert(0, %r)
+import rust_scanner
+mode, path = sys.argv[1:]
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if mode == 'str':
+    with open(path) as file:
+        data = file.read()
+elif mode == 'mmap':
+    data = rust_scanner.map_file(path)
+else:
+    data = ''
+lexer = rust_scanner.Scanner()
+lexer.input(data)
+token = lexer.token
+count = 0
+while token() is not None:
+    count += 1
+print(count, time.perf_counter() - start, base, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+""" % here
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grande.rs")
+        with open(path, 'w') as out:
+            block = gen_stmts(10000)
+            for i in range(60):
+                out.write(block)
+        size = os.path.getsize(path)
+        print("archivo: %.1f MB" % (size / 1e6))
+        print("%6s %10s %8s %16s" % ("modo", "tokens", "seg", "RSS máx. (MB)"))
+        for mode in ('str', 'mmap'):
+            result = subprocess.run([ sys.executable, "-c", script, mode, path ], capture_output=True, text=True, check=True)
+            count, elapsed, base, peak = result.stdout.split()
+            print("%6s %10s %8.2f %16.1f (+%.1f)" % (mode, count, float(elapsed), int(peak) / 1024, (int(peak) - int(base)) / 1024))
+
+# Análisis en flujo (rust_stream) con lecturas de 1 byte a 1 MB: el AST y los errores
+# deben ser iguales a los del análisis del texto completo (si no, termina con código 1)
+def bench_stream():
+    paths = test_files() + sorted(glob.glob(os.path.join(os.path.dirname(test_files()[0]), "errors", "*.rs")))
+    programs = [ ]
+    for path in paths:
+        with open(path, 'r') as file:
+            programs.append((os.path.basename(path), file.read()))
+    comments = "/* comentario\n de varias * líneas **/\n"
+    programs.append(("generado", comments + gen_stmts(300) + comments + gen_while(10)))
+    session = rust_yacc.RustParser(verbose=False)
+
+    def result(ast):
+        out = io.StringIO()
+        if ast is not None:
+            ast.write(out)
+        return out.getvalue(), list(session.errors)
+
+    expected = [ result(session.parse(data)) for name, data in programs ]
+    print("%10s %10s %10s %8s" % ("lectura", "archivos", "iguales", "seg"))
+    failed = False
+    for size in (1, 2, 3, 7, 64, 1024, 1 << 16, 1 << 20):
+        same = 0
+        start = time.perf_counter()
+        for (name, data), reference in zip(programs, expected):
+            if result(rust_stream.parse(session, io.StringIO(data), size)) == reference:
+                same += 1
+            else:
+                print("diferente: %s con lecturas de %d" % (name, size))
+                failed = True
+        print("%10d %10d %10d %8.2f" % (size, len(programs), same, time.perf_counter() - start))
+    if failed:
+        exit(1)
+
+# Lexer que cuenta líneas al analizar (Scanner) contra el que las calcula al pedirlas
+# (LineScanner), en entradas con líneas cortas y largas (mejor de 3); además, el costo
+# de armar el índice de líneas y de pedir la línea de cada token
+def bench_lines():
+    inputs = (("stmts", gen_stmts(100000)), ("blocks", gen_blocks(200000)), ("idents", gen_idents(50000)))
+    print("%8s %8s %10s %10s %10s %9s %10s %12s" % ("entrada", "MB", "tokens", "Scanner", "LineScanner",
+                                                  "aceler.", "índice", "línea/token"))
+    for name, data in inputs:
+        times = [ ]
+        for lexer in (rust_scanner.Scanner(), rust_scanner.LineScanner()):
+            best = None
+            for i in range(3):
+                lexer.lineno = 1
+                lexer.input(data)
+                token = lexer.token
+                start = time.perf_counter()
+                while token() is not None:
+                    pass
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            times.append(best)
+        lexer.lineno = 1
+        lexer.input(data)
+        tokens = list(iter(lexer.token, None))
+        expected = rust_scanner.token_list(rust_scanner.Scanner(), data)
+        if [ (t.type, t.value, t.lineno, t.lexpos) for t in tokens ] != expected:
+            print("%s: las líneas son DIFERENTES" % name)
+        lines = rust_scanner.LineIndex(data)
+        start = time.perf_counter()
+        lines.build()
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        for t in tokens:
+            t.lineno
+        lookup = (time.perf_counter() - start) / len(tokens)
+        print("%8s %8.1f %10d %10.2f %10.2f %8.2fx %9.3fs %10.2fus" % (name, len(data) / 1e6, len(tokens), times[0],
+              times[1], times[0] / times[1], build, lookup * 1e6))
+
+# Ediciones de un carácter (un dígito de un número o una letra en un identificador)
+# en archivos de 50k líneas: tiempo por edición del análisis incremental contra el
+# análisis completo; al final el AST debe ser igual al de analizar el texto completo
+# (si no, termina con código 1)
+def bench_incremental():
+    session = rust_yacc.RustParser(verbose=False)
+    inputs = (("funciones", gen_fns(50000 // 13)), ("main", gen_stmts(25000)))
+    print("%10s %8s %10s %10s %10s %10s %8s %8s" % ("entrada", "líneas", "completo", "p50 ms", "p99 ms",
+                                                   "máx ms", "completos", "iguales"))
+    same = True
+    for name, data in inputs:
+        start = time.perf_counter()
+        doc = rust_incremental.Document(data, session)
+        full = time.perf_counter() - start
+        rnd = random.Random(0)
+        spots = [ m.start() for m in re.finditer(r'(?<![\w])[0-9]|\bs\b|\bi\b', data) ]
+        times = [ ]
+        full_parses = doc.full_parses
+        for n in range(400):
+            pos = rnd.choice(spots)
+            if data[pos].isdigit():
+                edit = (pos, pos + 1, str(rnd.randint(1, 9)))
+            else:
+                edit = (pos + 1, pos + 1, 'x')
+            start = time.perf_counter()
+            doc.edit(*edit)
+            times.append(time.perf_counter() - start)
+            # deshacer, para que el texto siga igual y las posiciones sigan valiendo
+            start = time.perf_counter()
+            doc.edit(edit[0], edit[0] + len(edit[2]), data[edit[0]:edit[1]])
+            times.append(time.perf_counter() - start)
+        doc.edit(0, 0, "fn nueva() { 1 }\n")
+        out = io.StringIO()
+        doc.ast.write(out)
+        expected = io.StringIO()
+        session.parse(doc.text).write(expected)
+        equal = out.getvalue() == expected.getvalue()
+        same = same and equal
+        times.sort()
+        print("%10s %8d %9.2fs %10.2f %10.2f %10.2f %8d %8s" % (name, data.count("\n"), full,
+              times[len(times) // 2] * 1e3, times[len(times) * 99 // 100] * 1e3, times[-1] * 1e3,
+              doc.full_parses - full_parses, "sí" if equal else "NO"))
+    if not same:
+        exit(1)
+
+# Modo por lotes sin caché, con la caché vacía (fría) y llena (caliente) sobre un
+# corpus sintético; los AST deben ser iguales (si no, termina con código 1). Al final,
+# la misma corrida con una caché de la mitad del tamaño necesario (con desalojo LRU;
+# un recorrido en el mismo orden casi no tiene aciertos).
+def bench_cache():
+    files = 400
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        os.makedirs(src)
+        for i in range(files):
+            with open(os.path.join(src, "f%d.rs" % i), 'w') as out:
+                out.write("// archivo %d\n" % i)
+                out.write(gen_stmts(100 + i % 50) if i % 2 else gen_fns(10 + i % 20))
+        corpus = list(rust_batch.collect([ src ]))
+
+        def run(name, cache=None):
+            outdir = os.path.join(tmp, name)
+            start = time.perf_counter()
+            rust_batch.run(corpus, outdir, io.StringIO(), cache=cache)
+            elapsed = time.perf_counter() - start
+            print("%14s %10.2f %14.1f" % (name, elapsed, files / elapsed))
+            if cache is not None:
+                print("%14s %s" % ("", cache.stats()))
+            return outdir
+
+        def same(a, b):
+            for path, name in corpus:
+                with open(rust_batch.output_path(a, name)) as x, open(rust_batch.output_path(b, name)) as y:
+                    if x.read() != y.read():
+                        return False
+            return True
+
+        print("%14s %10s %14s" % ("corrida", "seg", "archivos/seg"))
+        base = run("sin caché")
+        cache = rust_cache.Cache(os.path.join(tmp, "cache"))
+        run("fría", cache)
+        cache = rust_cache.Cache(cache.directory)
+        warm = run("caliente", cache)
+        equal = same(base, warm)
+        print("AST iguales: %s" % ("sí" if equal else "NO"))
+        small = rust_cache.Cache(os.path.join(tmp, "small"), cache.size // 2)
+        run("límite 1/2", small)
+    if not equal:
+        exit(1)
+
+# Formato binario: tamaño, escritura y carga contra volver a analizar; el árbol
+# cargado debe escribirse igual que el original (también con los programas de ../tests;
+# si no, termina con código 1)
+def bench_binary():
+    same = True
+    for data in read_tests():
+        ast = rust_yacc.parse(data)
+        if ast is not None:
+            same = same and str(rust_binary.loads(rust_binary.dumps(ast))) == str(ast)
+    print("../tests iguales: %s" % ("sí" if same else "NO"))
+    print("%8s %8s %9s %9s %9s %9s %9s %8s %7s" % ("programa", "nodos", "MB texto", "MB bin",
+          "análisis", "escritura", "carga", "veces", "iguales"))
+    for name, data in (("stmts", gen_stmts(25000)), ("fns", gen_fns(3800))):
+        start = time.perf_counter()
+        ast = rust_yacc.parse(data)
+        parse = time.perf_counter() - start
+        start = time.perf_counter()
+        binary = rust_binary.dumps(ast)
+        dump = time.perf_counter() - start
+        load = float('inf')
+        for i in range(3):
+            start = time.perf_counter()
+            loaded = rust_binary.loads(binary)
+            load = min(load, time.perf_counter() - start)
+        text = str(ast)
+        equal = str(loaded) == text
+        same = same and equal
+        print("%8s %8d %9.1f %9.1f %8.2fs %8.2fs %8.3fs %7.1fx %7s" % (name, len(ast.arena),
+              len(text.encode('utf-8')) / 1e6, len(binary) / 1e6, parse, dump, load, parse / load,
+              "sí" if equal else "NO"))
+    if not same:
+        exit(1)
+
+# Salida JSON en flujo contra analizar todo y escribir el AST al final: tiempo hasta
+# la primera sentencia escrita, tiempo total y memoria pico (tracemalloc)
+def bench_json():
+    class Output:
+        def __init__(self):
+            self.first = None
+            self.size = 0
+        def write(self, text):
+            if self.first is None:
+                self.first = time.perf_counter()
+            self.size += len(text)
+    session = rust_yacc.RustParser(verbose=False)
+    print("%10s %8s %12s %10s %12s" % ("salida", "nodos", "primera (s)", "total (s)", "pico (MiB)"))
+    for n in (5000, 20000):
+        data = gen_fns(n // 10)
+        for name in ("texto", "jsonl"):
+            out = Output()
+            tracemalloc.start()
+            start = time.perf_counter()
+            if name == "texto":
+                ast = session.parse(data)
+                ast.write(out)
+                nodes = len(ast.arena)
+            else:
+                rust_json.stream(session, data, out)
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("%10s %8d %12.3f %10.2f %12.1f" % (name, nodes, out.first - start, elapsed, peak / 2**20))
+
+# Latencia por archivo pequeño: pyrust.py en un proceso nuevo contra el servidor
+# persistente (rust_server.py), con el cliente en un proceso nuevo o con una conexión
+# abierta (sólo el viaje por el socket y el análisis)
+def bench_server():
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(here, "..", "tests", "loop_if.rs")
+
+    def command(args, runs=10):
+        times = [ ]
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(here))
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(runs):
+                start = time.perf_counter()
+                subprocess.run([ sys.executable ] + args, cwd=tmp, env=env, check=True, stdout=subprocess.DEVNULL)
+                times.append(time.perf_counter() - start)
+        return times
+
+    def row(name, times):
+        times.sort()
+        print("%24s %10.2f %10.2f" % (name, times[len(times) // 2] * 1e3, times[len(times) * 99 // 100] * 1e3))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sock = os.path.join(tmp, "server.sock")
+        client = rust_client.spawn(sock)
+        try:
+            print("%24s %10s %10s" % ("", "p50 (ms)", "p99 (ms)"))
+            row("pyrust.py", command([ os.path.join(here, "pyrust.py"), path ]))
+            row("rust_client.py", command([ os.path.join(here, "rust_client.py"), "--socket", sock, path ]))
+            times = [ ]
+            for i in range(1000):
+                start = time.perf_counter()
+                client.request(**rust_client.file_request('check', path))
+                times.append(time.perf_counter() - start)
+            row("conexión abierta (check)", times)
+        finally:
+            client.request(op='shutdown')
+            client.close()
+
+# Prueba de carga de los servidores (rust_server.py y rust_async.py): N clientes a la
+# vez, cada uno con su conexión y una petición tras otra (check y parse que escribe el
+# AST), sobre los programas de ../tests y uno generado; latencia p50/p99 y peticiones
+# por segundo
+def bench_load():
+    here = os.path.dirname(os.path.abspath(__file__))
+    requests = 240
+
+    async def client(sock, jobs, times):
+        reader, writer = await asyncio.open_unix_connection(sock, limit=1 << 26)
+        for request in jobs:
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode('utf-8') + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            times.append(time.perf_counter() - start)
+            if "error" in response:
+                raise RuntimeError(response["error"])
+        writer.close()
+
+    async def load(sock, clients, work):
+        times = [ ]
+        per = [ work[i::clients] for i in range(clients) ]
+        start = time.perf_counter()
+        await asyncio.gather(*(client(sock, jobs, times) for jobs in per))
+        return time.perf_counter() - start, sorted(times)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        big = os.path.join(tmp, "fns.rs")
+        with open(big, 'w') as out:
+            out.write(gen_fns(40))
+        paths = test_files() + [ big ]
+        work = [ ]
+        for i in range(requests):
+            request = { "op": "check" if i % 2 else "parse", "path": paths[i % len(paths)] }
+            if request["op"] == "parse":
+                request["output"] = os.path.join(tmp, "out%d.txt" % (i % 16))
+            work.append(request)
+
+        print("%12s %8s %10s %10s %10s" % ("servidor", "clientes", "pet/seg", "p50 (ms)", "p99 (ms)"))
+        for name, args in (("rust_server", [ ]), ("rust_async", [ "-j", "0" ])):
+            sock = os.path.join(tmp, name + ".sock")
+            process = subprocess.Popen([ sys.executable, os.path.join(here, name + ".py"), "--socket", sock ] + args,
+                                       cwd=here, stdout=subprocess.DEVNULL)
+            try:
+                # esperar a que el servidor acepte conexiones
+                while True:
+                    try:
+                        rust_client.Client(sock).close()
+                        break
+                    except rust_client.ServerError:
+                        time.sleep(0.05)
+                for clients in (1, 2, 4, 8, 16, 32):
+                    elapsed, times = asyncio.run(load(sock, clients, work))
+                    print("%12s %8d %10.1f %10.2f %10.2f" % (name, clients, len(times) / elapsed,
+                          times[len(times) // 2] * 1e3, times[len(times) * 99 // 100] * 1e3))
+            finally:
+                process.terminate()
+                process.wait()
+
+# Analizador con tablas de enteros (rust_dense) contra el LRParser de ply: igualdad en
+# ../tests (AST, errores y alcances), tamaño de las tablas y microsegundos por token,
+# con las acciones de la gramática y sólo con el lexer y las tablas (acciones vacías).
+# Si ../tests no da lo mismo, termina con código 1.
+def bench_dense():
+    a = rust_yacc.RustParser(verbose=False)
+    b = rust_yacc.RustParser(verbose=False, dense=True)
+    same = True
+    for path in test_files():
+        with open(path, 'r') as file:
+            data = file.read()
+        # el denso también con la entrada como bytes y como mmap (tablas de bytes)
+        results = [ ]
+        for session, source in ((a, data), (b, data), (b, data.encode()), (b, rust_scanner.map_file(path))):
+            session.keep_scopes = True
+            ast = session.parse(source)
+            results.append((None if ast is None else str(ast), session.errors, str(session.symbols)))
+        same = same and all(result == results[0] for result in results)
+    print("../tests iguales: %s" % ("sí" if same else "NO"))
+    tables = rust_yacc.get_dense_tables()
+    print("tablas: %d estados x %d columnas, %.1f KB en arreglos" % (tables.nstates, tables.width,
+          tables.nbytes / 1e3))
+
+    def best(session, data):
+        result = float('inf')
+        for i in range(3):
+            start = time.perf_counter()
+            session.parse(data)
+            result = min(result, time.perf_counter() - start)
+        return result
+
+    # sesiones con acciones vacías: sólo lexer y tablas
+    def noop(p):
+        pass
+    c = rust_yacc.RustParser(verbose=False)
+    c.productions = c.parser.productions = [ copy.copy(prod) for prod in c.productions ]
+    for prod in c.productions:
+        prod.callable = noop
+    d = rust_yacc.RustParser(verbose=False, dense=True)
+    d.parser.lean = [ lambda *values: None ] * len(d.parser.lean)
+
+    print("%8s %9s %22s %22s" % ("", "", "us/token (acciones)", "us/token (lexer y tablas)"))
+    print("%8s %9s %7s %7s %6s %7s %7s %6s" % ("programa", "tokens", "ply", "dense", "veces",
+          "ply", "dense", "veces"))
+    for name, data in (("stmts", gen_stmts(25000)), ("fns", gen_fns(3800))):
+        lexer = rust_scanner.lexer.clone()
+        lexer.input(data)
+        count = 0
+        while lexer.token() is not None:
+            count += 1
+        t = [ best(session, data) / count * 1e6 for session in (a, b, c, d) ]
+        print("%8s %9d %7.2f %7.2f %5.2fx %7.2f %7.2f %5.2fx" % (name, count, t[0], t[1], t[0] / t[1],
+              t[2], t[3], t[2] / t[3]))
+    if not same:
+        exit(1)
+
+# Analizador generado (rust_codegen) contra ply y rust_dense: igualdad en ../tests y
+# ../tests/errors, tiempo de generación y microsegundos por token, con las acciones de
+# la gramática y sólo con el lexer y el analizador (acciones vacías). Si algún archivo
+# no da lo mismo, termina con código 1.
+def bench_codegen():
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = test_files() + sorted(glob.glob(os.path.join(here, "..", "tests", "errors", "*.rs")))
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        failed = rust_codegen.check(paths)
+    finally:
+        sys.stdout = stdout
+    print("../tests iguales: %s (%d archivos)" % ("sí" if not failed else "NO", len(paths)))
+    start = time.perf_counter()
+    text = rust_codegen.generate()
+    print("generación: %.2f seg, %d líneas" % (time.perf_counter() - start, text.count("\n")))
+
+    def best(session, data):
+        result = float('inf')
+        for i in range(3):
+            start = time.perf_counter()
+            session.parse(data)
+            result = min(result, time.perf_counter() - start)
+        return result
+
+    # sesiones con acciones vacías
+    def noop(p):
+        pass
+    empty = type(sys)('empty') # módulo con las acciones vacías
+    for name in dir(rust_yacc):
+        if name.startswith('p_'):
+            setattr(empty, name, noop)
+    a = rust_yacc.RustParser(verbose=False)
+    a.productions = a.parser.productions = [ copy.copy(prod) for prod in a.productions ]
+    for prod in a.productions:
+        prod.callable = noop
+    b = rust_yacc.RustParser(verbose=False, dense=True)
+    b.parser.lean = [ lambda *values: None ] * len(b.parser.lean)
+    c = rust_yacc.RustParser(verbose=False, generated=True)
+    c.parser = rust_codegen.load().Parser(empty, c.error)
+    empties = (a, b, c)
+    sessions = tuple(rust_yacc.RustParser(verbose=False, **kind)
+                     for kind in ({ }, { 'dense': True }, { 'generated': True }))
+
+    print("%8s %9s %26s %26s" % ("", "", "us/token (acciones)", "us/token (lexer y análisis)"))
+    print("%8s %9s %6s %6s %6s %6s %6s %6s %6s %6s" % ("programa", "tokens", "ply", "dense", "gen",
+          "veces", "ply", "dense", "gen", "veces"))
+    for name, data in (("stmts", gen_stmts(25000)), ("fns", gen_fns(3800))):
+        lexer = rust_scanner.lexer.clone()
+        lexer.input(data)
+        count = 0
+        while lexer.token() is not None:
+            count += 1
+        t = [ best(session, data) / count * 1e6 for session in sessions + empties ]
+        print("%8s %9d %6.2f %6.2f %6.2f %5.2fx %6.2f %6.2f %6.2f %5.2fx" % (name, count,
+              t[0], t[1], t[2], t[0] / t[2], t[3], t[4], t[5], t[3] / t[5]))
+    if failed:
+        exit(1)
+
+# Objetos que crea cada reducción: LRParser de ply (un YaccSymbol y una lista con los
+# símbolos de la regla por reducción) contra rust_dense con el protocolo ligero de
+# rust_lean (acciones posicionales, pila de valores). Se cuentan por token las
+# reducciones, los YaccSymbol y objetos 'p' creados (clases que cuentan sus instancias)
+# y las listas temporales de cada camino de reducción; los nodos del AST son los mismos
+# en los dos.
+def bench_lean():
+    symbols = [ 0 ]
+    productions = [ 0 ]
+
+    class CountedSymbol(ply.yacc.YaccSymbol):
+        def __init__(self):
+            symbols[0] += 1
+
+    class CountedProduction(ply.yacc.YaccProduction):
+        def __init__(self, *args):
+            productions[0] += 1
+            super().__init__(*args)
+
+    class CountedLean(rust_lean.Production):
+        __slots__ = ( )
+        def __init__(self, *args):
+            productions[0] += 1
+            super().__init__(*args)
+
+    def counted(func, counts, rule):
+        def count(*args):
+            counts[rule] += 1
+            return func(*args)
+        return count
+
+    def count(name, data, dense):
+        session = rust_yacc.RustParser(verbose=False, dense=dense)
+        parser = session.parser
+        calls = [ 0 ] * len(rust_yacc.parser.productions)
+        if dense:
+            parser.lean = [ f and counted(f, calls, rule) for rule, f in enumerate(parser.lean) ]
+            parser.callables = [ f and counted(f, calls, rule) for rule, f in enumerate(parser.callables) ]
+        else:
+            session.productions = parser.productions = [ copy.copy(prod) for prod in session.productions ]
+            for rule, prod in enumerate(parser.productions):
+                if prod.callable is not None:
+                    prod.callable = counted(prod.callable, calls, rule)
+        symbols[0] = productions[0] = 0
+        saved = ply.yacc.YaccSymbol, ply.yacc.YaccProduction, rust_dense.YaccSymbol, rust_dense.Production
+        ply.yacc.YaccSymbol, ply.yacc.YaccProduction = CountedSymbol, CountedProduction
+        rust_dense.YaccSymbol, rust_dense.Production = CountedSymbol, CountedLean
+        try:
+            session.parse(data)
+        finally:
+            ply.yacc.YaccSymbol, ply.yacc.YaccProduction, rust_dense.YaccSymbol, rust_dense.Production = saved
+        lens = rust_yacc.get_dense_tables().lens
+        reductions = sum(calls)
+        units = sum(c for rule, c in enumerate(calls) if lens[rule] == 1)
+        if dense:
+            # posicionales con más de 4 símbolos: la rebanada de la pila y la tupla de argumentos
+            lists = sum(2 * c for rule, c in enumerate(calls) if lens[rule] > 4 and parser.lean[rule])
+        else:
+            lists = reductions # targ (o [sym] en las reglas vacías)
+        return reductions, units, symbols[0], productions[0], lists
+
+    print("%8s %6s %7s %9s %9s %9s %9s %9s %8s" % ("programa", "", "tokens", "reduc/tok", "unit/tok",
+          "YaccSym", "p", "listas", "objs/tok"))
+    for name, data in (("stmts", gen_stmts(5000)), ("fns", gen_fns(800))):
+        lexer = rust_scanner.lexer.clone()
+        lexer.input(data)
+        tokens = 0
+        while lexer.token() is not None:
+            tokens += 1
+        for engine, dense in (("ply", False), ("lean", True)):
+            reductions, units, syms, prods, lists = count(name, data, dense)
+            print("%8s %6s %7d %9.2f %9.2f %9.3f %9.4f %9.3f %8.3f" % (name, engine, tokens,
+                  reductions / tokens, units / tokens, syms / tokens, prods / tokens, lists / tokens,
+                  (syms + prods + lists) / tokens))
+
+    # tiempo por reducción sin el AST: acciones que sólo regresan su primer valor
+    def first(*values):
+        return values[0] if values else None
+    def first_p(p):
+        p[0] = p[1] if len(p) > 1 else None
+    a = rust_yacc.RustParser(verbose=False)
+    a.productions = a.parser.productions = [ copy.copy(prod) for prod in a.productions ]
+    for prod in a.productions:
+        prod.callable = first_p
+    b = rust_yacc.RustParser(verbose=False, dense=True)
+    b.parser.lean = [ first ] * len(b.parser.lean)
+    data = gen_stmts(25000)
+    lexer = rust_scanner.lexer.clone()
+    lexer.input(data)
+    tokens = 0
+    while lexer.token() is not None:
+        tokens += 1
+    times = [ ]
+    for session in (a, b):
+        best = float('inf')
+        for i in range(3):
+            start = time.perf_counter()
+            session.parse(data)
+            best = min(best, time.perf_counter() - start)
+        times.append(best / tokens * 1e6)
+    print("acciones mínimas (stmts): ply %.2f us/token, lean %.2f us/token, %.2fx" % (times[0], times[1],
+          times[0] / times[1]))
+
+benchmarks = {
+    'scopes'  : bench_scopes,
+    'reparse' : bench_reparse,
+    'dump'    : bench_dump,
+    'memory'  : bench_memory,
+    'lists'   : bench_lists,
+    'startup' : bench_startup,
+    'parallel': bench_parallel,
+    'eval'    : bench_eval,
+    'vm'      : bench_vm,
+    'lex'     : bench_lex,
+    'tokens'  : bench_tokens,
+    'offsets' : bench_offsets,
+    'mmap'    : bench_mmap,
+    'stream'  : bench_stream,
+    'lines'   : bench_lines,
+    'incremental': bench_incremental,
+    'cache'   : bench_cache,
+    'binary'  : bench_binary,
+    'json'    : bench_json,
+    'server'  : bench_server,
+    'load'    : bench_load,
+    'dense'   : bench_dense,
+    'codegen' : bench_codegen,
+    'lean'    : bench_lean,
+}
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in benchmarks:
+        print("Uso: python bench.py [%s]" % "|".join(benchmarks))
+        exit()
+    benchmarks[sys.argv[1]]()
@@ -1,37 +1,178 @@
 # run -> python pyrust.py [archivo_entrada]
 #     -> python pyrust.py ../tests/data_types.rs
 #     -> python pyrust.py ../tests/errors/error_var.rs
+#     -> python pyrust.py --mmap grande.rs (archivos muy grandes: sin leerlos completos)
+#     -> generador | python pyrust.py - (analiza la entrada estándar conforme llega)
+#     -> python pyrust.py ../tests/data_types.rs --binary AST.rsb (además, AST en formato binario)
+#     -> python pyrust.py ../tests/data_types.rs --jsonl (AST en JSON lines, 'AST.jsonl')
+#     -> generador | python pyrust.py - --jsonl - | consumidor (una sentencia por línea, en flujo)
+#
+# Ejecutar un programa (llama a main e imprime lo que regresa):
+#     -> python pyrust.py run ../tests/simple_main.rs
+#     -> python pyrust.py run ../tests/simple_main.rs --vm (máquina virtual de bytecode)
+#
+# Modo por lotes (varios archivos con el mismo proceso):
+#     -> python pyrust.py -b ../tests ../otro/archivo.rs -o AST
+#     -> find .. -name '*.rs' | python pyrust.py -b -
+#     -> python pyrust.py -b ../tests -j 4 --chunk 16 --unordered (en paralelo)
+#     -> python pyrust.py -b ../tests --cache (sin volver a analizar archivos sin cambios)
 
 # Imprime en un archivo 'AST.txt' un AST
+# (en modo por lotes, un archivo '<nombre>.ast.txt' por entrada dentro de la carpeta de salida)
 
 import sys
 if ".." not in sys.path: sys.path.insert(0,"..")
 
+import argparse
+
+import rust_batch
 import rust_yacc
 
-if len(sys.argv) != 2:
+args = argparse.ArgumentParser(usage="python pyrust.py [archivo de entrada] | run [archivo de entrada] | -b [rutas ...] [-o carpeta] [-j procesos]")
+args.add_argument('paths', nargs='*')
+args.add_argument('-b', '--batch', action='store_true',
+                  help="analizar varios archivos o directorios ('-' lee la lista de stdin)")
+args.add_argument('-o', '--output', default='AST',
+                  help="carpeta de salida de los AST en modo por lotes")
+args.add_argument('-n', '--no-output', action='store_true',
+                  help="en modo por lotes, sólo analizar (no escribir los AST)")
+args.add_argument('-j', '--jobs', type=int, default=1,
+                  help="procesos para el modo por lotes (0: uno por núcleo)")
+args.add_argument('--chunk', type=int, default=8,
+                  help="archivos por tarea enviada a cada proceso")
+args.add_argument('--unordered', action='store_true',
+                  help="reportar los archivos conforme terminan, no en orden de entrada")
+args.add_argument('--mmap', action='store_true',
+                  help="leer el archivo de entrada con mmap (modo de bytes del lexer)")
+args.add_argument('--cache', nargs='?', const='', metavar='carpeta',
+                  help="usar la caché de AST en disco (por omisión en 'cache/', o RUST_CACHE)")
+args.add_argument('--cache-size', type=int, default=256,
+                  help="tamaño máximo de la caché en MB")
+args.add_argument('--binary', metavar='archivo',
+                  help="escribir también el AST en formato binario (rust_binary)")
+args.add_argument('--json', nargs='?', const='AST.json', metavar='archivo',
+                  help="escribir el AST como documento JSON ('-': salida estándar)")
+args.add_argument('--jsonl', nargs='?', const='AST.jsonl', metavar='archivo',
+                  help="escribir el AST en JSON lines, una sentencia de nivel superior por línea")
+args.add_argument('--vm', action='store_true',
+                  help="con run, compilar a bytecode y ejecutar en la máquina virtual")
+opts = args.parse_args()
+# la salida JSON se escribe en flujo y sus nodos se sueltan al escribirse: no queda un
+# AST completo que guardar en formato binario o en la caché
+if (opts.json is not None or opts.jsonl is not None) and (opts.binary or opts.cache is not None):
+    args.error("--json/--jsonl no se pueden combinar con --binary ni con --cache")
+
+cache = None
+if opts.cache is not None:
+    import rust_cache
+    cache = rust_cache.Cache(opts.cache or None, opts.cache_size << 20)
+
+if opts.batch:
+    files = rust_batch.collect(opts.paths or [ '-' ])
+    source = None
+    if opts.jobs != 1:
+        import rust_parallel
+        source = rust_parallel.source(opts.jobs or None, opts.chunk, not opts.unordered)
+    failed = rust_batch.run(files, None if opts.no_output else opts.output, source=source, cache=cache)
+    exit(1 if failed else 0)
+
+if len(opts.paths) == 2 and opts.paths[0] == 'run':
+    import rust_eval
+    engine = rust_eval
+    if opts.vm:
+        import rust_vm
+        engine = rust_vm
+    try:
+        with open(opts.paths[1], 'r') as file:
+            data = file.read()
+    except FileNotFoundError:
+        print("El archivo de entrada no existe")
+        exit()
+
+    result = rust_yacc.parse(data)
+    if result is None:
+        exit(1)
+    try:
+        value = engine.run(result)
+    except rust_eval.RustError as e:
+        print("Error de ejecución: %s" % e)
+        exit(1)
+    if value is not None:
+        print(rust_eval.display(value))
+    exit()
+
+if len(opts.paths) != 1:
     print("Uso: python pyrust.py [archivo de entrada]")
     exit()
 else:
-    inFile = sys.argv[1] # archivo de entrada
+    inFile = opts.paths[0] # archivo de entrada
+
+# Salida en JSON: cada sentencia de nivel superior se escribe al reducirse
+if opts.json is not None or opts.jsonl is not None:
+    import rust_json
+    lines = opts.jsonl is not None
+    target = opts.jsonl if lines else opts.json
+    # con la salida estándar los errores van a stderr, al final
+    session = rust_yacc.RustParser(verbose=target != '-')
+    data = lexer = None
+    try:
+        if inFile == '-':
+            import rust_stream
+            lexer = rust_stream.StreamScanner(sys.stdin)
+        elif opts.mmap:
+            import rust_scanner
+            data = rust_scanner.map_file(inFile)
+        else:
+            with open(inFile, 'r') as file:
+                data = file.read()
+    except FileNotFoundError:
+        print("El archivo de entrada no existe")
+        exit()
+    if target == '-':
+        rust_json.stream(session, data, sys.stdout, lines, lexer, flush=True)
+        for msg in session.errors:
+            print(msg, file=sys.stderr)
+    else:
+        with open(target, 'w') as out:
+            rust_json.stream(session, data, out, lines, lexer)
+        print("AST generado en '%s'" % target)
+    exit(1 if session.errors else 0)
 
 # Leer archivo de entrada
 try:
-    with open(inFile,'r') as file:
-        data = file.read()
+    if inFile == '-':
+        import rust_stream
+        result = rust_stream.parse(rust_yacc.default_parser, sys.stdin, scope=True)
+    elif cache is not None:
+        entry = cache.parse_file(rust_yacc.default_parser, inFile)
+        if entry.cached:
+            for msg in entry.errors:
+                print(msg)
+        result = entry.ast
+        if result is not None:
+            print(entry.scopes)
+    else:
+        if opts.mmap:
+            import rust_scanner
+            data = rust_scanner.map_file(inFile)
+        else:
+            with open(inFile,'r') as file:
+                data = file.read()
 
-    result = rust_yacc.parse(data, 0, True) # generar resultado (AST)
-    
-    file.close()
+        result = rust_yacc.parse(data, 0, True) # generar resultado (AST)
 
     if result != None:
         # Escribir AST generado en archivo 'AST.txt'
-        r = open("AST.txt", 'w+')
-        r.write(str(result))
-        r.close()
+        with open("AST.txt", 'w+') as r:
+            result.write(r)
 
         print("AST generado en 'AST.txt'")
 
+        if opts.binary:
+            import rust_binary
+            rust_binary.write(result, opts.binary)
+            print("AST binario en '%s'" % opts.binary)
+
 except FileNotFoundError:
     print("El archivo de entrada no existe")
-    exit()
\ No newline at end of file
+    exit()
@@ -0,0 +1,185 @@
+import io
+from array import array
+
+# -- Representación compacta del AST -- #
+# Los nodos viven en un Arena: arreglos paralelos (struct-of-arrays) indexados por
+# número de nodo. Node es sólo una vista (arena, índice) sobre esos arreglos, así que
+# un nodo del árbol ocupa ~21 bytes en lugar de un objeto con __dict__ y lista propia.
+
+# Tipos de nodo internados: nombre <-> id pequeño (cabe en un byte)
+type_ids = { }
+type_names = [ ]
+
+def type_id(name):
+    tid = type_ids.get(name)
+    if tid is None:
+        tid = type_ids[name] = len(type_names)
+        type_names.append(name)
+    return tid
+
+# Arreglos paralelos con los nodos de un AST
+# - types: id del tipo
+# - leaves: hoja (str o None)
+# - first / last: primer y último hijo (-1 si no tiene)
+# - next: siguiente hermano (-1 si es el último)
+# - pos / line: posición y línea donde empieza el nodo en la fuente; sólo existen si
+#   el análisis las registra (RustParser.parse(..., positions=True)), si no son None
+class Arena:
+    def __init__(self):
+        self.types = array('B')
+        self.leaves = [ ]
+        self.first = array('i')
+        self.last = array('i')
+        self.next = array('i')
+        self.pos = None
+        self.line = None
+
+    def __len__(self):
+        return len(self.leaves)
+
+    # Agregar un nodo sin hijos; regresa su índice
+    def add(self, type, leaf):
+        index = len(self.leaves)
+        self.types.append(type_id(type))
+        self.leaves.append(leaf)
+        self.first.append(-1)
+        self.last.append(-1)
+        self.next.append(-1)
+        return index
+
+    # Agregar 'child' como último hijo de 'parent' (O(1)); su enlace al siguiente
+    # hermano se corta (pudo ser hijo de otro nodo antes)
+    def append(self, parent, child):
+        self.next[child] = -1
+        last = self.last[parent]
+        if last == -1:
+            self.first[parent] = child
+        else:
+            self.next[last] = child
+        self.last[parent] = child
+
+    # Índices de los hijos de un nodo
+    def children(self, index):
+        result = [ ]
+        nxt = self.next
+        child = self.first[index]
+        while child != -1:
+            result.append(child)
+            child = nxt[child]
+        return result
+
+# Arena de los nodos creados sin hijos ni arena fuera de un análisis (cada análisis de
+# RustParser crea los suyos en el arena de su sesión, p.parser.arena)
+default_arena = Arena()
+
+# Clase genérica para un nodo del AST (vista sobre un Arena)
+class Node:
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, type, children=None, leaf=None, arena=None):
+        # los hijos determinan el arena; las hojas van al arena dado
+        if children:
+            a = children[0].arena
+        elif arena is not None:
+            a = arena
+        else:
+            a = default_arena
+        self.arena = a
+        self.index = a.add(type, leaf)
+        if children:
+            for child in children:
+                self.append(child)
+
+    @classmethod
+    def view(cls, arena, index):
+        node = cls.__new__(cls)
+        node.arena = arena
+        node.index = index
+        return node
+
+    @property
+    def type(self):
+        return type_names[self.arena.types[self.index]]
+
+    @type.setter
+    def type(self, value):
+        self.arena.types[self.index] = type_id(value)
+
+    @property
+    def leaf(self):
+        return self.arena.leaves[self.index]
+
+    @leaf.setter
+    def leaf(self, value):
+        self.arena.leaves[self.index] = value
+
+    # Lista nueva con vistas de los hijos (modificarla no cambia el árbol)
+    @property
+    def children(self):
+        a = self.arena
+        return [ Node.view(a, i) for i in a.children(self.index) ]
+
+    @children.setter
+    def children(self, nodes):
+        a = self.arena
+        a.first[self.index] = a.last[self.index] = -1
+        for child in nodes or ( ):
+            self.append(child)
+
+    # Agregar un hijo al final
+    def append(self, child):
+        if child.arena is not self.arena:
+            raise ValueError("el hijo pertenece a otro arena")
+        self.arena.append(self.index, child.index)
+
+    def __eq__(self, other):
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self.arena is other.arena and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self):
+        return "Node(%r, leaf=%r)" % (self.type, self.leaf)
+
+    def __str__(self, level=0):
+        out = io.StringIO()
+        self.write(out, level)
+        return out.getvalue()
+
+    # Escribir el AST en 'out' (archivo o similar) con una pila explícita de
+    # hermanos pendientes; las líneas se acumulan y se escriben en bloques de
+    # 'chunk' líneas. No usa recursión, así que la profundidad no está limitada.
+    def write(self, out, level=0, chunk=4096):
+        a = self.arena
+        types, leaves, first, nxt = a.types, a.leaves, a.first, a.next
+        reprs = [ repr(name) for name in type_names ]
+        indents = [ ]
+        lines = [ ]
+        stack = [ self.index ]
+        root = True
+        while stack:
+            i = stack[-1]
+            if i == -1:
+                stack.pop()
+                continue
+            # el nodo raíz no escribe a sus hermanos
+            stack[-1] = -1 if root else nxt[i]
+            root = False
+
+            depth = level + len(stack) - 1
+            while len(indents) <= depth:
+                indents.append("\t" * len(indents))
+            leaf = leaves[i]
+            if leaf:
+                lines.append(indents[depth] + reprs[types[i]] + " => " + leaf + "\n")
+            else:
+                lines.append(indents[depth] + reprs[types[i]] + "\n")
+            if len(lines) >= chunk:
+                out.write("".join(lines))
+                lines = [ ]
+
+            if first[i] != -1:
+                stack.append(first[i])
+        out.write("".join(lines))
@@ -0,0 +1,204 @@
+# run -> python rust_async.py (socket Unix en la ruta por omisión, un proceso por núcleo)
+#     -> python rust_async.py --socket /tmp/rust.sock -j 4 --pending 16
+#
+# Servidor de análisis con asyncio: mismo protocolo que rust_server.py (JSON lines,
+# mismo cliente), pero la E/S y el análisis van por separado:
+# - el ciclo de eventos atiende todos los sockets a la vez, y la lectura de los
+#   archivos de entrada y la escritura de los AST van a un grupo de hilos
+# - el análisis (CPU) va a un grupo de 'jobs' procesos, cada uno con su rust_server.Service
+#
+# Contrapresión: a lo más 'pending' análisis pueden estar en el grupo o esperándolo.
+# Cuando se llena, el servidor deja de leer peticiones de los sockets (los clientes se
+# detienen al llenarse el buffer del socket) en lugar de acumularlas en memoria. Cada
+# conexión puede enviar hasta 'window' peticiones seguidas sin esperar respuesta; las
+# respuestas salen en el orden de las peticiones.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import rust_parallel
+import rust_server
+from rust_server import RequestError
+
+# Servicio del proceso trabajador
+service = None
+
+def init_worker(timeout):
+    global service
+    service = rust_server.Service(timeout)
+
+def work(op, data, format):
+    try:
+        return service.analyze(op, data, format)
+    except RequestError as e:
+        return { "ok": False, "error": str(e) }
+
+class AsyncServer:
+    def __init__(self, jobs=None, pending=None, window=8, timeout=60, threads=4):
+        self.jobs = jobs or rust_parallel.cpu_count()
+        self.pending = pending or 2 * self.jobs
+        self.window = window
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(self.pending)
+        self.pool = self.new_pool()
+        self.io = ThreadPoolExecutor(threads, thread_name_prefix='rust-io')
+        self.requests = 0
+        self.failures = 0
+        self.busy = 0.0     # segundos analizando (suma de los trabajadores)
+        self.started = time.time()
+        self.stopped = asyncio.Event()
+        self.connections = { }  # writer -> tarea de la conexión
+
+    def new_pool(self):
+        return ProcessPoolExecutor(self.jobs, initializer=init_worker, initargs=(self.timeout,))
+
+    # -- peticiones -- #
+
+    async def handle(self, line):
+        self.requests += 1
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError("JSON inválido")
+            if not isinstance(request, dict):
+                raise RequestError("la petición debe ser un objeto JSON")
+            op = request.get('op')
+            if op in ('check', 'parse', 'dump'):
+                return await self.analyze(op, request)
+            if op == 'ping':
+                return { "ok": True, "pid": os.getpid() }
+            if op == 'stats':
+                return { "ok": True, "pid": os.getpid(), "requests": self.requests, "failures": self.failures,
+                         "busy": round(self.busy, 3), "uptime": round(time.time() - self.started, 3),
+                         "jobs": self.jobs, "pending": self.pending }
+            if op == 'shutdown':
+                self.stopped.set()
+                return { "ok": True }
+            raise RequestError("operación desconocida: %r" % (op,))
+        except RequestError as e:
+            self.failures += 1
+            return { "ok": False, "error": str(e) }
+        except Exception as e:
+            self.failures += 1
+            return { "ok": False, "error": "error interno: %r" % e }
+
+    async def analyze(self, op, request):
+        format = rust_server.check_format(request)
+        if op == 'dump' and format == 'binary':
+            raise RequestError("dump no admite el formato binario (usar parse con 'output')")
+        loop = asyncio.get_running_loop()
+        if 'source' in request:
+            data = rust_server.read_source(request)
+        else:
+            data = await loop.run_in_executor(self.io, rust_server.read_source, request)
+        response = await self.submit(op, data, format)
+        self.busy += response.get("ms", 0) / 1e3
+        if not response["ok"] and "error" in response:
+            self.failures += 1
+        if op == 'parse' and "ast" in response:
+            output = request.get('output') or 'AST.txt'
+            response["output"] = await loop.run_in_executor(self.io, rust_server.write_output,
+                                                            output, response.pop("ast"))
+        return response
+
+    # Analizar en el grupo de procesos; si un trabajador muere se crea otro grupo
+    async def submit(self, op, data, format):
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return await loop.run_in_executor(pool, work, op, data, format)
+        except BrokenProcessPool:
+            if self.pool is pool:
+                self.pool = self.new_pool()
+            raise RequestError("un proceso de análisis terminó de forma inesperada")
+
+    # -- conexiones -- #
+
+    async def connection(self, reader, writer):
+        queue = asyncio.Queue(self.window) # respuestas pendientes, en orden
+        sender = asyncio.create_task(self.send(queue, writer))
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while not self.stopped.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await self.slots.acquire() # contrapresión: esperar lugar antes de leer más
+                task = asyncio.create_task(self.handle(line))
+                task.add_done_callback(lambda task: self.slots.release())
+                await queue.put(task)
+        except (ConnectionResetError, asyncio.LimitOverrunError, ValueError):
+            pass
+        await queue.put(None)
+        await sender
+        self.connections.pop(writer, None)
+
+    # Escribir las respuestas en el orden de las peticiones; si el cliente se va, las
+    # peticiones que ya se aceptaron terminan igual (sin respuesta)
+    async def send(self, queue, writer):
+        connected = True
+        while True:
+            task = await queue.get()
+            if task is None:
+                break
+            response = await task
+            if connected:
+                try:
+                    writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+                    await writer.drain() # contrapresión de la salida
+                except (ConnectionResetError, BrokenPipeError):
+                    connected = False
+        writer.close()
+
+    async def serve(self, path):
+        if os.path.exists(path) and not rust_server.alive(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(self.connection, path, limit=1 << 26)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.stopped.set)
+        try:
+            async with server:
+                await self.stopped.wait()
+                # cerrar las conexiones abiertas (terminan las peticiones ya aceptadas)
+                for writer in list(self.connections):
+                    writer.close()
+                await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            self.io.shutdown()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def serve(path=None, jobs=None, pending=None, window=8, timeout=60):
+    async def main():
+        server = AsyncServer(jobs, pending, window, timeout)
+        await server.serve(path or rust_server.default_socket)
+    asyncio.run(main())
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser(usage="python rust_async.py [--socket ruta] [-j procesos] [--pending N]")
+    args.add_argument('--socket', default=None, metavar='ruta',
+                      help="ruta del socket Unix (por omisión %s)" % rust_server.default_socket)
+    args.add_argument('-j', '--jobs', type=int, default=0,
+                      help="procesos de análisis (0: uno por núcleo)")
+    args.add_argument('--pending', type=int, default=0,
+                      help="análisis en curso o en espera antes de dejar de leer peticiones (0: 2 por proceso)")
+    args.add_argument('--window', type=int, default=8,
+                      help="peticiones sin responder por conexión")
+    args.add_argument('--timeout', type=int, default=60,
+                      help="segundos máximos por análisis (0: sin límite)")
+    opts = args.parse_args()
+    serve(opts.socket, opts.jobs or None, opts.pending or None, opts.window, opts.timeout)
@@ -0,0 +1,168 @@
+# Análisis de muchos archivos en un mismo proceso, con una sola sesión de RustParser
+# (el intérprete, los módulos y las tablas se cargan una vez para todos los archivos)
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import os
+import time
+
+import rust_yacc
+
+# Archivos a analizar a partir de rutas de archivos, directorios (se buscan los *.rs)
+# o '-' (una lista de rutas separadas por saltos de línea en 'stdin').
+# Regresa pares (ruta, nombre de salida relativo). Dos archivos no pueden escribir en
+# la misma salida (con -j las escrituras competirían): un nombre repetido se regresa
+# como None y process() lo reporta como error de ese archivo.
+def collect(paths, stdin=None):
+    seen = set()
+    for path, name in sources(paths, stdin):
+        key = os.path.normcase(os.path.normpath(name))
+        if key in seen:
+            yield path, None
+        else:
+            seen.add(key)
+            yield path, name
+
+def sources(paths, stdin=None):
+    for path in paths:
+        if path == '-':
+            for line in (stdin or sys.stdin):
+                line = line.strip()
+                if line and line != '-':
+                    yield from sources([ line ])
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.rs'):
+                        full = os.path.join(root, name)
+                        yield full, os.path.relpath(full, path)
+        else:
+            yield path, file_name(path)
+
+# Nombre de salida de un archivo dado por su ruta: relativo al directorio actual (a/x.rs
+# y b/x.rs no se confunden) o, si está fuera de él, sólo el nombre del archivo
+def file_name(path):
+    try:
+        name = os.path.relpath(path)
+    except ValueError: # otra unidad (Windows)
+        return os.path.basename(path)
+    if name == os.pardir or name.startswith(os.pardir + os.sep):
+        return os.path.basename(path)
+    return name
+
+# Resultado del análisis de un archivo (sin el AST, para poder enviarlo entre procesos)
+class FileResult:
+    def __init__(self, path, name, errors=None, nodes=0, cached=False, hits=0, misses=0):
+        self.path = path
+        self.name = name    # nombre de salida relativo
+        self.errors = errors or [ ]
+        self.nodes = nodes  # nodos del AST
+        self.cached = cached # resultado tomado de la caché (rust_cache)
+        # aciertos y fallos de la caché al analizar este archivo (los contadores de
+        # la caché de cada proceso de rust_parallel no llegan al proceso principal)
+        self.hits = hits
+        self.misses = misses
+
+    @property
+    def ok(self):
+        return not self.errors
+
+# Leer y analizar un archivo con la sesión dada; regresa (AST, errores)
+def parse_file(session, path):
+    try:
+        with open(path, 'r') as file:
+            data = file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return None, [ "No se pudo leer el archivo: %s" % e ]
+
+    ast = session.parse(data)
+    if ast is None and not session.errors:
+        return None, [ "sin AST" ]
+    return ast, list(session.errors)
+
+# Como parse_file, pero con la caché dada (rust_cache.Cache); regresa (AST, errores,
+# si el resultado salió de la caché)
+def parse_cached(cache, session, path):
+    try:
+        entry = cache.parse_file(session, path)
+    except (OSError, UnicodeDecodeError) as e:
+        return None, [ "No se pudo leer el archivo: %s" % e ], False
+    if entry.ast is None and not entry.errors:
+        return None, [ "sin AST" ], entry.cached
+    return entry.ast, entry.errors, entry.cached
+
+# Ruta del AST de un archivo dentro de 'outdir'
+def output_path(outdir, name):
+    return os.path.join(outdir, os.path.splitext(name)[0] + ".ast.txt")
+
+def write_ast(ast, path):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, 'w') as out:
+        ast.write(out)
+
+# Analizar un archivo (o tomarlo de 'cache') y escribir su AST en 'outdir' (si no es None)
+def process(session, path, name, outdir, cache=None):
+    if name is None and outdir is not None:
+        return FileResult(path, name, [ "Otro archivo ya escribe su AST en la misma salida" ])
+    cached = False
+    hits = misses = 0
+    if cache is None:
+        ast, errors = parse_file(session, path)
+    else:
+        hits, misses = cache.hits, cache.misses
+        ast, errors, cached = parse_cached(cache, session, path)
+        hits, misses = cache.hits - hits, cache.misses - misses
+    if errors:
+        return FileResult(path, name, errors, 0, cached, hits, misses)
+    if outdir is not None:
+        try:
+            write_ast(ast, output_path(outdir, name))
+        except OSError as e:
+            return FileResult(path, name, [ "No se pudo escribir el AST: %s" % e ], 0, cached, hits, misses)
+    return FileResult(path, name, None, len(ast.arena), cached, hits, misses)
+
+# Imprimir el estado de un archivo
+def report(result, out):
+    if result.ok:
+        out.write("ok     %s\n" % result.path)
+    else:
+        msg = result.errors[0]
+        if len(result.errors) > 1:
+            msg += " (+%d)" % (len(result.errors) - 1)
+        out.write("error  %s: %s\n" % (result.path, msg))
+
+def summary(total, failed, elapsed, out, cached=None, hits=0, misses=0):
+    rate = total / elapsed if elapsed > 0 else 0.0
+    out.write("%d archivos, %d con errores, %.2f seg (%.1f archivos/seg)\n" % (total, failed, elapsed, rate))
+    if cached is not None:
+        out.write("%d de %d archivos tomados de la caché\n" % (cached, total))
+        lookups = hits + misses
+        out.write("caché: %d aciertos, %d fallos (%.1f%%)\n" % (hits, misses, 100.0 * hits / lookups if lookups else 0.0))
+
+# Resultados de analizar todos los archivos en este proceso, en orden
+def results(files, outdir=None, cache=None):
+    session = rust_yacc.RustParser(verbose=False)
+    for path, name in files:
+        yield process(session, path, name, outdir, cache)
+
+# Reportar los resultados (de este proceso o de rust_parallel) y el resumen;
+# si 'outdir' es None no se escriben los AST. Con 'cache' (rust_cache.Cache) los
+# archivos sin cambios no se analizan. Regresa el número de archivos con errores.
+def run(files, outdir=None, out=sys.stdout, source=None, cache=None):
+    total = failed = cached = hits = misses = 0
+    start = time.perf_counter()
+    for result in (source or results)(files, outdir, cache):
+        report(result, out)
+        total += 1
+        if not result.ok:
+            failed += 1
+        if result.cached:
+            cached += 1
+        hits += result.hits
+        misses += result.misses
+    summary(total, failed, time.perf_counter() - start, out, None if cache is None else cached, hits, misses)
+    return failed
@@ -0,0 +1,233 @@
+# Formato binario compacto del AST (archivos .rsb), para guardar y cargar árboles
+# sin volver a analizar el código fuente.
+#
+# Los nodos se guardan en preorden, así que el primer hijo de un nodo siempre es el
+# siguiente nodo y basta con guardar distancias:
+# - tabla de tipos: los nombres de los tipos de nodo usados (los ids son del proceso)
+# - tabla de hojas: cada texto distinto una sola vez, ordenados por frecuencia
+# - por nodo: tipo (1 byte), distancia al último hijo y al siguiente hermano (0 si no
+#   tiene) en varints LEB128, y número de su hoja en la tabla (0 si no tiene) con el
+#   ancho fijo más chico que alcance (1, 2 o 4 bytes)
+#
+# Casi todos los varints caben en un byte, así que al cargar las columnas se
+# convierten con list(bytes) y los arreglos del Arena se arman con comprensiones, sin
+# recorrer el árbol en Python; las hojas se cargan con array.frombytes. El arreglo
+# 'last' (sólo lo usan Arena.append y Node.children =) se calcula al pedirlo.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import re
+from array import array
+from collections import Counter
+
+import rust_ast
+from rust_ast import Arena, Node
+
+MAGIC = b'RSBIN1\n'
+
+# varints de más de un byte
+multibyte = re.compile(rb'[\x80-\xff]+[\x00-\x7f]')
+
+# -- varints -- #
+
+def encode(values):
+    values = list(values)
+    if not values or max(values) < 0x80:
+        return bytes(values)
+    out = bytearray()
+    for v in values:
+        while v >= 0x80:
+            out.append(v & 0x7f | 0x80)
+            v >>= 7
+        out.append(v)
+    return bytes(out)
+
+def decode(data):
+    if data.isascii():
+        return list(data)
+    values = [ ]
+    pos = 0
+    for m in multibyte.finditer(data):
+        values.extend(data[pos:m.start()])
+        value = shift = 0
+        for b in m.group():
+            value |= (b & 0x7f) << shift
+            shift += 7
+        values.append(value)
+        pos = m.end()
+    values.extend(data[pos:])
+    return values
+
+# Lector de secciones: varint de longitud seguido de los bytes
+class Reader:
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def varint(self):
+        data = self.data
+        value = shift = 0
+        while True:
+            b = data[self.pos]
+            self.pos += 1
+            value |= (b & 0x7f) << shift
+            if b < 0x80:
+                return value
+            shift += 7
+
+    def section(self):
+        size = self.varint()
+        start = self.pos
+        self.pos += size
+        if self.pos > len(self.data):
+            raise ValueError("AST binario truncado")
+        return bytes(self.data[start:self.pos])
+
+def section(data):
+    return encode([ len(data) ]) + data
+
+# Tipo de arreglo para números de hoja menores que 'count'
+def width(count):
+    for code in ('B', 'H', 'I'):
+        if count < 1 << 8 * array(code).itemsize:
+            return code
+    raise ValueError("demasiadas hojas distintas")
+
+# Arena cargado de un archivo: 'last' se calcula la primera vez que se usa a partir de
+# las distancias al último hijo
+class LoadedArena(Arena):
+    def __init__(self, tails=None):
+        super().__init__()
+        self.tails = tails
+
+    @property
+    def last(self):
+        if self.tails is not None:
+            self._last = array('i', [ i + d if d else -1 for i, d in enumerate(self.tails) ])
+            self.tails = None
+        return self._last
+
+    @last.setter
+    def last(self, value):
+        self._last = value
+        self.tails = None
+
+# -- escritura -- #
+
+# Bytes con el árbol de 'node' (sólo los nodos alcanzables desde él)
+def dumps(node):
+    a = node.arena
+    types, leaves, first, nxt = a.types, a.leaves, a.first, a.next
+
+    # preorden con una pila explícita (no hay límite de profundidad)
+    order = [ ]
+    stack = [ node.index ]
+    while stack:
+        i = stack.pop()
+        order.append(i)
+        child = first[i]
+        if child != -1:
+            children = [ ]
+            while child != -1:
+                children.append(child)
+                child = nxt[child]
+            children.reverse()
+            stack.extend(children)
+    position = { index: pos for pos, index in enumerate(order) }
+
+    # distancias (en preorden) al último hijo y al siguiente hermano
+    last = [ 0 ] * len(order)
+    following = [ 0 ] * len(order)
+    for pos, i in enumerate(order):
+        child = first[i]
+        prev = -1
+        while child != -1:
+            if prev != -1:
+                following[position[prev]] = position[child] - position[prev]
+            prev = child
+            child = nxt[child]
+        if prev != -1:
+            last[pos] = position[prev] - pos
+
+    # tipos renumerados a los usados en el archivo
+    used = sorted(set(types[i] for i in order))
+    local = { tid: n for n, tid in enumerate(used) }
+    names = "\n".join(rust_ast.type_names[tid] for tid in used)
+
+    # textos de las hojas, los más frecuentes primero (números de un byte)
+    counts = Counter(leaves[i] for i in order)
+    counts.pop(None, None)
+    strings = [ text for text, count in counts.most_common() ]
+    number = { text: n + 1 for n, text in enumerate(strings) }
+    number[None] = 0
+    refs = array(width(len(strings) + 1), [ number[leaves[i]] for i in order ])
+    if sys.byteorder == 'big':
+        refs.byteswap()
+
+    parts = [ MAGIC, encode([ len(order) ]),
+              section(names.encode('utf-8')),
+              section(encode(len(text) for text in strings)),
+              section("".join(strings).encode('utf-8')),
+              section(bytes(local[types[i]] for i in order)),
+              section(encode(last)),
+              section(encode(following)),
+              section(refs.typecode.encode('ascii') + refs.tobytes()) ]
+    return b"".join(parts)
+
+def dump(node, file):
+    file.write(dumps(node))
+
+def write(node, path):
+    with open(path, 'wb') as file:
+        dump(node, file)
+
+# -- lectura -- #
+
+# Árbol guardado en 'data' (bytes, bytearray o mmap): un Node sobre un Arena nuevo
+# cuyos nodos están en preorden (la raíz es el nodo 0)
+def loads(data):
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("no es un AST binario")
+    r = Reader(data, len(MAGIC))
+    n = r.varint()
+    names = r.section().decode('utf-8')
+    lengths = decode(r.section())
+    text = r.section().decode('utf-8')
+    types = r.section()
+    last = decode(r.section())
+    following = decode(r.section())
+    column = r.section()
+    refs = array(column[:1].decode('ascii'))
+    refs.frombytes(column[1:])
+    if sys.byteorder == 'big':
+        refs.byteswap()
+    if not (len(types) == len(last) == len(following) == len(refs) == n):
+        raise ValueError("AST binario inválido")
+
+    # tabla de hojas (el número 0 es None)
+    strings = [ None ]
+    pos = 0
+    for length in lengths:
+        strings.append(text[pos:pos + length])
+        pos += length
+
+    a = LoadedArena()
+    # ids de tipo del archivo -> ids de este proceso
+    ids = [ rust_ast.type_id(name) for name in names.split("\n") ] if names else [ ]
+    if ids != list(range(len(ids))):
+        types = types.translate(bytes(ids) + bytes(256 - len(ids)))
+    a.types = array('B', types)
+    a.leaves = list(map(strings.__getitem__, refs))
+    # en preorden el primer hijo es el nodo siguiente
+    a.first = array('i', [ i + 1 if d else -1 for i, d in enumerate(last) ])
+    a.tails = last
+    a.next = array('i', [ i + d if d else -1 for i, d in enumerate(following) ])
+    return Node.view(a, 0)
+
+def load(file):
+    return loads(file.read())
+
+def read(path):
+    with open(path, 'rb') as file:
+        return load(file)
@@ -0,0 +1,194 @@
+# Caché en disco de resultados del análisis, indexada por contenido.
+#
+# La clave de un archivo es un hash de sus bytes junto con la firma de la gramática
+# (ParserReflect.signature()) y la de las reglas del lexer, así que un cambio en
+# cualquiera de las dos nunca carga resultados viejos. Cada entrada guarda el AST
+# (los arreglos de su Arena), los errores de sintaxis y la tabla de símbolos; un
+# archivo sin cambios se carga sin analizarlo.
+#
+# El tamaño total se limita a 'max_bytes': al pasarse se borran las entradas usadas
+# hace más tiempo (la fecha de modificación de cada entrada se actualiza al leerla).
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import hashlib
+import io
+import marshal
+import os
+import threading
+from array import array
+
+import rust_ast
+import rust_lex
+import rust_tables
+import rust_yacc
+from rust_ast import Arena, Node
+
+# Directorio por omisión (se puede cambiar con la variable de entorno RUST_CACHE)
+default_dir = os.environ.get('RUST_CACHE',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+MAGIC = b'RSAST1\n'
+
+grammar = None
+
+# Hash de las firmas de la gramática y del lexer (se calcula una vez por proceso)
+def grammar_signature():
+    global grammar
+    if grammar is None:
+        h = hashlib.sha256()
+        h.update(rust_tables.yacc_signature(rust_yacc).encode('utf-8'))
+        h.update(rust_tables.lex_signature(rust_lex).encode('utf-8'))
+        grammar = h.digest()
+    return grammar
+
+# Clave de un contenido (bytes)
+def content_key(raw):
+    h = hashlib.sha256(grammar_signature())
+    h.update(raw)
+    return h.hexdigest()
+
+# Resultado guardado: AST (o None), errores de sintaxis y alcances de la tabla de
+# símbolos ({número: {nombre: valor}}, como SymbolTable.scopes())
+class Entry:
+    __slots__ = ('ast', 'errors', 'scopes', 'cached')
+
+    def __init__(self, ast, errors, scopes, cached=False):
+        self.ast = ast
+        self.errors = errors
+        self.scopes = scopes
+        self.cached = cached    # se leyó de la caché
+
+# Serializar un resultado: los nombres de los tipos de nodo van con la entrada (los
+# ids son del proceso que la escribió) y los arreglos como bytes
+def dump(entry):
+    ast = entry.ast
+    if ast is None:
+        nodes = None
+    else:
+        a = ast.arena
+        nodes = (list(rust_ast.type_names), a.types.tobytes(), a.leaves, a.first.tobytes(),
+                 a.last.tobytes(), a.next.tobytes(), ast.index)
+    return MAGIC + marshal.dumps((nodes, entry.errors, entry.scopes))
+
+def load(payload):
+    if not payload.startswith(MAGIC):
+        raise ValueError("entrada de caché inválida")
+    nodes, errors, scopes = marshal.loads(payload[len(MAGIC):])
+    ast = None
+    if nodes is not None:
+        names, types, leaves, first, last, nxt, root = nodes
+        a = Arena()
+        # ids de tipo del archivo -> ids de este proceso
+        ids = [ rust_ast.type_id(name) for name in names ]
+        if ids != list(range(len(ids))):
+            table = bytes(ids) + bytes(256 - len(ids))
+            types = types.translate(table)
+        a.types = array('B', types)
+        a.leaves = leaves
+        for name, column in (('first', first), ('last', last), ('next', nxt)):
+            setattr(a, name, array('i', column))
+        ast = Node.view(a, root)
+    return Entry(ast, errors, scopes, True)
+
+class Cache:
+    def __init__(self, directory=None, max_bytes=256 << 20):
+        self.directory = directory or default_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in self.entries())
+
+    def entries(self):
+        return (entry for entry in os.scandir(self.directory) if entry.name.endswith('.ast'))
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.ast')
+
+    # Resultado guardado para 'key', o None
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                entry = load(file.read())
+            os.utime(path) # usada ahora (para el orden LRU)
+        except (OSError, ValueError, EOFError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = self.path(key)
+        payload = dump(entry)
+        # archivo temporal propio de este proceso y de este hilo (nadie más escribe en él)
+        tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        try:
+            old = os.stat(path).st_size # la entrada que se reemplaza ya estaba contada
+        except OSError:
+            old = 0
+        try:
+            with open(tmp, 'wb') as file:
+                file.write(payload)
+            os.replace(tmp, path) # otros procesos nunca ven una entrada a medias
+        except OSError:
+            return
+        self.stores += 1
+        self.size += len(payload) - old
+        if self.size > self.max_bytes:
+            self.evict()
+
+    # Borrar las entradas usadas hace más tiempo hasta quedar en el 90% del límite
+    def evict(self):
+        entries = [ ]
+        for entry in self.entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        self.size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+            self.evictions += 1
+
+    # Resultado de analizar el contenido 'raw' (bytes del archivo): de la caché si
+    # está, o analizándolo con 'session' (y guardándolo)
+    def parse(self, session, raw):
+        key = content_key(raw)
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        # mismo texto que open(path, 'r').read()
+        data = io.TextIOWrapper(io.BytesIO(raw)).read()
+        keep = session.keep_scopes
+        session.keep_scopes = True
+        try:
+            ast = session.parse(data)
+        finally:
+            session.keep_scopes = keep
+        entry = Entry(ast, list(session.errors), session.symbols.scopes())
+        self.put(key, entry)
+        return entry
+
+    def parse_file(self, session, path):
+        with open(path, 'rb') as file:
+            raw = file.read()
+        return self.parse(session, raw)
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return "caché: %d aciertos, %d fallos (%.1f%%), %d guardados, %d borrados, %.1f MB" % (
+            self.hits, self.misses, rate, self.stores, self.evictions, self.size / 1e6)
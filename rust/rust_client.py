@@ -0,0 +1,143 @@
+# run -> python rust_client.py ../tests/data_types.rs (como pyrust.py: escribe 'AST.txt')
+#     -> python rust_client.py check ../tests/*.rs
+#     -> python rust_client.py dump ../tests/data_types.rs --format json
+#     -> python rust_client.py ping | stats | shutdown
+#     -> python rust_client.py --spawn check archivo.rs (inicia el servidor si no está)
+#
+# Cliente ligero del servidor de análisis (rust_server.py): no importa rust_lex ni
+# rust_yacc, sólo envía la petición por el socket Unix e imprime la respuesta.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import argparse
+import json
+import os
+import socket
+import time
+
+default_socket = os.environ.get('RUST_SERVER', '/tmp/rust_server-%d.sock' % os.getuid())
+server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rust_server.py')
+
+class ServerError(Exception):
+    pass
+
+# Conexión con el servidor; varias peticiones pueden usar la misma conexión
+class Client:
+    def __init__(self, path=None):
+        self.path = path or default_socket
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(self.path)
+        except OSError as e:
+            self.sock.close()
+            raise ServerError("no hay servidor en '%s' (%s)" % (self.path, e.strerror or e))
+        self.file = self.sock.makefile('rwb')
+
+    def request(self, **request):
+        self.file.write(json.dumps(request).encode('utf-8') + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ServerError("el servidor cerró la conexión")
+        return json.loads(line)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Iniciar el servidor en segundo plano y esperar a que acepte conexiones
+def spawn(path=None, wait=30.0):
+    import subprocess
+    path = path or default_socket
+    subprocess.Popen([ sys.executable, server_script, '--socket', path ],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True,
+                     cwd=os.path.dirname(server_script))
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return Client(path)
+        except ServerError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+def connect(path=None, start=False):
+    try:
+        return Client(path)
+    except ServerError:
+        if not start:
+            raise
+        return spawn(path)
+
+# Petición de análisis de un archivo (la ruta va absoluta: el servidor tiene otro directorio)
+def file_request(op, path, format='text', output=None):
+    request = { "op": op, "path": os.path.abspath(path) }
+    if format != 'text':
+        request["format"] = format
+    if output is not None:
+        request["output"] = os.path.abspath(output)
+    return request
+
+def main(argv=None):
+    args = argparse.ArgumentParser(usage="python rust_client.py [parse|check|dump] archivo ... | ping | stats | shutdown")
+    args.add_argument('words', nargs='+')
+    args.add_argument('--socket', default=None, metavar='ruta',
+                      help="ruta del socket Unix (por omisión %s)" % default_socket)
+    args.add_argument('--spawn', action='store_true',
+                      help="iniciar el servidor si no está corriendo")
+    args.add_argument('--format', default='text', choices=('text', 'json', 'binary'),
+                      help="formato del AST (parse y dump)")
+    args.add_argument('-o', '--output', default='AST.txt',
+                      help="archivo del AST con parse")
+    opts = args.parse_intermixed_args(argv)
+
+    op, paths = opts.words[0], opts.words[1:]
+    if op not in ('parse', 'check', 'dump', 'ping', 'stats', 'shutdown'):
+        op, paths = 'parse', opts.words
+    if op in ('parse', 'dump') and len(paths) != 1 or op == 'check' and not paths:
+        print("Uso: python rust_client.py [parse|check|dump] [archivo de entrada]")
+        return 2
+
+    try:
+        client = connect(opts.socket, opts.spawn)
+    except ServerError as e:
+        print("Error: %s" % e, file=sys.stderr)
+        return 2
+
+    with client:
+        if op in ('ping', 'stats', 'shutdown'):
+            response = client.request(op=op)
+            print(json.dumps(response))
+            return 0 if response.get("ok") else 1
+
+        failed = 0
+        for path in paths:
+            response = client.request(**file_request(op, path, opts.format,
+                                                     opts.output if op == 'parse' else None))
+            if "error" in response:
+                print(response["error"])
+                failed += 1
+                continue
+            for msg in response["errors"]:
+                print(msg)
+            if op == 'parse' and "output" in response:
+                print(response["scopes"])
+                print("AST generado en '%s'" % opts.output)
+            elif op == 'dump' and "ast" in response:
+                sys.stdout.write(response["ast"])
+            elif op == 'check' and len(paths) > 1:
+                print("%-4s %s" % ("ok" if response["ok"] else "FAIL", path))
+            if not response["ok"]:
+                failed += 1
+        return 1 if failed else 0
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,532 @@
+# run -> python rust_codegen.py (genera el analizador en la caché de tablas 'tables/')
+#     -> python rust_codegen.py -o rust_generated.py
+#     -> python rust_codegen.py --check (compara con rust_yacc.parse en ../tests/*.rs)
+#
+# Generador de un analizador especializado para la gramática de rust_yacc: escribe un
+# módulo de Python independiente (no importa ply) a partir de las tablas LALR, con
+# - una función por estado, con las acciones escritas como comparaciones del id del
+#   token (if t == ... / if t in {...}) en lugar de buscar en action[estado][token]
+# - cada reducción escrita en línea: las acciones p_* se llaman directamente con una
+#   lista [None, v1, ..., vn] en lugar de un YaccProduction, y la pila guarda los
+#   valores en lugar de objetos YaccSymbol
+# - los goto con un solo destino como constantes; después de una reducción así, el
+#   código del estado destino sigue en línea con el mismo token (literal -> expr -> ...)
+# La recuperación de errores sigue los mismos pasos que ply (LRParser.parseopt_notrack).
+#
+# El módulo se guarda con un hash de la gramática y del código de las acciones en el
+# nombre (como rust_tables), así que se vuelve a generar si cambian. Se usa con
+# RustParser(generated=True).
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import argparse
+import glob
+import importlib.util
+import inspect
+import os
+
+import rust_tables
+
+version = 1 # del generador: un cambio aquí genera otro módulo
+
+# Estados que se escriben en línea después de una reducción con goto constante
+max_inline = 3
+
+class GenerationError(Exception):
+    pass
+
+# -- Acciones de la gramática -- #
+
+# Atributos de YaccProduction que el analizador generado no ofrece
+unsupported = { 'slice', 'stack', 'lineno', 'lexpos', 'linespan', 'lexspan',
+                'set_lineno', 'set_lexpos', 'error' }
+
+# Cómo recibe 'p' una acción:
+# - 'list': lista simple [None, v1, ..., vn] (la acción sólo usa p[i] y len(p))
+# - 'parser': lista con los atributos parser y lexer (usa p.parser)
+# - 'stack': objeto que además lee la pila con índices negativos (p[-1])
+def style(func):
+    code = func.__code__
+    names = set(code.co_names)
+    if names & unsupported:
+        raise GenerationError("%s usa p.%s" % (func.__name__, sorted(names & unsupported)[0]))
+    if any(isinstance(c, int) and c < 0 for c in code.co_consts):
+        return 'stack'
+    if 'parser' in names or 'lexer' in names:
+        return 'parser'
+    return 'list'
+
+# Firma de la gramática y del código de sus acciones
+def signature(module):
+    parts = [ str(version), rust_tables.yacc_signature(module), ' '.join(module.tokens) ]
+    for name in sorted(dir(module)):
+        if name.startswith('p_'):
+            parts.append(inspect.getsource(getattr(module, name)))
+    return '\n'.join(parts)
+
+def module_name(module):
+    return rust_tables.table_name('rustgen', signature(module))
+
+# -- Generación -- #
+
+runtime = '''\
+# Analizador generado por rust_codegen.py a partir de las tablas LALR de rust_yacc.
+# No editar: se vuelve a generar con python rust_codegen.py.
+
+import sys
+
+terminals = %(terminals)r
+END = %(end)d
+ERRTOK = %(errtok)d
+
+ERROR = -1      # sin acción para el token
+ACCEPT = -2
+
+error_count = 3
+
+class Symbol:
+    def __init__(self, type, value=None):
+        self.type = type
+        self.value = value
+
+# p de las acciones que leen la pila con índices negativos (p[-1])
+class Production:
+    def __init__(self, parser, lexer, values, n):
+        self.parser = parser
+        self.lexer = lexer
+        self.values = values
+        self.n = n
+        self.value = None
+
+    def __getitem__(self, i):
+        if i == 0:
+            return self.value
+        if i < 0:
+            return self.values[i - self.n]
+        return self.values[i - self.n - 1]
+
+    def __setitem__(self, i, value):
+        if i != 0:
+            raise IndexError(i)
+        self.value = value
+
+    def __len__(self):
+        return self.n + 1
+
+def build(parser, module):
+%(functions)s
+    # p de las acciones que usan p.parser
+    class P(list):
+        __slots__ = ( )
+    P.parser = parser
+    P.lexer = None
+
+    eof = Symbol(END)
+    values = states = la = next_token = None
+    errorcount = 0
+
+%(states)s
+    table = (%(table)s)
+
+    def restart():
+        del states[:]
+        del values[:]
+        states.append(0)
+        values.append(None)
+
+    def run(get_token, lexer):
+        nonlocal values, states, la, next_token, errorcount
+        P.lexer = lexer
+        values = [ None ]
+        states = [ 0 ]
+        parser.symstack = values
+        parser.statestack = states
+        pending = [ ]
+        la = None
+        next_token = get_token
+        errorcount = 0
+
+        def from_pending():
+            nonlocal next_token
+            tok = pending.pop()
+            if not pending:
+                next_token = get_token
+            return tok
+
+        s = 0
+        try:
+            while True:
+                s = table[s]()
+                if s >= 0:
+                    continue
+                if s == ACCEPT:
+                    return values[-1]
+
+                # error de sintaxis (los mismos pasos que ply)
+                if errorcount == 0 or parser.errorok:
+                    errorcount = error_count
+                    parser.errorok = False
+                    errtoken = la
+                    if errtoken.type == END:
+                        errtoken = None
+                    if parser.errorfunc:
+                        if errtoken is not None and not hasattr(errtoken, 'lexer'):
+                            errtoken.lexer = lexer
+                        parser.state = states[-1]
+                        tok = parser.errorfunc(errtoken)
+                        if parser.errorok:
+                            la = tok
+                            s = states[-1]
+                            continue
+                    elif errtoken is not None:
+                        lineno = getattr(la, 'lineno', 0)
+                        if lineno:
+                            sys.stderr.write('yacc: Syntax error at line %%d, token=%%s\\n' %% (lineno, terminals[errtoken.type]))
+                        else:
+                            sys.stderr.write('yacc: Syntax error, token=%%s' %% terminals[errtoken.type])
+                    else:
+                        sys.stderr.write('yacc: Parse error in input. EOF\\n')
+                        return None
+                else:
+                    errorcount = error_count
+
+                # sólo queda el estado inicial: descartar el token y seguir
+                if len(states) <= 1 and la.type != END:
+                    la = None
+                    del pending[:]
+                    next_token = get_token
+                    s = 0
+                    continue
+                if la.type == END:
+                    return None
+                if la.type != ERRTOK:
+                    # el token de error es el nuevo lookahead
+                    t = Symbol(ERRTOK, la)
+                    if hasattr(la, 'lineno'):
+                        t.lineno = t.endlineno = la.lineno
+                    if hasattr(la, 'lexpos'):
+                        t.lexpos = t.endlexpos = la.lexpos
+                    pending.append(la)
+                    next_token = from_pending
+                    la = t
+                else:
+                    states.pop()
+                    values.pop()
+                s = states[-1]
+        finally:
+            la = next_token = None
+            P.lexer = None
+
+    return run, restart
+
+# Analizador con la interfaz del LRParser de ply que usa RustParser
+class Parser:
+    def __init__(self, module, errorf=None):
+        self.errorfunc = errorf
+        self.symbols = None     # los usan las acciones (p.parser.symbols, p.parser.emit)
+        self.arena = None       # arena de los nodos del análisis en curso (p.parser.arena)
+        self.emit = None
+        self.statestack = None
+        self.symstack = None
+        self.errorok = True
+        self.get_token = None
+        self.run, self.restart_stacks = build(self, module)
+
+    # Siguiente token para el manejador de errores, con el tipo como nombre
+    def token(self):
+        t = self.get_token()
+        if t is not None:
+            t.type = terminals[t.type]
+        return t
+
+    def errok(self):
+        self.errorok = True
+
+    def restart(self):
+        self.restart_stacks()
+
+    def parse(self, input=None, lexer=None, debug=False, tracking=False, tokenfunc=None):
+        if debug or tracking:
+            raise ValueError("el analizador generado no admite debug ni tracking")
+        if input is not None:
+            lexer.input(input)
+        get_token = tokenfunc or lexer.token
+        if not getattr(getattr(lexer, 'tables', None), 'numbered', False):
+            get_token = numbered(get_token)
+        self.get_token = get_token
+        self.errorok = True
+        return self.run(get_token, lexer)
+
+term_ids = { name: i for i, name in enumerate(terminals) }
+
+# Convierte los tipos de los tokens de 'get_token' (nombres) a ids
+def numbered(get_token):
+    def token():
+        t = get_token()
+        if t is not None:
+            t.type = term_ids[t.type]
+        return t
+    return token
+
+%(gotos)s'''
+
+class Generator:
+    def __init__(self, parser, module):
+        self.module = module
+        self.terminals = list(module.tokens) + [ '$end', 'error' ]
+        self.ids = { name: i for i, name in enumerate(self.terminals) }
+        self.productions = parser.productions
+        self.action = parser.action
+        self.goto = parser.goto
+        self.defaulted = parser.defaulted_states
+        self.nstates = max(self.action) + 1
+        if any('error' in row for row in self.action.values()):
+            raise GenerationError("la gramática tiene reglas con 'error'")
+
+        # destinos del goto de cada no terminal: estado expuesto -> destino
+        self.targets = { }
+        for state, row in self.goto.items():
+            for name, target in row.items():
+                self.targets.setdefault(name, { })[state] = target
+        self.styles = { }
+        for prod in self.productions[1:]:
+            if prod.callable is not None:
+                self.styles[prod.func] = style(prod.callable)
+
+    # Expresión del destino del goto de 'name' con el estado expuesto 'exposed'
+    def goto_expr(self, name, exposed):
+        targets = self.targets[name]
+        distinct = sorted(set(targets.values()))
+        if len(distinct) == 1:
+            return str(distinct[0])
+        if len(distinct) == 2:
+            sources = sorted(s for s, t in targets.items() if t == distinct[0])
+            if len(sources) == 1:
+                return '%d if %s == %d else %d' % (distinct[0], exposed, sources[0], distinct[1])
+            return '%d if %s in {%s} else %d' % (distinct[0], exposed, ', '.join(map(str, sources)), distinct[1])
+        return 'g_%s[%s]' % (name, exposed)
+
+    # Tabla de goto (tupla por estado) de los no terminales con más de dos destinos
+    def goto_tables(self):
+        lines = [ ]
+        for name in sorted(self.targets):
+            targets = self.targets[name]
+            if len(set(targets.values())) > 2:
+                row = [ targets.get(s, -1) for s in range(self.nstates) ]
+                lines.append('g_%s = %r\n' % (name, tuple(row)))
+        return ''.join(lines)
+
+    def test(self, tokens):
+        ids = sorted(tokens)
+        if len(ids) == 1:
+            return 't == %d' % ids[0]
+        return 't in {%s}' % ', '.join(map(str, ids))
+
+    def names(self, tokens):
+        names = ' '.join(self.terminals[t] for t in sorted(tokens))
+        return names if len(names) < 60 else names[:57] + '...'
+
+    # Código de una reducción por la regla 'rule' y de lo que sigue (goto y, si el
+    # destino es constante, el estado destino con el mismo token)
+    def reduce(self, rule, out, indent, depth, have_t):
+        prod = self.productions[rule]
+        n = prod.len
+        pad = ' ' * indent
+        out.append('%s# %s' % (pad, prod.str))
+        if prod.callable is None:
+            result = 'None'
+        else:
+            kind = self.styles[prod.func]
+            items = [ 'values[-%d]' % i for i in range(n, 0, -1) ]
+            if kind == 'list':
+                out.append('%sp = [ None%s ]' % (pad, ''.join(', ' + x for x in items)))
+            elif kind == 'parser':
+                out.append('%sp = P((None%s))' % (pad, ''.join(', ' + x for x in items) or ','))
+            else:
+                out.append('%sp = Production(parser, P.lexer, values, %d)' % (pad, n))
+            out.append('%s%s(p)' % (pad, prod.func))
+            result = 'p[0]'
+        if n == 0:
+            exposed = 'states[-1]'
+            out.append('%svalues.append(%s)' % (pad, result))
+            store = '%sstates.append(%%s)' % pad
+        else:
+            if n > 1:
+                out.append('%sdel values[-%d:]' % (pad, n - 1))
+                out.append('%sdel states[-%d:]' % (pad, n - 1))
+            out.append('%svalues[-1] = %s' % (pad, result))
+            exposed = 'states[-2]'
+            store = '%sstates[-1] = %%s' % pad
+        target = self.goto_expr(prod.name, exposed)
+        if target.isdigit():
+            out.append(store % target)
+            if depth < max_inline:
+                self.state(int(target), out, indent, depth + 1, have_t)
+            else:
+                out.append('%sreturn %s' % (pad, target))
+        else:
+            out.append('%sg = %s' % (pad, target))
+            out.append(store % 'g')
+            out.append('%sreturn g' % pad)
+
+    # Código de las acciones del estado 'state'; 'have_t': el token ya está en 't'
+    def state(self, state, out, indent, depth, have_t):
+        pad = ' ' * indent
+        if state in self.defaulted:
+            self.reduce(-self.defaulted[state], out, indent, depth, have_t)
+            return
+        if not have_t:
+            out.append('%sif la is None:' % pad)
+            out.append('%s    la = next_token() or eof' % pad)
+            out.append('%st = la.type' % pad)
+        shifts = { }
+        reduces = { }
+        accept = [ ]
+        for name, t in self.action[state].items():
+            tid = self.ids[name]
+            if t > 0:
+                shifts.setdefault(t, [ ]).append(tid)
+            elif t < 0:
+                reduces.setdefault(-t, [ ]).append(tid)
+            else:
+                accept.append(tid)
+        # primero los grupos con más tokens
+        groups = [ (len(tokens), 0, target, tokens) for target, tokens in shifts.items() ]
+        groups += [ (len(tokens), 1, rule, tokens) for rule, tokens in reduces.items() ]
+        groups.sort(key=lambda g: (-g[0], g[1], g[2]))
+        if len(shifts) > 3:
+            # muchos destinos: un diccionario de desplazamientos del estado
+            out.append('%starget = shift_%d.get(t)' % (pad, state))
+            out.append('%sif target is not None:' % pad)
+            self.shift('target', out, indent + 4)
+            self.shift_tables.append('shift_%d = %r\n' % (state, { tid: target
+                                     for target, tokens in sorted(shifts.items()) for tid in tokens }))
+            groups = [ g for g in groups if g[1] ]
+        for count, kind, arg, tokens in groups:
+            out.append('%sif %s: # %s' % (pad, self.test(tokens), self.names(tokens)))
+            if kind == 0:
+                self.shift(str(arg), out, indent + 4)
+            else:
+                self.reduce(arg, out, indent + 4, depth, True)
+        if accept:
+            out.append('%sif %s:' % (pad, self.test(accept)))
+            out.append('%s    return ACCEPT' % pad)
+        out.append('%sreturn ERROR' % pad)
+
+    def shift(self, target, out, indent):
+        pad = ' ' * indent
+        out.append('%sstates.append(%s)' % (pad, target))
+        out.append('%svalues.append(la.value)' % pad)
+        out.append('%sla = None' % pad)
+        out.append('%sif errorcount:' % pad)
+        out.append('%s    errorcount -= 1' % pad)
+        out.append('%sreturn %s' % (pad, target))
+
+    def source(self):
+        self.shift_tables = [ ]
+        states = [ ]
+        for state in range(self.nstates):
+            body = [ ]
+            self.state(state, body, 8, 0, False)
+            text = '\n'.join(body)
+            nonlocals = [ name for name in ('la', 'errorcount') if (name + ' = ') in text or (name + ' -= ') in text ]
+            states.append('    def s%d():\n' % state +
+                          ('        nonlocal %s\n' % ', '.join(nonlocals) if nonlocals else '') +
+                          text + '\n')
+        functions = sorted(set(prod.func for prod in self.productions[1:] if prod.callable is not None))
+        return runtime % {
+            'terminals': tuple(self.terminals),
+            'end': self.ids['$end'],
+            'errtok': self.ids['error'],
+            'functions': ''.join('    %s = module.%s\n' % (f, f) for f in functions),
+            'states': '\n'.join(states),
+            'table': ', '.join('s%d' % s for s in range(self.nstates)),
+            'gotos': self.goto_tables() + ''.join(self.shift_tables),
+        }
+
+# Texto del módulo generado para la gramática de 'module' (por omisión rust_yacc)
+def generate(module=None):
+    if module is None:
+        import rust_yacc as module
+    return Generator(module.parser, module).source()
+
+# Escribir el módulo generado en 'path' (por omisión en la caché de tablas)
+def write(path=None, module=None):
+    if module is None:
+        import rust_yacc as module
+    if path is None:
+        if not rust_tables.writable():
+            raise GenerationError("no se puede escribir en '%s'" % rust_tables.cache_dir)
+        path = os.path.join(rust_tables.cache_dir, module_name(module) + '.py')
+        # módulos de otras versiones de la gramática
+        for old in glob.glob(os.path.join(rust_tables.cache_dir, 'rustgen_*.py')):
+            if old != path:
+                os.remove(old)
+    text = generate(module)
+    with open(path, 'w') as out:
+        out.write(text)
+    return path
+
+loaded = { } # nombre -> módulo generado
+
+# Módulo generado para la gramática de 'module' (se genera si no está en la caché)
+def load(module=None):
+    if module is None:
+        import rust_yacc as module
+    name = module_name(module)
+    if name not in loaded:
+        path = os.path.join(rust_tables.cache_dir, name + '.py')
+        if not os.path.exists(path):
+            if rust_tables.writable():
+                write(path, module)
+            else:
+                # sin caché: cargar desde el texto
+                generated = type(sys)(name)
+                exec(compile(generate(module), name, 'exec'), generated.__dict__)
+                loaded[name] = generated
+                return generated
+        spec = importlib.util.spec_from_file_location(name, path)
+        generated = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(generated)
+        loaded[name] = generated
+    return loaded[name]
+
+# Comparar el analizador generado con rust_yacc.parse (AST, errores y alcances) en
+# 'paths'; regresa el número de archivos distintos
+def check(paths):
+    import rust_scanner
+    import rust_yacc
+    reference = rust_yacc.RustParser(verbose=False)
+    generated = rust_yacc.RustParser(verbose=False, generated=True)
+    failed = 0
+    for path in paths:
+        with open(path, 'r') as file:
+            data = file.read()
+        # el generado también con la entrada como bytes y como mmap (tablas de bytes)
+        results = [ ]
+        for session, source in ((reference, data), (generated, data), (generated, data.encode()),
+                                (generated, rust_scanner.map_file(path))):
+            session.keep_scopes = True
+            ast = session.parse(source)
+            results.append((None if ast is None else str(ast), session.errors, str(session.symbols)))
+        same = all(result == results[0] for result in results)
+        print("%-4s %s" % ("ok" if same else "FAIL", path))
+        failed += not same
+    return failed
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser(usage="python rust_codegen.py [-o archivo.py] [--check [archivo ...]]")
+    args.add_argument('-o', '--output', default=None,
+                      help="archivo del módulo generado (por omisión en %s)" % rust_tables.cache_dir)
+    args.add_argument('--check', nargs='*', default=None, metavar='archivo',
+                      help="comparar con rust_yacc.parse (por omisión ../tests/*.rs y ../tests/errors/*.rs)")
+    opts = args.parse_args()
+    if opts.check is not None:
+        here = os.path.dirname(os.path.abspath(__file__))
+        paths = opts.check or sorted(glob.glob(os.path.join(here, '..', 'tests', '*.rs')) +
+                                     glob.glob(os.path.join(here, '..', 'tests', 'errors', '*.rs')))
+        failed = check(paths)
+        print("%d archivos, %d distintos" % (len(paths), failed))
+        exit(1 if failed else 0)
+    print("Analizador generado: %s" % write(opts.output))
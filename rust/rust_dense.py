@@ -0,0 +1,292 @@
+# Analizador LR con tablas densas de enteros (array('i')) en lugar de los diccionarios
+# de ply ({estado: {nombre del token: acción}}).
+#
+# Terminales y no terminales se numeran al construir las tablas: los terminales con el
+# mismo id que les da el lexer (su índice en rust_lex.tokens, ver
+# rust_scanner.get_tables(numbered=True)), seguidos de '$end' y 'error'. Cada estado es
+# una fila de un solo arreglo con una columna por terminal (acción), una por no
+# terminal (goto) y una con la reducción por omisión del estado. Los estados se guardan
+# ya multiplicados por el ancho de la fila, así que una acción es table[estado + token]
+# y un goto es table[estado + columna de la regla], sin multiplicar ni buscar cadenas.
+#
+# Las reducciones usan el protocolo ligero de rust_lean: la pila guarda los valores (no
+# objetos YaccSymbol) y las acciones se llaman con los valores como argumentos; una
+# regla unitaria (expr -> literal) sólo reemplaza el valor del tope de la pila.
+#
+# DenseParser tiene la misma interfaz que el LRParser de ply en lo que usa RustParser
+# (parse, token, restart, errorfunc, symbols); se usa con RustParser(dense=True).
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+from array import array
+
+from ply.yacc import YaccSymbol, error_count
+
+import rust_lean
+from rust_lean import Production
+
+# Celda sin acción (error de sintaxis)
+NONE = -(1 << 31)
+
+class DenseTables:
+    # 'parser': LRParser de ply con las tablas LALR; 'terminals': nombres de los
+    # terminales en el orden de los ids del lexer. La pila sólo guarda valores, así que
+    # no se admiten gramáticas con reglas de recuperación ('error').
+    def __init__(self, parser, terminals):
+        if any('error' in row for row in parser.action.values()):
+            raise ValueError("rust_dense no admite reglas con 'error'")
+        self.terminals = list(terminals) + [ '$end', 'error' ]
+        self.term_ids = { name: i for i, name in enumerate(self.terminals) }
+        self.end = self.term_ids['$end']
+        self.error = self.term_ids['error']
+        productions = parser.productions
+        names = { prod.name for prod in productions }
+        for row in parser.goto.values():
+            names.update(row)
+        self.nonterminals = sorted(names)
+        nonterm_ids = { name: i for i, name in enumerate(self.nonterminals) }
+
+        nterms = len(self.terminals)
+        self.width = width = nterms + len(self.nonterminals) + 1
+        self.default = width - 1    # columna de la reducción por omisión
+        nstates = max(parser.action) + 1
+        self.nstates = nstates
+        table = array('i', [ NONE ]) * (nstates * width)
+        for state, row in parser.action.items():
+            base = state * width
+            for name, t in row.items():
+                # desplazar: estado destino (multiplicado); reducir: -regla; aceptar: 0
+                table[base + self.term_ids[name]] = t * width if t > 0 else t
+        for state, row in parser.goto.items():
+            base = state * width
+            for name, target in row.items():
+                table[base + nterms + nonterm_ids[name]] = target * width
+        for state, t in parser.defaulted_states.items():
+            table[state * width + self.default] = t * width if t > 0 else t
+        self.table = table
+
+        # por regla: columna del goto, longitud y acción
+        self.gotos = array('i', [ nterms + nonterm_ids[prod.name] for prod in productions ])
+        self.lens = array('i', [ prod.len for prod in productions ])
+        self.callables = [ prod.callable for prod in productions ]
+        # acciones con el protocolo ligero (make(parser) o None si no se derivan)
+        self.makers = [ None if prod.callable is None else rust_lean.derive(prod.callable, prod.len)
+                        for prod in productions ]
+
+    # Bytes que ocupan los arreglos
+    @property
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (self.table, self.gotos, self.lens))
+
+# Convierte los tipos de los tokens de 'get_token' (nombres) a ids
+def numbered(get_token, ids):
+    def token():
+        t = get_token()
+        if t is not None:
+            t.type = ids[t.type]
+        return t
+    return token
+
+class DenseParser:
+    def __init__(self, tables, errorf=None):
+        self.tables = tables
+        self.errorfunc = errorf
+        self.callables = tables.callables
+        self.lean = [ None if make is None else make(self) for make in tables.makers ]
+        self.symbols = None     # los usan las acciones (p.parser.symbols, p.parser.emit)
+        self.arena = None       # arena de los nodos del análisis en curso (p.parser.arena)
+        self.emit = None
+        self.statestack = None
+        self.symstack = None
+        self.errorok = True
+
+    # Siguiente token para el manejador de errores, con el tipo como nombre
+    def token(self):
+        t = self.get_token()
+        if t is not None:
+            t.type = self.tables.terminals[t.type]
+        return t
+
+    def errok(self):
+        self.errorok = True
+
+    def restart(self):
+        del self.statestack[:]
+        del self.symstack[:]
+        self.symstack.append(None)  # valor de '$end'
+        self.statestack.append(0)
+
+    # Mismos pasos que LRParser.parseopt_notrack (incluida la recuperación de errores),
+    # con las tablas de enteros y la pila de valores. Los tokens de 'lexer' traen el id
+    # de su tipo si es un rust_scanner.Scanner con tablas numeradas; los de otros
+    # lexers se convierten al leerlos.
+    def parse(self, input=None, lexer=None, debug=False, tracking=False, tokenfunc=None):
+        if debug or tracking:
+            raise ValueError("DenseParser no admite debug ni tracking")
+        tables = self.tables
+        table = tables.table
+        gotos = tables.gotos
+        lens = tables.lens
+        callables = self.callables
+        lean = self.lean
+        default = tables.default
+        end = tables.end
+        error = tables.error
+        lookahead = None
+        lookaheadstack = [ ]
+        errorcount = 0
+
+        if input is not None:
+            lexer.input(input)
+        get_token = tokenfunc or lexer.token
+        if not getattr(getattr(lexer, 'tables', None), 'numbered', False):
+            get_token = numbered(get_token, tables.term_ids)
+        self.get_token = get_token
+
+        statestack = [ 0 ]
+        self.statestack = statestack
+        values = [ None ]   # valor de cada símbolo de la pila ('$end' abajo)
+        self.symstack = values
+        errtoken = None
+
+        state = 0
+        while True:
+            t = table[state + default]
+            if t == NONE:
+                if lookahead is None:
+                    if not lookaheadstack:
+                        lookahead = get_token()
+                    else:
+                        lookahead = lookaheadstack.pop()
+                    if lookahead is None:
+                        lookahead = YaccSymbol()
+                        lookahead.type = end
+                t = table[state + lookahead.type]
+
+            if t != NONE:
+                if t > 0:
+                    # desplazar
+                    statestack.append(t)
+                    state = t
+                    values.append(lookahead.value)
+                    lookahead = None
+                    if errorcount:
+                        errorcount -= 1
+                    continue
+
+                if t < 0:
+                    # reducir por la regla -t
+                    rule = -t
+                    n = lens[rule]
+                    f = lean[rule]
+                    self.state = state
+                    try:
+                        if f is None:
+                            p = Production(self, lexer, values, n)
+                            callables[rule](p)
+                            value = p.value
+                        elif n == 1:
+                            # regla unitaria: el valor y el estado se reemplazan en su lugar
+                            values[-1] = f(values[-1])
+                            state = table[statestack[-2] + gotos[rule]]
+                            statestack[-1] = state
+                            continue
+                        elif n == 2:
+                            value = f(values[-2], values[-1])
+                        elif n == 0:
+                            value = f()
+                        elif n == 3:
+                            value = f(values[-3], values[-2], values[-1])
+                        elif n == 4:
+                            value = f(values[-4], values[-3], values[-2], values[-1])
+                        else:
+                            value = f(*values[-n:])
+                    except SyntaxError:
+                        # como ply: se descarta el último símbolo de la regla y el token
+                        # de error pasa a ser el lookahead
+                        lookaheadstack.append(lookahead)
+                        if n:
+                            values.pop()
+                        statestack.pop()
+                        state = statestack[-1]
+                        sym = YaccSymbol()
+                        sym.type = error
+                        sym.value = 'error'
+                        lookahead = sym
+                        errorcount = error_count
+                        self.errorok = False
+                        continue
+                    if n:
+                        if n > 1:
+                            del values[1-n:]
+                            del statestack[1-n:]
+                        values[-1] = value
+                        state = table[statestack[-2] + gotos[rule]]
+                        statestack[-1] = state
+                    else:
+                        values.append(value)
+                        state = table[state + gotos[rule]]
+                        statestack.append(state)
+                    continue
+
+                # aceptar
+                return values[-1]
+
+            # error de sintaxis (como en ply)
+            if errorcount == 0 or self.errorok:
+                errorcount = error_count
+                self.errorok = False
+                errtoken = lookahead
+                if errtoken.type == end:
+                    errtoken = None
+                if self.errorfunc:
+                    if errtoken and not hasattr(errtoken, 'lexer'):
+                        errtoken.lexer = lexer
+                    self.state = state
+                    tok = self.errorfunc(errtoken)
+                    if self.errorok:
+                        lookahead = tok
+                        errtoken = None
+                        continue
+                else:
+                    if errtoken:
+                        lineno = getattr(lookahead, 'lineno', 0)
+                        if lineno:
+                            sys.stderr.write('yacc: Syntax error at line %d, token=%s\n' % (lineno, tables.terminals[errtoken.type]))
+                        else:
+                            sys.stderr.write('yacc: Syntax error, token=%s' % tables.terminals[errtoken.type])
+                    else:
+                        sys.stderr.write('yacc: Parse error in input. EOF\n')
+                        return
+            else:
+                errorcount = error_count
+
+            # sólo queda el estado inicial: descartar el token y seguir
+            if len(statestack) <= 1 and lookahead.type != end:
+                lookahead = None
+                errtoken = None
+                state = 0
+                del lookaheadstack[:]
+                continue
+
+            # fin de la entrada con estados en la pila: no hay recuperación
+            if lookahead.type == end:
+                return
+
+            if lookahead.type != error:
+                # el token de error es el nuevo lookahead (la pila nunca tiene un
+                # símbolo 'error': la gramática no tiene reglas con él)
+                t = YaccSymbol()
+                t.type = error
+                if hasattr(lookahead, 'lineno'):
+                    t.lineno = t.endlineno = lookahead.lineno
+                if hasattr(lookahead, 'lexpos'):
+                    t.lexpos = t.endlexpos = lookahead.lexpos
+                t.value = lookahead
+                lookaheadstack.append(lookahead)
+                lookahead = t
+            else:
+                values.pop()
+                statestack.pop()
+                state = statestack[-1]
@@ -0,0 +1,509 @@
+# Intérprete (evaluador por recorrido del árbol) para los AST de rust_yacc
+#
+# Cada tipo de nodo tiene su método 'eval_<tipo>'; la tabla de despacho se indexa
+# con el id de tipo que guarda el Arena, así que evaluar un nodo es una búsqueda en
+# una lista, sin cadenas de if/elif ni comparaciones de cadenas.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import rust_ast
+
+# Error en tiempo de ejecución
+class RustError(Exception):
+    pass
+
+# Señales de control de flujo (se propagan como excepciones)
+class BreakSignal(Exception):
+    pass
+
+class ContinueSignal(Exception):
+    pass
+
+class ReturnSignal(Exception):
+    def __init__(self, value):
+        self.value = value
+
+# Alcance de variables (encadenado a su alcance padre)
+class Env:
+    def __init__(self, parent=None):
+        self.vars = { }
+        self.parent = parent
+
+    def find(self, name):
+        env = self
+        while env is not None:
+            if name in env.vars:
+                return env
+            env = env.parent
+        raise RustError("Variable no definida '%s'" % name)
+
+    def get(self, name):
+        return self.find(name).vars[name]
+
+    def set(self, name, value):
+        self.find(name).vars[name] = value
+
+    def define(self, name, value):
+        self.vars[name] = value
+
+# Nombres que ve una función anidada de los alcances que la rodean: como en Rust,
+# sólo sus funciones (fn), no sus variables locales ni parámetros
+class Items:
+    def __init__(self, env):
+        self.env = env
+
+    # Alcance de la definición más cercana de 'name' (sin llegar al global) o None
+    def scope(self, name):
+        env = self.env
+        while env.parent is not None:
+            if name in env.vars:
+                return env
+            env = env.parent
+        return None
+
+    def __contains__(self, name):
+        env = self.scope(name)
+        return env is not None and isinstance(env.vars[name], Function)
+
+    def __getitem__(self, name):
+        return self.scope(name).vars[name]
+
+    def __setitem__(self, name, value):
+        raise RustError("No se puede asignar a la función '%s'" % name)
+
+# Función definida con fn
+class Function:
+    def __init__(self, name, params, body, env):
+        self.name = name
+        self.params = params    # nombres de los parámetros
+        self.body = body        # índice del bloque
+        self.env = env          # alcance donde se definió (ver Items)
+
+    def __repr__(self):
+        return "fn %s(%s)" % (self.name, ", ".join(self.params))
+
+# -- Operaciones -- #
+
+# División y residuo enteros de Rust (truncan hacia cero)
+def int_div(a, b):
+    if b == 0:
+        raise RustError("División entre cero")
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+def int_rem(a, b):
+    return a - b * int_div(a, b)
+
+def divide(a, b):
+    if isinstance(a, int) and isinstance(b, int) and not isinstance(a, bool):
+        return int_div(a, b)
+    if b == 0:
+        raise RustError("División entre cero")
+    return a / b
+
+def reminder(a, b):
+    if isinstance(a, int) and isinstance(b, int) and not isinstance(a, bool):
+        return int_rem(a, b)
+    if b == 0:
+        raise RustError("División entre cero")
+    return a - b * int(a / b)
+
+operators = {
+    '+'  : lambda a, b: a + b,
+    '-'  : lambda a, b: a - b,
+    '*'  : lambda a, b: a * b,
+    '/'  : divide,
+    '%'  : reminder,
+    '&'  : lambda a, b: a & b,
+    '|'  : lambda a, b: a | b,
+    '^'  : lambda a, b: a ^ b,
+    '==' : lambda a, b: a == b,
+    '!=' : lambda a, b: a != b,
+    '<'  : lambda a, b: a < b,
+    '>'  : lambda a, b: a > b,
+    '<=' : lambda a, b: a <= b,
+    '>=' : lambda a, b: a >= b,
+}
+
+# Precedencia de operadores binarios (la misma que declara rust_yacc)
+op_precedence = {
+    '==' : 1, '!=' : 1, '<' : 1, '>' : 1, '<=' : 1, '>=' : 1,
+    '|'  : 2,
+    '^'  : 3,
+    '&'  : 4,
+    '+'  : 5, '-' : 5,
+    '*'  : 6, '/' : 6, '%' : 6,
+}
+
+def apply(op, a, b):
+    try:
+        return operators[op](a, b)
+    except TypeError:
+        raise RustError("Operación '%s' inválida entre %r y %r" % (op, a, b))
+
+# Bits de los tipos enteros (isize/usize como 64 bits)
+int_bits = {
+    'i8' : 8, 'i16' : 16, 'i32' : 32, 'i64' : 64, 'i128' : 128, 'isize' : 64,
+    'u8' : 8, 'u16' : 16, 'u32' : 32, 'u64' : 64, 'u128' : 128, 'usize' : 64,
+}
+
+# Conversión con 'as'
+def cast(value, type):
+    if type in int_bits:
+        if isinstance(value, str):
+            value = ord(value)
+        value = int(value)
+        bits = int_bits[type]
+        value &= (1 << bits) - 1
+        if type[0] == 'i' and value >= 1 << (bits - 1):
+            value -= 1 << bits
+        return value
+    if type in ('f32', 'f64'):
+        return float(value)
+    if type == 'char':
+        return chr(value) if isinstance(value, int) else value
+    if type == 'bool':
+        return bool(value)
+    raise RustError("Tipo desconocido '%s'" % type)
+
+# Valor de una literal a partir del texto de su hoja
+def number(text):
+    if '.' in text or 'E' in text:
+        return float(text)
+    return int(text)
+
+# Ids de los tipos de nodo que se revisan durante la evaluación
+EXPR = rust_ast.type_id('expr')
+LITERAL = rust_ast.type_id('literal')
+PAREN_EXPR = rust_ast.type_id('paren_expr')
+ID_LIT = rust_ast.type_id('id_lit')
+EMPTY = rust_ast.type_id('empty')
+INIT = rust_ast.type_id('init')
+BINOP = rust_ast.type_id('binop')
+BINOP_EXPR = rust_ast.type_id('binop_expr')
+STMT = rust_ast.type_id('stmt')
+DECL_STMT = rust_ast.type_id('decl_stmt')
+ITEM = rust_ast.type_id('item')
+FN_ITEM = rust_ast.type_id('fn_item')
+BLOCK_A = rust_ast.type_id('block_a')
+BLOCK_B = rust_ast.type_id('block_b')
+
+# -- Evaluador -- #
+
+class Evaluator:
+    def __init__(self):
+        self.globals = Env()
+        self.arena = None
+        self.table = [ ]
+        self.block_functions = { } # bloque -> sus fn (ver eval_block)
+
+    # Tabla de despacho: id de tipo -> método eval_<tipo>
+    def build_table(self):
+        self.table = [ getattr(self, 'eval_' + name, self.eval_unknown) for name in rust_ast.type_names ]
+
+    def eval(self, i, env):
+        return self.table[self.types[i]](i, env)
+
+    def children(self, i):
+        return self.arena.children(i)
+
+    # Ejecutar un programa: declarar sus items y sentencias y llamar a main
+    def run(self, ast, entry='main'):
+        self.arena = ast.arena
+        self.types = ast.arena.types
+        self.leaves = ast.arena.leaves
+        self.block_functions = { }
+        self.build_table()
+        self.eval(ast.index, self.globals)
+        if entry not in self.globals.vars:
+            return None
+        return self.call(self.globals.get(entry), [ ])
+
+    def call(self, function, args):
+        if not isinstance(function, Function):
+            raise RustError("'%r' no es una función" % (function,))
+        if len(args) != len(function.params):
+            raise RustError("La función '%s' recibe %d argumentos (%d dados)" % (function.name, len(function.params), len(args)))
+        env = Env(function.env)
+        for name, value in zip(function.params, args):
+            env.define(name, value)
+        try:
+            return self.eval(function.body, env)
+        except ReturnSignal as r:
+            return r.value
+        except (BreakSignal, ContinueSignal):
+            raise RustError("break/continue fuera de un ciclo en '%s'" % function.name)
+
+    # Nodos con un solo hijo que sólo lo envuelven
+    def eval_single(self, i, env):
+        return self.eval(self.arena.first[i], env)
+
+    eval_program = eval_single
+    eval_decl_stmt = eval_single
+    eval_item = eval_single
+    eval_expr = eval_single
+    eval_literal = eval_single
+    eval_paren_expr = eval_single
+    eval_block_e = eval_single
+    eval_else = eval_single
+
+    def eval_unknown(self, i, env):
+        raise RustError("No se puede evaluar el nodo '%s'" % rust_ast.type_names[self.types[i]])
+
+    # Secuencias: el valor es el del último hijo
+    def eval_list_stmt(self, i, env):
+        value = None
+        for child in self.children(i):
+            value = self.eval(child, env)
+        return value
+
+    def eval_stmt(self, i, env):
+        child = self.arena.first[i]
+        if child != -1:
+            self.eval(child, env)
+        return None
+
+    def eval_expr_stmt(self, i, env):
+        self.eval(self.arena.first[i], env)
+        return None
+
+    def eval_empty(self, i, env):
+        return None
+
+    # Bloques: nuevo alcance; block_a no tiene valor, block_b vale su expresión final
+    # Las funciones de un bloque se definen al entrar a él (como los items de Rust): una
+    # función anidada puede llamar a otra del bloque declarada más abajo
+    def eval_block(self, i, env):
+        env = Env(env)
+        functions = self.block_functions.get(i)
+        if functions is None:
+            functions = self.block_functions[i] = self.functions(self.arena.first[i])
+        for node in functions:
+            self.eval_fn_item(node, env)
+        return self.eval(self.arena.first[i], env)
+
+    # Nodos fn_item de las sentencias de 'i' (block_a o block_b)
+    def functions(self, i):
+        result = [ ]
+        if self.types[i] not in (BLOCK_A, BLOCK_B):
+            return result
+        first = self.arena.first
+        for stmt in self.children(i):
+            node = first[stmt] # stmt -> decl_stmt (o nada si es ';')
+            if self.types[stmt] != STMT or node == -1 or self.types[node] != DECL_STMT:
+                continue
+            node = first[node]
+            if self.types[node] == ITEM:
+                node = first[node]
+            if self.types[node] == FN_ITEM:
+                result.append(node)
+        return result
+
+    def eval_block_a(self, i, env):
+        for child in self.children(i):
+            self.eval(child, env)
+        return None
+
+    eval_block_b = eval_list_stmt
+
+    # -- Declaraciones -- #
+
+    def eval_fn_item(self, i, env):
+        params_node, body = self.children(i)
+        name = self.leaves[i]
+        if env is not self.globals:
+            # función anidada: no captura las variables del alcance donde se define
+            scope = Env(self.globals)
+            scope.vars = Items(env)
+        else:
+            scope = env
+        env.define(name, Function(name, self.param_names(params_node), body, scope))
+        return None
+
+    # Nombres de los parámetros de una función (paren_expr_list de id_lit)
+    def param_names(self, i):
+        names = [ ]
+        for expr in self.children(self.arena.first[i]):
+            node = expr
+            while self.types[node] in (EXPR, LITERAL):
+                node = self.arena.first[node]
+            if self.types[node] == EMPTY:
+                continue
+            if self.types[node] != ID_LIT:
+                raise RustError("Parámetro inválido en la función")
+            names.append(self.leaves[node])
+        return names
+
+    def eval_const_item(self, i, env):
+        type_node, expr = self.children(i)
+        env.define(self.leaves[i], self.eval(expr, env))
+        return None
+
+    eval_static_item = eval_const_item
+
+    def eval_let_decl(self, i, env):
+        value = None
+        for child in self.children(i):
+            if self.types[child] == INIT:
+                value = self.eval(self.arena.first[child], env)
+        env.define(self.leaves[i], value)
+        return None
+
+    # -- Expresiones -- #
+
+    def eval_string_lit(self, i, env):
+        return self.leaves[i][1:-1]
+
+    def eval_char_lit(self, i, env):
+        return self.leaves[i][1:-1]
+
+    def eval_num_lit(self, i, env):
+        return number(self.leaves[i])
+
+    def eval_bool_lit(self, i, env):
+        return self.leaves[i] == 'true'
+
+    def eval_id_lit(self, i, env):
+        return env.get(self.leaves[i])
+
+    # El analizador agrupa 'expr binop expr' por la derecha y sin precedencia, así que
+    # la cadena de operaciones (sin paréntesis) se aplana y se evalúa con precedencia
+    def eval_binop_expr(self, i, env):
+        first, nxt = self.arena.first, self.arena.next
+        if nxt[first[i]] == -1:
+            return self.eval(first[i], env) # type_cast, assignment o compound_assignment
+        values = [ ]
+        ops = [ ]
+        node = i
+        while True:
+            left, op, right = self.children(node)
+            values.append(self.eval(left, env))
+            ops.append(self.operator(op))
+            inner = first[right]
+            if self.types[inner] == BINOP_EXPR and nxt[first[inner]] != -1:
+                node = inner
+                continue
+            values.append(self.eval(right, env))
+            return self.reduce(values, ops)
+
+    # Texto de un operador (binop, arith_op, bitwise_op o comp_op)
+    def operator(self, i):
+        if self.types[i] == BINOP:
+            i = self.arena.first[i]
+        return self.leaves[i]
+
+    def eval_type_cast(self, i, env):
+        return cast(env.get(self.leaves[i]), self.leaves[self.arena.first[i]])
+
+    # Nombre de la variable en el lado izquierdo de una asignación
+    def target(self, i):
+        node = i
+        while self.types[node] in (EXPR, LITERAL, PAREN_EXPR):
+            node = self.arena.first[node]
+        if self.types[node] != ID_LIT:
+            raise RustError("Sólo se puede asignar a variables")
+        return self.leaves[node]
+
+    def eval_assignment(self, i, env):
+        left, right = self.children(i)
+        env.set(self.target(left), self.eval(right, env))
+        return None
+
+    def eval_compound_assignment(self, i, env):
+        left, op, right = self.children(i)
+        name = self.target(left)
+        scope = env.find(name)
+        scope.vars[name] = apply(self.leaves[op], scope.vars[name], self.eval(right, env))
+        return None
+
+    def arguments(self, i, env):
+        return [ self.eval(child, env) for child in self.children(self.arena.first[i])
+                 if self.types[child] != EMPTY ]
+
+    def eval_call_expr(self, i, env):
+        callee, args = self.children(i)
+        return self.call(self.eval(callee, env), self.arguments(args, env))
+
+    def eval_method_call(self, i, env):
+        raise RustError("Método no definido '%s'" % self.leaves[i])
+
+    # Condiciones: literales y operadores en una lista plana, evaluada con precedencia
+    def eval_cond_expr(self, i, env):
+        values = [ ]
+        ops = [ ]
+        node = i
+        while True:
+            literal, *rest = self.children(node)
+            values.append(self.eval(literal, env))
+            if not rest:
+                break
+            op, node = self.children(rest[0])
+            ops.append(self.operator(op))
+        return self.reduce(values, ops)
+
+    def reduce(self, values, ops):
+        out = [ values[0] ]
+        pending = [ ]
+        for op, value in zip(ops, values[1:]):
+            while pending and op_precedence[pending[-1]] >= op_precedence[op]:
+                b = out.pop()
+                out.append(apply(pending.pop(), out.pop(), b))
+            pending.append(op)
+            out.append(value)
+        while pending:
+            b = out.pop()
+            out.append(apply(pending.pop(), out.pop(), b))
+        return out[0]
+
+    def eval_while(self, i, env):
+        cond, body = self.children(i)
+        while self.eval(cond, env):
+            try:
+                self.eval(body, env)
+            except BreakSignal:
+                break
+            except ContinueSignal:
+                continue
+        return None
+
+    def eval_loop(self, i, env):
+        body = self.arena.first[i]
+        while True:
+            try:
+                self.eval(body, env)
+            except BreakSignal:
+                break
+            except ContinueSignal:
+                continue
+        return None
+
+    def eval_break(self, i, env):
+        raise BreakSignal()
+
+    def eval_continue(self, i, env):
+        raise ContinueSignal()
+
+    def eval_return(self, i, env):
+        child = self.arena.first[i]
+        raise ReturnSignal(None if child == -1 else self.eval(child, env))
+
+    def eval_if(self, i, env):
+        children = self.children(i)
+        if self.eval(children[0], env):
+            return self.eval(children[1], env)
+        if len(children) == 3:
+            return self.eval(children[2], env)
+        return None
+
+# Texto de un valor como lo mostraría Rust
+def display(value):
+    if value is None:
+        return "()"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+# Ejecutar un AST; regresa el valor de main (o None)
+def run(ast, entry='main'):
+    return Evaluator().run(ast, entry)
@@ -0,0 +1,425 @@
+# Análisis incremental de un texto que se edita (p. ej. desde un editor)
+#
+# Document guarda el texto, su AST y la estructura de sentencias y bloques del texto.
+# Tras una edición sólo se vuelve a analizar (léxica y sintácticamente) la unidad más
+# chica que contiene la edición: una sentencia de una lista (la lista principal o la
+# de un bloque) o un bloque { ... } completo. Los nodos nuevos se crean en el mismo
+# arena y se enlazan en lugar de los anteriores; el resto del árbol no se toca.
+#
+# Si la unidad no se puede analizar por sí sola (la edición rompe un bloque, abre un
+# comentario que sigue más allá de la unidad, deja un error de sintaxis, ...) se
+# prueba con la unidad que la contiene, hasta llegar al análisis completo. Así el
+# resultado (AST o errores) es siempre el mismo que el de rust_yacc.parse.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import copy
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+import rust_scanner
+import rust_yacc
+from rust_ast import type_id
+
+# -- Estructura del texto -- #
+# Level: lista de sentencias (la del programa o la de un bloque) y su nodo de lista
+# Segment: texto de una sentencia (desde el fin de la anterior hasta su ';' o '}') y
+# su nodo; la última sentencia de una lista llega hasta el fin de la lista. 'tail'
+# indica la expresión final de un bloque (block_e), que no es una sentencia.
+# Block: bloque { ... } dentro de una sentencia: posición relativa al inicio de la
+# sentencia, tamaño, nodo 'block' y el padre y hermano anterior de ese nodo.
+# Las posiciones son relativas, así que una edición sólo cambia los tamaños de las
+# unidades que la contienen.
+
+class Level:
+    __slots__ = ('node', 'segments', 'lengths', 'cached')
+
+    def __init__(self, node, segments, lengths):
+        self.node = node
+        self.segments = segments
+        self.lengths = lengths
+        self.cached = None
+
+    # Inicio (relativo al inicio de la lista) de cada sentencia, y el fin de la última
+    def starts(self):
+        if self.cached is None:
+            self.cached = list(accumulate(self.lengths, initial=0))
+        return self.cached
+
+class Segment:
+    __slots__ = ('node', 'tail', 'blocks')
+
+    def __init__(self, node, tail, blocks):
+        self.node = node
+        self.tail = tail
+        self.blocks = blocks
+
+class Block:
+    __slots__ = ('offset', 'length', 'node', 'parent', 'prev', 'level')
+
+    def __init__(self, offset, length, node, parent, prev, level):
+        self.offset = offset
+        self.length = length
+        self.node = node
+        self.parent = parent
+        self.prev = prev
+        self.level = level
+
+# Los tokens no coinciden con el AST (no debería pasar con un análisis sin errores)
+class Mismatch(Exception):
+    pass
+
+# Carácter ilegal dentro de una unidad: se deja al análisis completo (que lo reporta)
+class Illegal(Exception):
+    pass
+
+def illegal(t):
+    raise Illegal()
+
+BLOCK = type_id('block')
+EMPTY = type_id('empty')
+BLOCK_A = type_id('block_a')
+BLOCK_B = type_id('block_b')
+BLOCK_E = type_id('block_e')
+
+spaces = re.compile(r'[ \t\n]*')
+
+# Lexer con tokens ya calculados (los de una unidad)
+class ListLexer:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.lineno = 1
+        self.token = self.generate().__next__
+
+    def generate(self):
+        yield from self.tokens
+        while True:
+            yield None
+
+# Arma la estructura de los tokens [i, j) con los nodos del AST ya analizado
+class Builder:
+    def __init__(self, arena, types, starts, ends):
+        self.arena = arena
+        self.types = types      # nombre del tipo de cada token
+        self.starts = starts    # posición inicial de cada token
+        self.ends = ends        # posición final de cada token
+        self.match = { }        # '{' -> '}' correspondiente
+        stack = [ ]
+        for k, type in enumerate(types):
+            if type == 'LBRACKET':
+                stack.append(k)
+            elif type == 'RBRACKET':
+                if not stack:
+                    raise Mismatch()
+                self.match[stack.pop()] = k
+        if stack:
+            raise Mismatch()
+
+    # Sentencias (rangos de tokens) y expresión final de los tokens [i, j) de una lista,
+    # y los bloques de primer nivel de cada una
+    def split(self, i, j):
+        types = self.types
+        match = self.match
+        ranges = [ ]
+        blocks = [ ]
+        first = i
+        k = i
+        while k < j:
+            type = types[k]
+            if type == 'LBRACKET':
+                blocks.append(k)
+                k = match[k]
+                if types[first] == 'FN': # fn ... { ... } termina en su '}'
+                    ranges.append((first, k + 1, blocks))
+                    first = k + 1
+                    blocks = [ ]
+            elif type == 'SEMICOLON':
+                ranges.append((first, k + 1, blocks))
+                first = k + 1
+                blocks = [ ]
+            k += 1
+        tail = (first, j, blocks) if first < j else None
+        return ranges, tail
+
+    # Lista de sentencias con los tokens [i, j), el texto [begin, end) y el nodo 'node'
+    # (list_stmt o el hijo de un nodo 'block')
+    def level(self, i, j, begin, end, node):
+        a = self.arena
+        ranges, tail = self.split(i, j)
+        kind = a.types[node]
+        if kind == BLOCK_E:
+            stmts, tail_node = [ ], node
+        else:
+            stmts = a.children(node)
+            tail_node = None
+            if kind == BLOCK_B:
+                tail_node = stmts.pop()
+            elif kind == BLOCK_A and len(stmts) == 1 and a.types[stmts[0]] == EMPTY:
+                stmts = [ ]
+        if len(stmts) != len(ranges) or (tail is None) != (tail_node is None):
+            raise Mismatch()
+        if tail is not None:
+            ranges.append(tail)
+            stmts.append(tail_node)
+        segments = [ ]
+        lengths = [ ]
+        start = begin
+        for n, ((first, last, blocks), stmt) in enumerate(zip(ranges, stmts)):
+            stop = end if n == len(ranges) - 1 else self.ends[last - 1]
+            segments.append(self.segment(stmt, blocks, start, tail is not None and n == len(ranges) - 1))
+            lengths.append(stop - start)
+            start = stop
+        return Level(node, segments, lengths)
+
+    # Sentencia con nodo 'node' que empieza en 'start' y tiene los bloques dados ('{')
+    def segment(self, node, opens, start, tail=False):
+        found = find_blocks(self.arena, node)
+        if len(found) != len(opens):
+            raise Mismatch()
+        blocks = [ self.block(k, start, *info) for k, info in zip(opens, found) ]
+        return Segment(node, tail, blocks)
+
+    # Bloque del '{' en el token k, con su nodo, padre y hermano anterior
+    def block(self, k, start, node, parent, prev):
+        close = self.match[k]
+        begin = self.starts[k]
+        end = self.ends[close]
+        level = self.level(k + 1, close, begin + 1, end - 1, self.arena.first[node])
+        return Block(begin - start, end - begin, node, parent, prev, level)
+
+# Nodos 'block' de primer nivel bajo 'root' en orden del texto: (nodo, padre, anterior)
+def find_blocks(a, root):
+    types, first, nxt = a.types, a.first, a.next
+    found = [ ]
+    stack = [ ]
+
+    def push(node):
+        children = [ ]
+        prev = -1
+        child = first[node]
+        while child != -1:
+            children.append((child, node, prev))
+            prev = child
+            child = nxt[child]
+        stack.extend(reversed(children))
+
+    push(root)
+    while stack:
+        entry = stack.pop()
+        if types[entry[0]] == BLOCK:
+            found.append(entry)
+        else:
+            push(entry[0])
+    return found
+
+# Reemplazar el hijo 'old' de 'parent' (con hermano anterior 'prev', -1 si es el
+# primero) por la cadena de hermanos first..last
+def relink(a, parent, prev, old, first, last):
+    if prev == -1:
+        a.first[parent] = first
+    else:
+        a.next[prev] = first
+    a.next[last] = a.next[old]
+    if a.last[parent] == old:
+        a.last[parent] = last
+
+# Texto en edición con su AST
+class Document:
+    def __init__(self, text, session=None):
+        self.session = session or rust_yacc.RustParser(verbose=False)
+        tables = copy.copy(rust_scanner.get_tables())
+        tables.errorf = illegal
+        self.lexer = rust_scanner.Scanner(tables)
+        self.text = text
+        self.full_parses = 0
+        self.reparsed = 0   # caracteres analizados en la última edición
+        self.full()
+
+    # AST del texto actual (None si tiene errores de sintaxis)
+    @property
+    def ast(self):
+        return self.root
+
+    # Analizar todo el texto de nuevo
+    def full(self):
+        self.full_parses += 1
+        self.reparsed = len(self.text)
+        tokens = rust_scanner.tokenize(self.text)
+        self.root = self.session.parse(tokens)
+        self.errors = list(self.session.errors)
+        self.top = None
+        if self.root is None:
+            return
+        a = self.arena = self.root.arena
+        names = tokens.names
+        try:
+            builder = Builder(a, [ names[t] for t in tokens.types ], tokens.starts, tokens.ends)
+            self.top = builder.level(0, len(tokens), 0, len(self.text), a.first[self.root.index])
+        except Mismatch:
+            pass # sin estructura: cada edición analiza todo el texto
+        # los nodos reemplazados se quedan en el arena: al duplicarse, se analiza de nuevo
+        self.limit = 2 * len(a) + 4096
+
+    # Reemplazar el texto [start, end) por 'text' y actualizar el AST
+    def edit(self, start, end, text):
+        old = self.text
+        if not 0 <= start <= end <= len(old):
+            raise ValueError("rango fuera del texto")
+        self.text = old[:start] + text + old[end:]
+        delta = len(text) - (end - start)
+        if self.top is None:
+            return self.full()
+        path = self.locate(start, end)
+        for u in range(len(path) - 1, -1, -1):
+            if self.reparse(path[u], delta):
+                self.resize(path[:u], delta)
+                self.errors = [ ]
+                if len(self.arena) > self.limit:
+                    self.full()
+                return
+        self.full()
+
+    # Unidades que contienen [start, end), de la más externa a la más interna:
+    # (level, k, inicio) para la sentencia k de una lista y (segment, j, inicio) para
+    # el bloque j de una sentencia
+    def locate(self, start, end):
+        path = [ ]
+        level = self.top
+        base = 0
+        while True:
+            starts = level.starts()
+            n = len(level.segments)
+            k = bisect_right(starts, start - base) - 1
+            if k == n and n and start - base == starts[n]:
+                k = n - 1 # justo al final de la última sentencia
+            if not 0 <= k < n or end - base > starts[k + 1]:
+                return path
+            segment = level.segments[k]
+            begin = base + starts[k]
+            path.append((level, k, begin))
+            for j, block in enumerate(segment.blocks):
+                b = begin + block.offset
+                if b < start and end < b + block.length:
+                    path.append((segment, j, b))
+                    level = block.level
+                    base = b + 1
+                    break
+            else:
+                return path
+
+    # Tokens del texto [start, end) analizados en contexto (desde start); None si un
+    # token o comentario cruza 'end' o hay un carácter ilegal
+    def tokens(self, start, end):
+        lexer = self.lexer
+        text = self.text
+        lexer.input(text)
+        lexer.lexpos = start
+        token = lexer.token
+        tokens = [ ]
+        try:
+            t = token()
+            while t is not None and t.lexpos < end:
+                tokens.append(t)
+                t = token()
+        except Illegal:
+            return None
+        if tokens:
+            last = tokens[-1]
+            if last.lexpos + len(last.value) > end:
+                return None
+        # entre 'end' y el siguiente token sólo puede haber espacios
+        if spaces.match(text, end).end() < (t.lexpos if t is not None else len(text)):
+            return None
+        self.reparsed = end - start
+        return tokens
+
+    def reparse(self, entry, delta):
+        owner, index, start = entry
+        if isinstance(owner, Level):
+            return self.reparse_segment(owner, index, start, delta)
+        return self.reparse_block(owner, index, start, delta)
+
+    # Sentencia k de 'level' como programa: una o más sentencias nuevas en su lugar
+    def reparse_segment(self, level, k, start, delta):
+        segment = level.segments[k]
+        if segment.tail:
+            return False # la expresión final se analiza con su bloque
+        end = start + level.lengths[k] + delta
+        tokens = self.tokens(start, end)
+        if not tokens:
+            return False
+        root = self.session.parse(None, lexer=ListLexer(tokens), arena=self.arena)
+        if root is None:
+            return False
+        a = self.arena
+        stmts = a.first[root.index]
+        try:
+            builder = self.builder(tokens)
+            new = builder.level(0, len(tokens), start, end, stmts)
+        except Mismatch:
+            return False
+        prev = level.segments[k - 1].node if k > 0 else -1
+        relink(a, level.node, prev, segment.node, a.first[stmts], a.last[stmts])
+        level.segments[k:k + 1] = new.segments
+        level.lengths[k:k + 1] = new.lengths
+        level.cached = None
+        return True
+
+    # Bloque j de 'segment' como la expresión de una sentencia ({ ... };)
+    def reparse_block(self, segment, j, start, delta):
+        block = segment.blocks[j]
+        end = start + block.length + delta
+        tokens = self.tokens(start, end)
+        if not tokens or tokens[0].type != 'LBRACKET' or tokens[-1].type != 'RBRACKET' \
+                or tokens[-1].lexpos != end - 1:
+            return False
+        semicolon = rust_scanner.Token()
+        semicolon.type = 'SEMICOLON'
+        semicolon.value = ';'
+        semicolon.lineno = 1
+        semicolon.lexpos = end
+        semicolon.lexer = self.lexer
+        root = self.session.parse(None, lexer=ListLexer(tokens + [ semicolon ]), arena=self.arena)
+        if root is None:
+            return False
+        # program -> list_stmt -> stmt -> expr_stmt -> expr -> block
+        a = self.arena
+        stmts = a.first[root.index]
+        node = a.first[stmts]
+        if a.next[node] != -1:
+            return False
+        for i in range(3):
+            node = a.first[node]
+            if node == -1:
+                return False
+        if node == -1 or a.types[node] != BLOCK or a.next[node] != -1:
+            return False
+        try:
+            builder = self.builder(tokens)
+            if builder.match.get(0) != len(tokens) - 1:
+                return False
+            level = builder.level(1, len(tokens) - 1, start + 1, end - 1, a.first[node])
+        except Mismatch:
+            return False
+        relink(a, block.parent, block.prev, block.node, node, node)
+        segment.blocks[j] = Block(block.offset, end - start, node, block.parent, block.prev, level)
+        for other in segment.blocks[j + 1:]:
+            other.offset += delta
+        return True
+
+    def builder(self, tokens):
+        return Builder(self.arena, [ t.type for t in tokens ], [ t.lexpos for t in tokens ],
+                       [ t.lexpos + len(t.value) for t in tokens ])
+
+    # Ajustar los tamaños de las unidades que contienen a la que se analizó de nuevo
+    def resize(self, path, delta):
+        for owner, index, start in path:
+            if isinstance(owner, Level):
+                owner.lengths[index] += delta
+                owner.cached = None
+            else:
+                owner.blocks[index].length += delta
+                for other in owner.blocks[index + 1:]:
+                    other.offset += delta
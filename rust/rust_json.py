@@ -0,0 +1,85 @@
+# Salida del AST en JSON, en flujo: cada sentencia de nivel superior se escribe en
+# cuanto el analizador la reduce (RustParser.parse(..., emit=f)), sin esperar al final
+# del archivo. Después de escribirla, sus nodos se sueltan (los siguientes van a un
+# arena nuevo), así que la memoria no crece con el tamaño de la entrada.
+#
+# Cada nodo es un objeto {"type", "leaf", "line", "pos", "children"}: 'line' y 'pos'
+# son la línea y la posición (desde 0) donde empieza en la fuente.
+# - JSON lines (jsonl): una sentencia por línea y, al final, una línea {"error": ...}
+#   por cada error de sintaxis
+# - JSON: un solo documento {"type": "program", ...} con las sentencias como hijos de
+#   'list_stmt' y la lista "errors"
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import json
+
+import rust_ast
+
+# Texto JSON de un nodo y su subárbol (con una pila explícita, sin recursión)
+def dumps(node):
+    a = node.arena
+    types, leaves, first, nxt = a.types, a.leaves, a.first, a.next
+    pos, line = a.pos, a.line
+    names = [ json.dumps(name) for name in rust_ast.type_names ]
+    string = json.encoder.encode_basestring
+    parts = [ ]
+    stack = [ ]     # siguiente hermano de cada nodo abierto (-1 si no tiene)
+    i, sibling = node.index, -1
+    while True:
+        leaf = leaves[i]
+        parts.append('{"type": %s, "leaf": %s, ' % (names[types[i]], "null" if leaf is None else string(leaf)))
+        if pos is not None and i < len(pos):
+            parts.append('"line": %d, "pos": %d, ' % (line[i], pos[i]))
+        parts.append('"children": [')
+        if first[i] != -1:
+            stack.append(sibling)
+            i = first[i]
+            sibling = nxt[i]
+            continue
+        parts.append("]}")
+        # cerrar los nodos que ya no tienen hermanos pendientes
+        while sibling == -1:
+            if not stack:
+                return "".join(parts)
+            parts.append("]}")
+            sibling = stack.pop()
+        parts.append(", ")
+        i = sibling
+        sibling = nxt[i]
+
+# Objeto JSON (dict, list) de un nodo
+def to_object(node):
+    return json.loads(dumps(node))
+
+# Analizar 'data' (o los tokens de 'lexer', p. ej. un rust_stream.StreamScanner) con
+# 'session' escribiendo el AST en 'out' conforme se reducen las sentencias de nivel
+# superior, en JSON lines ('lines') o en un documento JSON. Con 'flush' la salida se
+# vacía después de cada sentencia (para quien la lee por una tubería).
+# Regresa el número de sentencias escritas; los errores quedan en session.errors.
+def stream(session, data, out, lines=True, lexer=None, flush=False):
+    count = 0
+
+    def emit(node):
+        nonlocal count
+        text = dumps(node)
+        if lines:
+            out.write(text + "\n")
+        else:
+            out.write(", " + text if count else text)
+        count += 1
+        if flush:
+            out.flush()
+        session.parser.arena = rust_ast.Arena() # los nodos ya escritos no se vuelven a usar
+
+    if not lines:
+        out.write('{"type": "program", "leaf": null, "line": 1, "pos": 0, "children": ['
+                  '{"type": "list_stmt", "leaf": null, "line": 1, "pos": 0, "children": [')
+    session.parse(data, lexer=lexer, positions=True, emit=emit)
+    if lines:
+        for msg in session.errors:
+            out.write(json.dumps({ "error": msg }, ensure_ascii=False) + "\n")
+    else:
+        out.write(']}], "errors": %s}\n' % json.dumps(session.errors, ensure_ascii=False))
+    return count
@@ -0,0 +1,168 @@
+# Protocolo ligero para las acciones de la gramática (lo usa rust_dense): en lugar de
+# recibir un YaccProduction 'p' y asignar p[0], la acción recibe los valores de los
+# símbolos de la regla como argumentos y regresa el valor del lado izquierdo:
+#     def p_expr(p): p[0] = Node('expr', [ p[1] ], None)
+#     ->  def p_expr(_p1): return Node('expr', [ _p1 ], None)
+# Así una reducción no crea YaccSymbol, ni la lista de símbolos de la regla, ni pasa
+# cada p[i] por YaccProduction.__getitem__.
+#
+# Las versiones posicionales se derivan del código de las funciones p_* (que siguen
+# funcionando igual con ply), una por regla: p[i] pasa a ser el argumento i, p[0] una
+# variable local que se regresa al final, len(p) una constante (los if que sólo
+# dependen de ella se resuelven al derivar) y p.parser el analizador de la sesión.
+# Las acciones que usan otra cosa de p (p[-1], p.lexer, p.slice, ...) no se derivan y
+# se llaman con un objeto Production.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import ast
+import inspect
+import textwrap
+
+# Nodos que pueden quedar en la condición de un if que se resuelve al derivar
+constant_nodes = (ast.Constant, ast.Compare, ast.BoolOp, ast.UnaryOp, ast.cmpop, ast.boolop,
+                  ast.unaryop, ast.expr_context)
+
+class NotDerivable(Exception):
+    pass
+
+# Reescribe el cuerpo de una acción p_* para una regla de 'n' símbolos
+class Derive(ast.NodeTransformer):
+    def __init__(self, name, n):
+        self.name = name    # nombre del parámetro (p)
+        self.n = n
+
+    def is_p(self, node):
+        return isinstance(node, ast.Name) and node.id == self.name
+
+    def visit_Subscript(self, node):
+        if not self.is_p(node.value):
+            return self.generic_visit(node)
+        index = node.slice
+        if not (isinstance(index, ast.Constant) and type(index.value) is int and 0 <= index.value <= self.n):
+            raise NotDerivable("p[%s]" % ast.unparse(index))
+        if isinstance(node.ctx, ast.Del) or index.value and not isinstance(node.ctx, ast.Load):
+            raise NotDerivable("asigna o borra p[%d]" % index.value)
+        return ast.copy_location(ast.Name('_p%d' % index.value, node.ctx), node)
+
+    def visit_Call(self, node):
+        if (isinstance(node.func, ast.Name) and node.func.id == 'len' and len(node.args) == 1
+                and not node.keywords and self.is_p(node.args[0])):
+            return ast.copy_location(ast.Constant(self.n + 1), node)
+        return self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if not self.is_p(node.value):
+            return self.generic_visit(node)
+        if node.attr != 'parser' or not isinstance(node.ctx, ast.Load):
+            raise NotDerivable("p.%s" % node.attr)
+        return ast.copy_location(ast.Name('_parser', ast.Load()), node)
+
+    def visit_Name(self, node):
+        if node.id == self.name:
+            raise NotDerivable("usa p directamente")
+        return node
+
+    def visit_Return(self, node):
+        if node.value is not None:
+            raise NotDerivable("regresa un valor")
+        return ast.copy_location(ast.Return(ast.Name('_p0', ast.Load())), node)
+
+    # if len(p) == 3: ... se queda sólo con la rama que corresponde a la regla
+    # (la rama descartada no se revisa: puede leer p[i] con i > n)
+    def visit_If(self, node):
+        node.test = self.visit(node.test)
+        if all(isinstance(child, constant_nodes) for child in ast.walk(node.test)):
+            taken = eval(compile(ast.Expression(node.test), '<derive>', 'eval'), { })
+            return self.block(node.body if taken else node.orelse) or [ ast.Pass() ]
+        node.body = self.block(node.body) or [ ast.Pass() ]
+        node.orelse = self.block(node.orelse)
+        return node
+
+    def block(self, stmts):
+        result = [ ]
+        for stmt in stmts:
+            stmt = self.visit(stmt)
+            result.extend(stmt if isinstance(stmt, list) else [ stmt ])
+        return result
+
+    def visit_FunctionDef(self, node):
+        raise NotDerivable("define funciones")
+
+    visit_Lambda = visit_ClassDef = visit_AsyncFunctionDef = visit_FunctionDef
+
+# Versión posicional de la acción 'func' para una regla de 'n' símbolos: regresa una
+# función make(parser) que crea la acción de una sesión, o None si no se puede derivar
+def derive(func, n):
+    key = (func, n)
+    if key not in derived:
+        try:
+            derived[key] = compile_action(func, n)
+        except NotDerivable:
+            derived[key] = None
+    return derived[key]
+
+derived = { } # (función, n) -> make o None
+
+def compile_action(func, n):
+    code = getattr(func, '__code__', None)
+    if code is None or code.co_freevars:
+        raise NotDerivable("no es una función simple")
+    try:
+        source = textwrap.dedent(inspect.getsource(func))
+        filename = inspect.getsourcefile(func)
+    except (OSError, TypeError):
+        raise NotDerivable("sin código fuente")
+    fdef = ast.parse(source).body[0]
+    args = fdef.args
+    if (not isinstance(fdef, ast.FunctionDef) or len(args.args) != 1 or args.posonlyargs
+            or args.vararg or args.kwonlyargs or args.kwarg or args.defaults):
+        raise NotDerivable("firma distinta de f(p)")
+    stmts = fdef.body
+    if stmts and isinstance(stmts[0], ast.Expr) and isinstance(stmts[0].value, ast.Constant):
+        stmts = stmts[1:] # docstring (la regla)
+    body = Derive(args.args[0].arg, n).block(stmts)
+
+    fdef.args = ast.arguments(posonlyargs=[ ], args=[ ast.arg('_p%d' % i) for i in range(1, n + 1) ],
+                              vararg=None, kwonlyargs=[ ], kw_defaults=[ ], kwarg=None, defaults=[ ])
+    fdef.decorator_list = [ ]
+    fdef.body = ([ ast.Assign([ ast.Name('_p0', ast.Store()) ], ast.Constant(None), lineno=fdef.lineno) ] +
+                 body + [ ast.Return(ast.Name('_p0', ast.Load())) ])
+    make = ast.FunctionDef('make', ast.arguments(posonlyargs=[ ], args=[ ast.arg('_parser') ], vararg=None,
+                           kwonlyargs=[ ], kw_defaults=[ ], kwarg=None, defaults=[ ]),
+                           [ fdef, ast.Return(ast.Name(fdef.name, ast.Load())) ], [ ], lineno=fdef.lineno)
+    module = ast.Module([ make ], [ ])
+    ast.fix_missing_locations(module)
+    # los números de línea apuntan a la función original
+    ast.increment_lineno(module, code.co_firstlineno - 1)
+    namespace = { }
+    exec(compile(module, filename, 'exec'), func.__globals__, namespace)
+    return namespace['make']
+
+# p de las acciones que no se derivan: lee los valores de la pila (incluso con índices
+# negativos, p[-1]) y guarda p[0] en 'value'
+class Production:
+    __slots__ = ('parser', 'lexer', 'values', 'n', 'value')
+
+    def __init__(self, parser, lexer, values, n):
+        self.parser = parser
+        self.lexer = lexer
+        self.values = values
+        self.n = n
+        self.value = None
+
+    def __getitem__(self, i):
+        if i == 0:
+            return self.value
+        if i < 0:
+            return self.values[i - self.n]
+        return self.values[i - self.n - 1]
+
+    def __setitem__(self, i, value):
+        if i != 0:
+            raise IndexError(i)
+        self.value = value
+
+    def __len__(self):
+        return self.n + 1
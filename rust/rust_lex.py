@@ -1,7 +1,7 @@
 import sys
 if ".." not in sys.path: sys.path.insert(0,"..")
 
-import ply.lex as lex
+import rust_tables
 
 # -- Tokens -- #
 # Funciones en caso de acciones especiales para el token
@@ -169,8 +169,8 @@ def t_error(t):
     print("Caracter ilegal '%s'" % t.value[0])
     t.lexer.skip(1)
 
-# Construir el lexer
-lex.lex()
+# Construir el lexer (tablas en la caché de rust_tables)
+lexer = rust_tables.build_lexer(sys.modules[__name__])
 
 
 
@@ -0,0 +1,54 @@
+# Análisis en paralelo con un grupo de procesos (uno por núcleo por omisión).
+# Cada proceso trabajador carga el lexer y las tablas una sola vez, analiza sus
+# archivos con su propia sesión de RustParser y escribe los AST; al proceso
+# principal sólo regresan los resultados ligeros (rust_batch.FileResult).
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import multiprocessing
+import os
+
+import rust_batch
+
+# Sesión, carpeta de salida y caché del proceso trabajador
+session = None
+outdir = None
+cache = None
+
+# 'cache_options': (directorio, tamaño máximo) de la caché, o None
+def init_worker(output, cache_options=None):
+    global session, outdir, cache
+    import rust_yacc
+    session = rust_yacc.RustParser(verbose=False)
+    outdir = output
+    if cache_options is not None:
+        import rust_cache
+        cache = rust_cache.Cache(*cache_options)
+
+def work(item):
+    path, name = item
+    return rust_batch.process(session, path, name, outdir, cache)
+
+# Número de trabajadores por omisión: los núcleos disponibles para este proceso
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Analizar 'files' (pares ruta, nombre) con 'jobs' procesos, enviando 'chunksize'
+# archivos por tarea. Los resultados llegan en el orden de entrada ('ordered') o
+# conforme terminan. Con 'cache' (rust_cache.Cache) cada trabajador usa la misma caché.
+def results(files, outdir=None, jobs=None, chunksize=8, ordered=True, cache=None):
+    jobs = jobs or cpu_count()
+    cache_options = None if cache is None else (cache.directory, cache.max_bytes)
+    with multiprocessing.Pool(jobs, init_worker, (outdir, cache_options)) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(work, files, chunksize)
+
+# Fuente de resultados para rust_batch.run con las opciones dadas
+def source(jobs=None, chunksize=8, ordered=True):
+    def run(files, outdir, cache=None):
+        return results(files, outdir, jobs, chunksize, ordered, cache)
+    return run
@@ -0,0 +1,1002 @@
+# Lexer compilado para las reglas de rust_lex (misma secuencia de tokens que ply.lex)
+#
+# En lugar de probar la expresión maestra completa de ply en cada token, se arma una
+# tabla indexada por el primer carácter: los caracteres que sólo pueden iniciar un
+# token de un carácter (';', '(', '+', ...) generan el token directamente, y el resto
+# usa una expresión compilada sólo con las reglas que pueden empezar con ese carácter,
+# en el mismo orden que la expresión maestra de ply (así el resultado es el mismo).
+# Las palabras reservadas van como grupos propios dentro de esas expresiones (antes de
+# la regla de ID), de modo que el grupo que coincide ya indica el tipo y no hace falta
+# buscar cada identificador en 'reserved'.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import copy
+import mmap
+import os
+import re
+
+from bisect import bisect_left
+
+try:
+    from re import _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_parse
+
+from array import array
+
+from ply.lex import LexError
+
+import rust_lex
+
+# Token con los mismos campos que ply.lex.LexToken, pero con __slots__ y sin heredar de
+# LexToken (una subclase de LexToken tendría además un __dict__ por token)
+class Token:
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __str__(self):
+        return 'LexToken(%s,%r,%d,%d)' % (self.type, self.value, self.lineno, self.lexpos)
+
+    def __repr__(self):
+        return str(self)
+
+# -- Primeros caracteres de una expresión regular -- #
+
+ascii_chars = [ chr(c) for c in range(128) ]
+
+categories = {
+    sre_parse.CATEGORY_DIGIT : set('0123456789'),
+    sre_parse.CATEGORY_WORD  : set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'),
+    sre_parse.CATEGORY_SPACE : set(' \t\n\r\f\v'),
+}
+
+# Marca de "cualquier carácter fuera de ASCII" dentro de los conjuntos de primeros caracteres
+NON_ASCII = None
+
+# Caracteres de una clase o literal: los ASCII tal cual y NON_ASCII por el resto
+def char_set(codes):
+    return { chr(c) if c < 128 else NON_ASCII for c in codes }
+
+# Caracteres con los que puede empezar una secuencia de sre_parse: (conjunto, anulable).
+# El conjunto es None si puede ser cualquier carácter. El resultado puede incluir
+# caracteres de más (p. ej. se ignoran los lookahead), nunca de menos. Con 'unicode'
+# las categorías (\d, \w, \s) también incluyen caracteres fuera de ASCII, como en re.
+def first_chars(items, unicode=True):
+    chars = set()
+    for op, av in items:
+        first, nullable = first_item(op, av, unicode)
+        if first is None:
+            return None, False
+        chars |= first
+        if not nullable:
+            return chars, False
+    return chars, True
+
+def first_item(op, av, unicode):
+    if op == sre_parse.LITERAL:
+        return char_set([ av ]), False
+    if op == sre_parse.IN:
+        chars = set()
+        for kind, value in av:
+            if kind == sre_parse.LITERAL:
+                chars |= char_set([ value ])
+            elif kind == sre_parse.RANGE:
+                chars |= char_set(range(value[0], min(value[1], 127) + 1))
+                if value[1] >= 128:
+                    chars.add(NON_ASCII)
+            elif kind == sre_parse.CATEGORY and value in categories:
+                chars |= categories[value]
+                if unicode:
+                    chars.add(NON_ASCII)
+            else:
+                return None, False
+        return chars, False
+    if op == sre_parse.BRANCH:
+        chars = set()
+        nullable = False
+        for branch in av[1]:
+            first, empty = first_chars(branch, unicode)
+            if first is None:
+                return None, False
+            chars |= first
+            nullable = nullable or empty
+        return chars, nullable
+    if op == sre_parse.SUBPATTERN:
+        return first_chars(av[-1], unicode)
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+        first, empty = first_chars(av[2], unicode)
+        return first, empty or av[0] == 0
+    if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return set(), True
+    return None, False
+
+# Texto fijo si la expresión sólo tiene literales ('\+', '==', ...); si no, None
+def literal_text(parsed):
+    items = list(parsed)
+    if items and all(op == sre_parse.LITERAL for op, av in items):
+        return sys.intern("".join(chr(av) for op, av in items))
+    return None
+
+# Cambiar cada '.' (fuera de clases y sin escapar) por un carácter UTF-8 completo, para
+# que en el modo de bytes '.' siga siendo un carácter y no un byte (p. ej. en t_CHAR)
+utf8_char = r'(?:[^\n\x80-\xff]|[\xc0-\xff][\x80-\xbf]*)'
+
+def utf8_dots(pattern):
+    out = [ ]
+    escaped = in_class = False
+    for c in pattern:
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif in_class:
+            in_class = c != ']' or out[-1] == '['
+        elif c == '[':
+            in_class = True
+        elif c == '.':
+            c = utf8_char
+        out.append(c)
+    return "".join(out)
+
+# -- Tablas -- #
+
+# Acciones de cada grupo en las expresiones por carácter:
+# (acción, argumento, id de tipo, valor fijo del token o None)
+TOKEN, NEWLINE, DISCARD, FUNCTION = range(4)
+# Entradas de la tabla por primer carácter: (IGNORE|ILLEGAL, None, None),
+# (SINGLE, tipo, id de tipo) o (MATCH, match, acciones). En SINGLE el valor del token
+# es el propio carácter (las cadenas de un carácter ya son únicas en Python).
+IGNORE, SINGLE, MATCH, ILLEGAL = range(4)
+
+# Reglas de un lexer de ply en el orden de su expresión maestra:
+# lista de (nombre de la regla, tipo de token, patrón, función o None)
+def lexer_rules(lexer, module):
+    rules = [ ]
+    for master, funcs in lexer.lexstatere['INITIAL']:
+        names = { index: name for name, index in master.groupindex.items() }
+        for index, entry in enumerate(funcs):
+            if entry is None:
+                continue
+            func, type = entry
+            name = names[index] # t_<nombre>
+            if func is not None:
+                pattern = getattr(func, 'regex', func.__doc__)
+            else:
+                pattern = getattr(module, name)
+            rules.append((name, type, pattern, func))
+    return rules
+
+# Función que sólo regresa el token (t_SIGNINTTYPE, t_BOOLTYPE, ...)
+def _returns_token(t):
+    return t
+
+def returns_token(func):
+    code = func.__code__
+    return code.co_argcount == 1 and code.co_code == _returns_token.__code__.co_code
+
+# Tablas compiladas a partir de las reglas de 'module' (rust_lex) y su lexer de ply
+# Con binary=True las expresiones se compilan para bytes (entrada bytes o mmap).
+# Con newlines=False los saltos de línea se ignoran como los espacios (las líneas se
+# calculan después con un LineIndex) y la regla t_newline ya no se usa.
+class Tables:
+    def __init__(self, lexer, module, binary=False, newlines=True):
+        self.binary = binary
+        self.newlines = newlines
+        self.numbered = False   # los tokens llevan el id de su tipo en lugar del nombre
+        self.flags = lexer.lexreflags
+        if binary:
+            self.flags &= ~re.UNICODE
+        self.ignore = lexer.lexignore if newlines else lexer.lexignore + '\n'
+        self.errorf = lexer.lexerrorf
+        self.reserved = module.reserved
+        self.type_names = list(module.tokens) # id de tipo -> nombre (para tokenize)
+        self.type_ids = { name: i for i, name in enumerate(self.type_names) }
+        self.rules = lexer_rules(lexer, module)
+        self.firsts = [ ]   # primeros caracteres de cada regla (None: cualquiera)
+        self.literals = [ ] # texto de las reglas de texto fijo (valor compartido de sus tokens)
+        self.groups = [ ]   # grupos dentro del patrón de cada regla
+        for name, type, pattern, func in self.rules:
+            parsed = sre_parse.parse(pattern, self.flags)
+            first, nullable = first_chars(parsed, not binary and not self.flags & re.ASCII)
+            self.firsts.append(None if nullable else first)
+            self.literals.append(literal_text(parsed) if func is None else None)
+            self.groups.append(parsed.state.groups - 1)
+        self.skip = None
+        if self.ignore:
+            self.skip = self.regex('[%s]+' % re.escape(self.ignore)).match
+        self.compiled = { } # (reglas, palabras reservadas) -> (match, acciones)
+        self.table = [ self.entry(c) for c in ascii_chars ]
+        self.other = self.entry(NON_ASCII) # caracteres (o bytes) fuera de ASCII
+        if binary:
+            self.table += [ self.other ] * 128 # indexada por el valor del byte
+            self.ignore = self.ignore.encode('latin-1')
+
+    def regex(self, pattern):
+        if self.binary:
+            pattern = utf8_dots(pattern).encode('utf-8')
+        return re.compile(pattern, self.flags)
+
+    # Reglas (índices) que pueden empezar con 'c' (NON_ASCII: un carácter no ASCII)
+    def candidates(self, c):
+        return tuple(i for i, first in enumerate(self.firsts) if first is None or c in first)
+
+    def entry(self, c):
+        if c is not None and c in self.ignore:
+            return (IGNORE, None, None)
+        rules = self.candidates(c)
+        if not rules:
+            return (ILLEGAL, None, None)
+        if len(rules) == 1 and self.literals[rules[0]] == c:
+            type = self.rules[rules[0]][1]
+            return (SINGLE, type, self.type_ids[type])
+        words = tuple(word for word in sorted(self.reserved) if word[0] == c)
+        key = (rules, words)
+        if key not in self.compiled:
+            self.compiled[key] = self.compile(rules, words)
+        match, actions = self.compiled[key]
+        return (MATCH, match, actions)
+
+    # Expresión con las reglas dadas (y las palabras reservadas 'words' antes de t_ID)
+    def compile(self, rules, words):
+        parts = [ ]
+        actions = [ None ]
+        for i in rules:
+            name, type, pattern, func = self.rules[i]
+            if name == 't_ID':
+                # mismas palabras que t_ID encontraría completas en 'reserved'
+                for word in words:
+                    parts.append('(%s(?![a-zA-Z0-9_]))' % re.escape(word))
+                    type = self.reserved[word]
+                    actions.append((TOKEN, type, self.type_ids[type], sys.intern(word)))
+                action = (TOKEN, 'ID', self.type_ids['ID'], None)
+            elif name == 't_newline':
+                action = (NEWLINE, None, -1, None)
+            elif name == 't_COMMENT':
+                action = (DISCARD, None, -1, None)
+            elif func is None or returns_token(func):
+                action = (TOKEN, type, self.type_ids[type], self.literals[i])
+            else:
+                action = (FUNCTION, func, -1, None)
+            parts.append('(%s)' % pattern)
+            actions.append(action)
+            actions.extend([ None ] * self.groups[i])
+        # los caracteres ignorados después del token se consumen en la misma búsqueda
+        pattern = '(?:%s)' % '|'.join(parts)
+        if self.ignore:
+            pattern += '[%s]*' % re.escape(self.ignore)
+        return self.regex(pattern).match, actions
+
+    # Copia cuyos tokens tienen como tipo el id (índice en rust_lex.tokens) en lugar
+    # del nombre, para un analizador con tablas de enteros (rust_dense)
+    def number(self):
+        c = copy.copy(self)
+        c.numbered = True
+        converted = { } # id(acciones) -> acciones con ids (se comparten entre entradas)
+
+        def numbered_actions(actions):
+            result = [ ]
+            for action in actions:
+                if action is not None and action[0] == TOKEN:
+                    kind, type, type_id, text = action
+                    action = (kind, type_id, type_id, text)
+                result.append(action)
+            return result
+
+        def entry(e):
+            kind, a, b = e
+            if kind == SINGLE:
+                return (kind, b, b)
+            if kind == MATCH:
+                if id(b) not in converted:
+                    converted[id(b)] = numbered_actions(b)
+                return (kind, a, converted[id(b)])
+            return e
+
+        c.table = [ entry(e) for e in self.table ]
+        c.other = entry(self.other)
+        return c
+
+cached_tables = { } # (binary, newlines, numbered) -> Tables
+
+def get_tables(binary=False, newlines=True, numbered=False):
+    key = (binary, newlines, numbered)
+    if key not in cached_tables:
+        if numbered:
+            cached_tables[key] = get_tables(binary, newlines).number()
+        else:
+            cached_tables[key] = Tables(rust_lex.lexer, rust_lex, binary, newlines)
+    return cached_tables[key]
+
+# -- Lexer -- #
+
+# Token que guarda sus posiciones en la fuente en lugar de su texto: el valor se toma
+# de la fuente la primera vez que se pide (y se guarda). Los tokens de texto fijo
+# (operadores, símbolos y palabras reservadas) ya traen su valor compartido.
+# (Se guarda el tamaño y no la posición final: los enteros chicos no se crean de nuevo.)
+class OffsetToken:
+    __slots__ = ('type', '_value', 'lineno', 'lexpos', 'size', 'source', 'lexer')
+
+    __str__ = Token.__str__
+    __repr__ = Token.__repr__
+
+    @property
+    def value(self):
+        value = self._value
+        if value is None:
+            value = self._value = self.source[self.lexpos:self.lexpos + self.size]
+        return value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+# Misma interfaz que ply.lex.Lexer en lo que usa ply.yacc (input, token, lineno, lexpos).
+# Con offsets=True los tokens son OffsetToken (valores sólo cuando se piden).
+class Scanner:
+    def __init__(self, tables=None, offsets=False):
+        self.tables = tables or get_tables()
+        self.offsets = offsets
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lexlen = 0
+        self.lineno = 1
+        self.token = self.eof
+
+    def clone(self):
+        c = Scanner(self.tables, self.offsets)
+        c.lineno = self.lineno
+        return c
+
+    # 'data' es un str o, para el modo de bytes, bytes o un mmap (ver map_file): en ese
+    # modo lexpos es la posición en bytes y los valores se decodifican (UTF-8) por token
+    def input(self, data):
+        self.lexdata = data
+        self.lexpos = 0
+        self.lexlen = len(data)
+        if isinstance(data, str):
+            self.token = (self.offset_tokens() if self.offsets else self.tokens()).__next__
+        elif isinstance(data, (bytes, bytearray, mmap.mmap)):
+            if self.offsets:
+                raise ValueError("El modo de bytes no tiene tokens con posiciones (offsets)")
+            self.token = self.byte_tokens().__next__
+        else:
+            raise ValueError('Expected a string, bytes or mmap')
+
+    def eof(self):
+        return None
+
+    def skip(self, n):
+        self.lexpos += n
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
+
+    # Generador de tokens; al terminar regresa None indefinidamente (como token())
+    def tokens(self):
+        data = self.lexdata
+        end = self.lexlen
+        tables = self.tables
+        table = tables.table
+        other = tables.other
+        skip = tables.skip
+        ignore = tables.ignore
+        pos = self.lexpos
+        lineno = self.lineno
+        while pos < end:
+            c = data[pos]
+            kind, a, actions = table[ord(c)] if c < '\x80' else other
+            if kind == SINGLE:
+                t = Token()
+                t.type = a
+                t.value = c
+                t.lineno = lineno
+                t.lexpos = pos
+                t.lexer = self
+                pos += 1
+                self.lexpos = pos
+                yield t
+                continue
+            if kind == IGNORE:
+                pos += 1
+                if pos < end and data[pos] in ignore:
+                    pos = skip(data, pos).end()
+                continue
+            m = a(data, pos) if kind == MATCH else None
+            if m is None:
+                # carácter ilegal: t_error como en ply
+                pos, t = self.error(pos, lineno)
+                lineno = self.lineno
+                if t is not None:
+                    yield t
+                continue
+            index = m.lastindex
+            action, arg, type_id, text = actions[index]
+            if action == TOKEN:
+                t = Token()
+                t.type = arg
+                t.value = text or m.group(index)
+                t.lineno = lineno
+                t.lexpos = pos
+                t.lexer = self
+                pos = m.end()
+                self.lexpos = pos
+                yield t
+            elif action == NEWLINE:
+                lineno += m.group(index).count('\n')
+                self.lineno = lineno
+                pos = m.end()
+            elif action == DISCARD:
+                pos = m.end()
+            else:
+                t, pos, lineno = self.call(arg, m, index, pos, lineno)
+                if t is not None:
+                    yield t
+        self.lexpos = pos
+        while True:
+            yield None
+
+    # Igual que tokens(), pero con OffsetToken
+    def offset_tokens(self):
+        data = self.lexdata
+        end = self.lexlen
+        tables = self.tables
+        table = tables.table
+        other = tables.other
+        skip = tables.skip
+        ignore = tables.ignore
+        pos = self.lexpos
+        lineno = self.lineno
+        while pos < end:
+            c = data[pos]
+            kind, a, actions = table[ord(c)] if c < '\x80' else other
+            if kind == SINGLE:
+                t = OffsetToken()
+                t.type = a
+                t._value = c
+                t.lineno = lineno
+                t.lexpos = pos
+                t.lexer = self
+                pos += 1
+                self.lexpos = pos
+                yield t
+                continue
+            if kind == IGNORE:
+                pos += 1
+                if pos < end and data[pos] in ignore:
+                    pos = skip(data, pos).end()
+                continue
+            m = a(data, pos) if kind == MATCH else None
+            if m is None:
+                pos, t = self.error(pos, lineno)
+                lineno = self.lineno
+                if t is not None:
+                    yield t
+                continue
+            index = m.lastindex
+            action, arg, type_id, text = actions[index]
+            if action == TOKEN:
+                t = OffsetToken()
+                t.type = arg
+                t._value = text
+                t.lineno = lineno
+                t.lexpos = pos
+                t.size = m.end(index) - pos
+                t.source = data
+                t.lexer = self
+                pos = m.end()
+                self.lexpos = pos
+                yield t
+            elif action == NEWLINE:
+                lineno += m.group(index).count('\n')
+                self.lineno = lineno
+                pos = m.end()
+            elif action == DISCARD:
+                pos = m.end()
+            else:
+                t, pos, lineno = self.call(arg, m, index, pos, lineno)
+                if t is not None:
+                    yield t
+        self.lexpos = pos
+        while True:
+            yield None
+
+    # Igual que tokens(), pero sobre bytes o un mmap (con las tablas de bytes). Las
+    # páginas de un mmap ya analizadas se liberan cada 'window' bytes, así que la memoria
+    # residente no crece con el tamaño del archivo.
+    def byte_tokens(self, window=1 << 22):
+        data = self.lexdata
+        end = self.lexlen
+        tables = get_tables(True, self.tables.newlines, self.tables.numbered)
+        table = tables.table
+        skip = tables.skip
+        ignore = tables.ignore
+        chars = ascii_chars
+        pos = self.lexpos
+        lineno = self.lineno
+        release = getattr(mmap, 'MADV_DONTNEED', None) if isinstance(data, mmap.mmap) else None
+        released = 0
+        limit = 2 * window if release is not None else end
+        while pos < end:
+            b = data[pos]
+            kind, a, actions = table[b]
+            if kind == SINGLE:
+                t = Token()
+                t.type = a
+                t.value = chars[b]
+                t.lineno = lineno
+                t.lexpos = pos
+                t.lexer = self
+                pos += 1
+                self.lexpos = pos
+                yield t
+                continue
+            if kind == IGNORE:
+                pos += 1
+                if pos < end and data[pos] in ignore:
+                    pos = skip(data, pos).end()
+                continue
+            m = a(data, pos) if kind == MATCH else None
+            if m is None:
+                pos, t = self.error(pos, lineno)
+                while pos < end and 0x80 <= data[pos] < 0xC0:
+                    pos += 1 # resto del carácter UTF-8
+                lineno = self.lineno
+                if t is not None:
+                    yield t
+                continue
+            index = m.lastindex
+            action, arg, type_id, text = actions[index]
+            if action == TOKEN:
+                t = Token()
+                t.type = arg
+                t.value = text or m.group(index).decode('utf-8', 'replace')
+                t.lineno = lineno
+                t.lexpos = pos
+                t.lexer = self
+                pos = m.end()
+                self.lexpos = pos
+                yield t
+            elif action == NEWLINE:
+                lineno += m.group(index).count(b'\n')
+                self.lineno = lineno
+                pos = m.end()
+                if pos > limit:
+                    upto = (pos - window) // mmap.PAGESIZE * mmap.PAGESIZE
+                    data.madvise(release, released, upto - released)
+                    released = upto
+                    limit = pos + window
+            elif action == DISCARD:
+                pos = m.end()
+            else:
+                t, pos, lineno = self.call(arg, m, index, pos, lineno)
+                if t is not None:
+                    yield t
+        self.lexpos = pos
+        while True:
+            yield None
+
+    # Llamar una regla con función propia como lo haría ply; regresa (token o None,
+    # nueva posición, nueva línea)
+    def call(self, func, m, index, pos, lineno):
+        t = Token()
+        t.type = None
+        t.value = m.group(index)
+        if not isinstance(t.value, str):
+            t.value = t.value.decode('utf-8', 'replace')
+        t.lineno = lineno
+        t.lexpos = pos
+        t.lexer = self
+        self.lexmatch = m
+        self.lexpos = m.end(index)
+        self.lineno = lineno
+        t = func(t)
+        if t is not None and self.tables.numbered:
+            t.type = self.tables.type_ids[t.type]
+        return t, self.lexpos, self.lineno
+
+    # Analizar todo 'data' de una vez: regresa las columnas de los tokens (Tokens) sin
+    # crear un objeto por token. Las reglas con función propia (si las hubiera) se
+    # llaman como en tokens(); el valor del token es siempre su texto en la fuente.
+    # Con bytes o un mmap se usan las tablas de bytes (como en byte_tokens): las
+    # posiciones son en bytes y los valores se decodifican al leerlos de Tokens.
+    def tokenize(self, data):
+        self.input(data)
+        if not isinstance(data, str):
+            return self.byte_tokenize(data)
+        tables = self.tables
+        table = tables.table
+        other = tables.other
+        skip = tables.skip
+        ignore = tables.ignore
+        result = Tokens(data, tables.type_names)
+        types = result.types.append
+        starts = result.starts.append
+        ends = result.ends.append
+        lines = result.lines.append
+        end = len(data)
+        pos = 0
+        lineno = self.lineno
+        while pos < end:
+            c = data[pos]
+            kind, a, actions = table[ord(c)] if c < '\x80' else other
+            if kind == SINGLE:
+                types(actions)
+                starts(pos)
+                pos += 1
+                ends(pos)
+                lines(lineno)
+                continue
+            if kind == IGNORE:
+                pos += 1
+                if pos < end and data[pos] in ignore:
+                    pos = skip(data, pos).end()
+                continue
+            m = a(data, pos) if kind == MATCH else None
+            if m is None:
+                pos, t = self.error(pos, lineno)
+                lineno = self.lineno
+                if t is not None:
+                    types(tables.type_ids[t.type])
+                    starts(t.lexpos)
+                    ends(t.lexpos + 1)
+                    lines(t.lineno)
+                continue
+            index = m.lastindex
+            action, arg, type_id, text = actions[index]
+            if action == TOKEN:
+                types(type_id)
+                starts(pos)
+                ends(m.end(index))
+                lines(lineno)
+                pos = m.end()
+            elif action == NEWLINE:
+                lineno += m.group(index).count('\n')
+                self.lineno = lineno
+                pos = m.end()
+            elif action == DISCARD:
+                pos = m.end()
+            else:
+                start = pos
+                t, pos, lineno = self.call(arg, m, index, pos, lineno)
+                if t is not None:
+                    types(tables.type_ids[t.type])
+                    starts(start)
+                    ends(m.end(index))
+                    lines(t.lineno)
+        self.lexpos = pos
+        self.lineno = lineno
+        self.token = self.eof
+        return result
+
+    # tokenize() sobre bytes o un mmap
+    def byte_tokenize(self, data):
+        tables = get_tables(True, self.tables.newlines, self.tables.numbered)
+        table = tables.table
+        skip = tables.skip
+        ignore = tables.ignore
+        result = Tokens(data, tables.type_names)
+        types = result.types.append
+        starts = result.starts.append
+        ends = result.ends.append
+        lines = result.lines.append
+        end = len(data)
+        pos = 0
+        lineno = self.lineno
+        while pos < end:
+            kind, a, actions = table[data[pos]]
+            if kind == SINGLE:
+                types(actions)
+                starts(pos)
+                pos += 1
+                ends(pos)
+                lines(lineno)
+                continue
+            if kind == IGNORE:
+                pos += 1
+                if pos < end and data[pos] in ignore:
+                    pos = skip(data, pos).end()
+                continue
+            m = a(data, pos) if kind == MATCH else None
+            if m is None:
+                pos, t = self.error(pos, lineno)
+                while pos < end and 0x80 <= data[pos] < 0xC0:
+                    pos += 1 # resto del carácter UTF-8
+                lineno = self.lineno
+                if t is not None:
+                    types(tables.type_ids[t.type])
+                    starts(t.lexpos)
+                    ends(t.lexpos + 1)
+                    lines(t.lineno)
+                continue
+            index = m.lastindex
+            action, arg, type_id, text = actions[index]
+            if action == TOKEN:
+                types(type_id)
+                starts(pos)
+                ends(m.end(index))
+                lines(lineno)
+                pos = m.end()
+            elif action == NEWLINE:
+                lineno += m.group(index).count(b'\n')
+                self.lineno = lineno
+                pos = m.end()
+            elif action == DISCARD:
+                pos = m.end()
+            else:
+                start = pos
+                t, pos, lineno = self.call(arg, m, index, pos, lineno)
+                if t is not None:
+                    types(tables.type_ids[t.type])
+                    starts(start)
+                    ends(m.end(index))
+                    lines(t.lineno)
+        self.lexpos = pos
+        self.lineno = lineno
+        self.token = self.eof
+        return result
+
+    def error(self, pos, lineno):
+        errorf = self.tables.errorf
+        if isinstance(self.lexdata, str):
+            rest = self.lexdata[pos:]
+        else:
+            # modo de bytes: sólo el inicio del resto (no copiar todo el archivo)
+            rest = bytes(self.lexdata[pos:pos + 64]).decode('utf-8', 'replace')
+        if errorf is None:
+            raise LexError("Illegal character '%s' at index %d" % (rest[0], pos), rest)
+        t = Token()
+        t.type = 'error'
+        t.value = rest
+        t.lineno = lineno
+        t.lexpos = pos
+        t.lexer = self
+        self.lexpos = pos
+        self.lineno = lineno
+        t = errorf(t)
+        if self.lexpos == pos:
+            raise LexError("Scanning error. Illegal character '%s'" % rest[0], rest)
+        if t is not None and self.tables.numbered:
+            t.type = self.tables.type_ids[t.type]
+        return self.lexpos, t
+
+# Posiciones de los saltos de línea de un texto: la línea y la columna de una posición
+# se obtienen por búsqueda binaria. El índice se arma la primera vez que se pide una
+# línea (si nadie las pide, no se recorre el texto).
+class LineIndex:
+    def __init__(self, data, first=1):
+        self.data = data
+        self.first = first      # número de la primera línea
+        self.newlines = None    # posiciones de los '\n'
+
+    def build(self):
+        newlines = array('I')
+        append = newlines.append
+        find = self.data.find
+        pos = find('\n')
+        while pos != -1:
+            append(pos)
+            pos = find('\n', pos + 1)
+        self.newlines = newlines
+        return newlines
+
+    def lineno(self, pos):
+        newlines = self.newlines if self.newlines is not None else self.build()
+        return bisect_left(newlines, pos) + self.first
+
+    # Columna (desde 1) de 'pos' dentro de su línea
+    def column(self, pos):
+        newlines = self.newlines if self.newlines is not None else self.build()
+        line = bisect_left(newlines, pos)
+        return pos - newlines[line - 1] if line else pos + 1
+
+    def position(self, pos):
+        return self.lineno(pos), self.column(pos)
+
+# Token cuya línea se calcula (con el LineIndex del texto) sólo cuando se pide
+class LineToken:
+    __slots__ = ('type', 'value', 'lexpos', 'lines', 'lexer')
+
+    __str__ = Token.__str__
+    __repr__ = Token.__repr__
+
+    @property
+    def lineno(self):
+        return self.lines.lineno(self.lexpos)
+
+    @property
+    def column(self):
+        return self.lines.column(self.lexpos)
+
+# Scanner sin conteo de líneas al analizar: los saltos de línea se ignoran junto con
+# los espacios y la línea (de los tokens o del lexer) se calcula a partir de la
+# posición. Las líneas son las del texto, es decir, a diferencia de ply.lex, también
+# cuentan los saltos dentro de los comentarios /* ... */.
+class LineScanner(Scanner):
+    def __init__(self, tables=None):
+        self.lines = LineIndex('')
+        self.tokpos = 0 # inicio del último token (lexer.lineno es su línea)
+        Scanner.__init__(self, tables or get_tables(newlines=False))
+
+    def clone(self):
+        c = LineScanner(self.tables)
+        c.lineno = self.lineno
+        return c
+
+    # Asignar lineno cambia la numeración: la posición actual pasa a tener esa línea
+    # (con lineno = 1 antes de input(), el texto empieza en la línea 1)
+    @property
+    def lineno(self):
+        return self.lines.lineno(self.tokpos)
+
+    @lineno.setter
+    def lineno(self, value):
+        self.lines.first += value - self.lineno
+
+    def input(self, data):
+        if not isinstance(data, str):
+            raise ValueError('Expected a string')
+        self.lines = LineIndex(data, self.lineno)
+        self.tokpos = 0
+        Scanner.input(self, data) # usa tokens() de esta clase
+
+    def tokens(self):
+        data = self.lexdata
+        end = self.lexlen
+        tables = self.tables
+        table = tables.table
+        other = tables.other
+        skip = tables.skip
+        ignore = tables.ignore
+        lines = self.lines
+        pos = self.lexpos
+        while pos < end:
+            c = data[pos]
+            kind, a, actions = table[ord(c)] if c < '\x80' else other
+            if kind == SINGLE:
+                t = LineToken()
+                t.type = a
+                t.value = c
+                t.lexpos = pos
+                t.lines = lines
+                t.lexer = self
+                self.tokpos = pos
+                pos += 1
+                yield t
+                continue
+            if kind == IGNORE:
+                pos += 1
+                if pos < end and data[pos] in ignore:
+                    pos = skip(data, pos).end()
+                continue
+            m = a(data, pos) if kind == MATCH else None
+            if m is not None:
+                index = m.lastindex
+                action, arg, type_id, text = actions[index]
+                if action == TOKEN:
+                    t = LineToken()
+                    t.type = arg
+                    t.value = text or m.group(index)
+                    t.lexpos = pos
+                    t.lines = lines
+                    t.lexer = self
+                    self.tokpos = pos
+                    pos = m.end()
+                    yield t
+                    continue
+                if action == DISCARD:
+                    pos = m.end()
+                    continue
+            # carácter ilegal o regla con función propia: como en Scanner, con la
+            # línea ya calculada
+            self.tokpos = pos
+            lineno = self.lineno
+            if m is None:
+                pos, t = self.error(pos, lineno)
+            else:
+                t, pos, lineno = self.call(arg, m, index, pos, lineno)
+            if t is not None:
+                yield t
+        self.lexpos = pos
+        while True:
+            yield None
+
+# Tokens de un texto en columnas paralelas (array): id de tipo, posición inicial,
+# posición final y línea. Ocupan 13 bytes por token; el valor se toma de la fuente
+# sólo cuando se pide.
+class Tokens:
+    def __init__(self, data, names):
+        self.data = data        # str, o bytes/mmap (posiciones en bytes)
+        self.names = names      # id de tipo -> nombre del token
+        self.types = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lines = array('I')
+
+    def __len__(self):
+        return len(self.types)
+
+    def type(self, i):
+        return self.names[self.types[i]]
+
+    def value(self, i):
+        value = self.data[self.starts[i]:self.ends[i]]
+        return value if isinstance(value, str) else value.decode('utf-8', 'replace')
+
+    # (tipo, valor, línea, posición), como los campos de un LexToken
+    def __getitem__(self, i):
+        return (self.names[self.types[i]], self.value(i), self.lines[i], self.starts[i])
+
+    # Bytes que ocupan las columnas
+    @property
+    def nbytes(self):
+        return sum(len(c) * c.itemsize for c in (self.types, self.starts, self.ends, self.lines))
+
+    # Columnas como arreglos de NumPy (sin copiar), si NumPy está instalado
+    def numpy(self):
+        import numpy
+        return { name: numpy.frombuffer(column, dtype=column.typecode)
+                 for name, column in (('types', self.types), ('starts', self.starts),
+                                      ('ends', self.ends), ('lines', self.lines)) }
+
+    # Lexer que entrega estos tokens al analizador (p. ej. RustParser.parse(tokens))
+    def lexer(self):
+        return TokenLexer(self)
+
+# Interfaz de lexer (token, lineno, lexpos) sobre columnas ya calculadas
+class TokenLexer:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.lexdata = tokens.data
+        self.lexpos = 0
+        self.lineno = 1
+        self.token = self.generate().__next__
+
+    def input(self, data):
+        raise ValueError("TokenLexer ya tiene sus tokens")
+
+    def generate(self):
+        tokens = self.tokens
+        data = tokens.data
+        names = tokens.names
+        for type, start, end, lineno in zip(tokens.types, tokens.starts, tokens.ends, tokens.lines):
+            t = Token()
+            t.type = names[type]
+            t.value = data[start:end]
+            if not isinstance(t.value, str):
+                t.value = t.value.decode('utf-8', 'replace')
+            t.lineno = lineno
+            t.lexpos = start
+            t.lexer = self
+            self.lineno = lineno
+            self.lexpos = end
+            yield t
+        while True:
+            yield None
+
+# Lexer compartido (cada RustParser usa un clon)
+lexer = Scanner()
+
+# Contenido de un archivo como mmap de sólo lectura (para el modo de bytes, sin leer
+# ni decodificar el archivo completo); b'' si está vacío (no se puede mapear)
+def map_file(path):
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+# Columnas de los tokens de 'data' (con un lexer nuevo)
+def tokenize(data):
+    return lexer.clone().tokenize(data)
+
+# Tokens de 'data' como tuplas (tipo, valor, línea, posición) con el lexer dado
+def token_list(lexer, data):
+    lexer.lineno = 1
+    lexer.input(data)
+    return [ (t.type, t.value, t.lineno, t.lexpos) for t in iter(lexer.token, None) ]
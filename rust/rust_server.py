@@ -0,0 +1,304 @@
+# run -> python rust_server.py (socket Unix en la ruta por omisión)
+#     -> python rust_server.py --socket /tmp/rust.sock
+#     -> python rust_server.py --stdio (peticiones por stdin, respuestas por stdout)
+#
+# Servidor de análisis persistente: carga el lexer, las tablas y una sesión de
+# RustParser una sola vez y atiende peticiones, así que cada una sólo paga el análisis
+# (no el arranque de Python ni la importación de rust_lex / rust_yacc).
+#
+# Protocolo: JSON lines (un objeto por línea, en ambos sentidos). Petición:
+#     {"op": "parse" | "check" | "dump" | "ping" | "stats" | "shutdown",
+#      "path": ruta absoluta o "source": texto,
+#      "output": archivo de salida (parse), "format": "text" | "json" | "binary"}
+# - check: sólo los errores de sintaxis
+# - parse: además escribe el AST en 'output' (por omisión 'AST.txt' en el directorio
+#   del servidor) y regresa la tabla de símbolos, como pyrust.py
+# - dump: regresa el AST en la respuesta ("ast", en texto o JSON)
+# Respuesta: {"ok": true/false, "errors": [...], "ms": tiempo del análisis, ...} o
+# {"ok": false, "error": mensaje} si la petición no se pudo atender.
+# Se atienden varias conexiones a la vez, pero los análisis van uno por uno.
+# El cliente es rust_client.py.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import argparse
+import io
+import json
+import os
+import signal
+import selectors
+import socket
+import time
+
+import rust_yacc
+
+# Ruta por omisión del socket (se puede cambiar con la variable de entorno RUST_SERVER)
+default_socket = os.environ.get('RUST_SERVER', '/tmp/rust_server-%d.sock' % os.getuid())
+
+formats = ('text', 'json', 'binary')
+
+class RequestError(Exception):
+    pass
+
+class Timeout(Exception):
+    pass
+
+def alarm(signum, frame):
+    raise Timeout()
+
+def check_format(request):
+    format = request.get('format', 'text')
+    if format not in formats:
+        raise RequestError("formato desconocido: %r" % (format,))
+    return format
+
+# AST en el formato dado: texto (como AST.txt), JSON (rust_json) o binario (rust_binary)
+def serialize(ast, format):
+    if format == 'binary':
+        import rust_binary
+        return rust_binary.dumps(ast)
+    if format == 'json':
+        import rust_json
+        return rust_json.dumps(ast) + "\n"
+    out = io.StringIO()
+    ast.write(out)
+    return out.getvalue()
+
+# Texto a analizar de una petición: 'source' o el contenido del archivo 'path'
+def read_source(request):
+    if 'source' in request:
+        if not isinstance(request['source'], str):
+            raise RequestError("'source' debe ser texto")
+        return request['source']
+    path = request.get('path')
+    if not isinstance(path, str):
+        raise RequestError("falta 'path' o 'source'")
+    try:
+        with open(path, 'r') as file:
+            return file.read()
+    except FileNotFoundError:
+        raise RequestError("El archivo de entrada no existe")
+    except (OSError, UnicodeDecodeError) as e:
+        raise RequestError("No se pudo leer el archivo: %s" % e)
+
+# Escribir un AST serializado en 'path'; regresa la ruta
+def write_output(path, data):
+    try:
+        with open(path, 'wb' if isinstance(data, bytes) else 'w') as out:
+            out.write(data)
+    except OSError as e:
+        raise RequestError("No se pudo escribir el AST: %s" % e)
+    return path
+
+# Atiende peticiones (diccionarios) con una sesión de RustParser que se reutiliza.
+# 'timeout': segundos máximos por análisis (0: sin límite); al pasarse se descarta la
+# sesión y se crea otra.
+class Service:
+    def __init__(self, timeout=60):
+        self.session = rust_yacc.RustParser(verbose=False)
+        self.session.keep_scopes = True
+        self.timeout = timeout
+        self.requests = 0
+        self.failures = 0
+        self.busy = 0.0     # segundos analizando
+        self.started = time.time()
+        self.running = True
+
+    def handle(self, request):
+        self.requests += 1
+        try:
+            if not isinstance(request, dict):
+                raise RequestError("la petición debe ser un objeto JSON")
+            op = request.get('op')
+            method = getattr(self, 'op_%s' % op, None) if isinstance(op, str) else None
+            if method is None:
+                raise RequestError("operación desconocida: %r" % (op,))
+            return method(request)
+        except RequestError as e:
+            self.failures += 1
+            return { "ok": False, "error": str(e) }
+        except Exception as e:
+            # un error del analizador no debe tirar el servidor
+            self.failures += 1
+            return { "ok": False, "error": "error interno: %r" % e }
+
+    def source(self, request):
+        return read_source(request)
+
+    # Analizar 'data'; regresa (AST, errores, milisegundos)
+    def parse(self, data, positions=False):
+        start = time.perf_counter()
+        if self.timeout:
+            previous = signal.signal(signal.SIGALRM, alarm)
+            signal.alarm(self.timeout)
+        try:
+            ast = self.session.parse(data, positions=positions)
+        except Timeout:
+            self.session = rust_yacc.RustParser(verbose=False)
+            self.session.keep_scopes = True
+            raise RequestError("el análisis pasó el límite de %d s" % self.timeout)
+        finally:
+            if self.timeout:
+                signal.alarm(0)
+                signal.signal(signal.SIGALRM, previous)
+        elapsed = time.perf_counter() - start
+        self.busy += elapsed
+        return ast, list(self.session.errors), round(elapsed * 1e3, 3)
+
+    # Respuesta de 'op' (check, parse o dump) para el texto 'data'; con parse y dump
+    # lleva el AST serializado en "ast" (str, o bytes en formato binario) y con parse
+    # también la tabla de símbolos
+    def analyze(self, op, data, format='text'):
+        ast, errors, ms = self.parse(data, format == 'json')
+        response = { "ok": not errors, "errors": errors, "ms": ms }
+        if op != 'check' and ast is not None:
+            response["ast"] = serialize(ast, format)
+            if op == 'parse':
+                response["scopes"] = str(self.session.symbols)
+        return response
+
+    def op_check(self, request):
+        return self.analyze('check', self.source(request))
+
+    def op_parse(self, request):
+        format = check_format(request)
+        response = self.analyze('parse', self.source(request), format)
+        if "ast" in response:
+            response["output"] = write_output(request.get('output') or 'AST.txt', response.pop("ast"))
+        return response
+
+    def op_dump(self, request):
+        format = check_format(request)
+        if format == 'binary':
+            raise RequestError("dump no admite el formato binario (usar parse con 'output')")
+        return self.analyze('dump', self.source(request), format)
+
+    def op_ping(self, request):
+        return { "ok": True, "pid": os.getpid() }
+
+    def op_stats(self, request):
+        return { "ok": True, "pid": os.getpid(), "requests": self.requests, "failures": self.failures,
+                 "busy": round(self.busy, 3), "uptime": round(time.time() - self.started, 3) }
+
+    def op_shutdown(self, request):
+        self.running = False
+        return { "ok": True }
+
+# Respuesta (una línea JSON en bytes) a una línea de petición
+def respond(service, line):
+    try:
+        request = json.loads(line)
+    except ValueError:
+        response = { "ok": False, "error": "JSON inválido" }
+    else:
+        response = service.handle(request)
+    return json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n"
+
+# Atender las peticiones (JSON lines) de 'rfile' escribiendo las respuestas en 'wfile'
+# (archivos binarios) hasta el fin de la entrada o un 'shutdown'
+def serve_lines(service, rfile, wfile):
+    for line in rfile:
+        if not line.strip():
+            continue
+        wfile.write(respond(service, line))
+        wfile.flush()
+        if not service.running:
+            break
+
+# Servidor en un socket Unix. Acepta varias conexiones a la vez (con selectors, en un
+# solo hilo) y atiende sus peticiones una por una con la misma sesión; una conexión
+# abierta sin peticiones no bloquea a las demás.
+class Server:
+    def __init__(self, path, service):
+        self.path = path
+        self.service = service
+        # un socket de un servidor anterior que ya no responde
+        if os.path.exists(path) and not alive(path):
+            os.remove(path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen(64)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.buffers = { }  # conexión -> bytes recibidos sin completar una línea
+
+    def serve(self):
+        while self.service.running:
+            for key, events in self.selector.select():
+                if key.fileobj is self.listener:
+                    conn, address = self.listener.accept()
+                    self.selector.register(conn, selectors.EVENT_READ)
+                    self.buffers[conn] = b""
+                else:
+                    self.receive(key.fileobj)
+                if not self.service.running:
+                    break
+
+    def receive(self, conn):
+        try:
+            data = conn.recv(1 << 16)
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(conn)
+            return
+        lines = (self.buffers[conn] + data).split(b"\n")
+        self.buffers[conn] = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                conn.sendall(respond(self.service, line))
+            except OSError:
+                self.drop(conn) # el cliente se fue
+                return
+            if not self.service.running:
+                return
+
+    def drop(self, conn):
+        self.selector.unregister(conn)
+        del self.buffers[conn]
+        conn.close()
+
+    def close(self):
+        for conn in list(self.buffers):
+            self.drop(conn)
+        self.selector.close()
+        self.listener.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+# ¿Hay un servidor escuchando en 'path'?
+def alive(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except OSError:
+            return False
+    return True
+
+def serve(path=None, timeout=60):
+    path = path or default_socket
+    server = Server(path, Service(timeout))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve()
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser(usage="python rust_server.py [--socket ruta | --stdio]")
+    args.add_argument('--socket', default=None, metavar='ruta',
+                      help="ruta del socket Unix (por omisión %s)" % default_socket)
+    args.add_argument('--stdio', action='store_true',
+                      help="leer peticiones de stdin y escribir respuestas en stdout")
+    args.add_argument('--timeout', type=int, default=60,
+                      help="segundos máximos por análisis (0: sin límite)")
+    opts = args.parse_args()
+    if opts.stdio:
+        serve_lines(Service(opts.timeout), sys.stdin.buffer, sys.stdout.buffer)
+    else:
+        serve(opts.socket, opts.timeout)
@@ -0,0 +1,162 @@
+# Análisis en flujo: el texto llega por partes (archivo, tubería, socket) y el analizador
+# recibe los tokens conforme se leen, sin esperar a tener toda la entrada.
+#
+# Los tokens de rust_lex no cruzan saltos de línea, salvo los comentarios /* ... */.
+# Por eso el lexer sólo analiza hasta el último salto de línea leído (el resto de la
+# línea espera a la siguiente lectura), y si encuentra un '/*' sin su '*/' sigue
+# leyendo antes de decidir. Así los tokens que quedan entre dos lecturas son los mismos
+# que con el texto completo, sea cual sea el tamaño de las lecturas.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+from ply.lex import LexError
+
+import rust_scanner
+from rust_scanner import DISCARD, IGNORE, MATCH, NEWLINE, SINGLE, TOKEN, Token
+
+# Lexer sobre un objeto de texto con read(n) (sys.stdin, open(...), socket.makefile()).
+# lexpos es la posición en todo el texto leído; lexdata es sólo el fragmento actual.
+class StreamScanner:
+    def __init__(self, stream, chunk_size=1 << 16, tables=None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.tables = tables or rust_scanner.get_tables()
+        self.lexdata = ''   # fragmento que se está analizando
+        self.base = 0       # posición de lexdata[0] en el texto completo
+        self.limit = 0      # fin de la parte de lexdata que ya se puede analizar
+        self.eof = False
+        self.lexpos = 0
+        self.lineno = 1
+        self.token = self.tokens().__next__
+
+    def input(self, data):
+        raise ValueError("StreamScanner lee su entrada de 'stream'")
+
+    def skip(self, n):
+        self.lexpos += n
+
+    # Leer hasta tener un salto de línea nuevo (o el fin de la entrada), conservando lo
+    # que falta analizar desde 'pos'; regresa la nueva posición (relativa a lexdata)
+    def fill(self, pos):
+        parts = [ self.lexdata[pos:] ]
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                self.eof = True
+                break
+            parts.append(chunk)
+            if '\n' in chunk:
+                break
+        self.base += pos
+        self.lexdata = data = "".join(parts)
+        self.limit = len(data) if self.eof else data.rindex('\n') + 1 if '\n' in data else 0
+        return 0
+
+    def tokens(self):
+        tables = self.tables
+        table = tables.table
+        other = tables.other
+        skip = tables.skip
+        ignore = tables.ignore
+        lineno = self.lineno
+        pos = 0
+        while True:
+            if pos >= self.limit:
+                if self.eof:
+                    break
+                pos = self.fill(pos)
+                continue
+            data = self.lexdata
+            limit = self.limit
+            c = data[pos]
+            kind, a, actions = table[ord(c)] if c < '\x80' else other
+            if kind == SINGLE:
+                t = Token()
+                t.type = a
+                t.value = c
+                t.lineno = lineno
+                t.lexpos = self.base + pos
+                t.lexer = self
+                pos += 1
+                yield t
+                continue
+            if kind == IGNORE:
+                pos += 1
+                if pos < limit and data[pos] in ignore:
+                    pos = skip(data, pos, limit).end()
+                continue
+            if c == '/' and data.startswith('/*', pos) and not self.eof:
+                # comentario de bloque: su fin puede estar en lecturas siguientes
+                if data.find('*/', pos + 2) == -1:
+                    pos = self.fill(pos)
+                    continue
+                limit = len(data) # el comentario termina dentro de lo leído
+            m = a(data, pos, limit) if kind == MATCH else None
+            if m is None:
+                self.lexpos = self.base + pos
+                self.lineno = lineno
+                t = self.error(data[pos:limit])
+                pos = self.lexpos - self.base
+                lineno = self.lineno
+                if t is not None:
+                    yield t
+                continue
+            index = m.lastindex
+            action, arg, type_id, text = actions[index]
+            if action == TOKEN:
+                t = Token()
+                t.type = arg
+                t.value = text or m.group(index)
+                t.lineno = lineno
+                t.lexpos = self.base + pos
+                t.lexer = self
+                pos = m.end()
+                yield t
+            elif action == NEWLINE:
+                lineno += m.group(index).count('\n')
+                self.lineno = lineno
+                pos = m.end()
+            elif action == DISCARD:
+                pos = m.end()
+            else:
+                # regla con acciones propias: se llama como lo haría ply
+                t = Token()
+                t.type = None
+                t.value = m.group(index)
+                t.lineno = lineno
+                t.lexpos = self.base + pos
+                t.lexer = self
+                self.lexmatch = m
+                self.lexpos = self.base + m.end(index)
+                self.lineno = lineno
+                t = arg(t)
+                pos = self.lexpos - self.base
+                lineno = self.lineno
+                if t is not None:
+                    yield t
+        self.lexpos = self.base + pos
+        self.lineno = lineno
+        while True:
+            yield None
+
+    # Carácter ilegal: t_error como en ply (con el resto del fragmento como valor)
+    def error(self, rest):
+        errorf = self.tables.errorf
+        if errorf is None:
+            raise LexError("Illegal character '%s' at index %d" % (rest[0], self.lexpos), rest)
+        t = Token()
+        t.type = 'error'
+        t.value = rest
+        t.lineno = self.lineno
+        t.lexpos = start = self.lexpos
+        t.lexer = self
+        t = errorf(t)
+        if self.lexpos == start:
+            raise LexError("Scanning error. Illegal character '%s'" % rest[0], rest)
+        return t
+
+# Analizar 'stream' con la sesión dada (rust_yacc.RustParser) leyendo de a
+# 'chunk_size' caracteres; regresa el AST o None si hubo errores
+def parse(session, stream, chunk_size=1 << 16, debug=0, scope=False):
+    return session.parse(None, debug, scope, lexer=StreamScanner(stream, chunk_size))
@@ -0,0 +1,116 @@
+# run -> python rust_tables.py
+#     (genera la caché de tablas del lexer y del analizador en 'tables/')
+
+# Caché persistente de tablas del lexer (lextab) y del analizador LALR (parsetab).
+# Cada archivo lleva en su nombre la versión de tablas de PLY y un hash de la firma
+# de las reglas (ParserReflect.signature() para yacc, la equivalente para lex), así
+# que un cambio en la gramática nunca carga tablas viejas ni sobrescribe las de otra
+# versión. Al iniciar sólo se leen las tablas; se generan únicamente si faltan.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+import glob
+import hashlib
+import importlib.util
+import os
+
+import ply.lex as lex
+import ply.yacc as yacc
+
+# Directorio de la caché (se puede cambiar con la variable de entorno RUST_TABLES)
+cache_dir = os.environ.get('RUST_TABLES',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables'))
+
+# Nombre de archivo para una firma: <prefijo>_<versión>_<hash>
+def table_name(prefix, signature):
+    digest = hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]
+    return '%s_%s_%s' % (prefix, yacc.__tabversion__.replace('.', ''), digest)
+
+# Firma de las reglas del lexer (tokens, expresiones regulares y acciones)
+def lex_signature(module):
+    ldict = dict((k, getattr(module, k)) for k in dir(module))
+    linfo = lex.LexerReflect(ldict)
+    linfo.get_all()
+    parts = [ ' '.join(linfo.tokens), repr(linfo.ignore), str(linfo.reflags) ]
+    for state in sorted(linfo.funcsym):
+        for name, func in linfo.funcsym[state]:
+            parts.append(name + '=' + lex._get_regex(func))
+        for name, regex in linfo.strsym[state]:
+            parts.append(name + '=' + regex)
+    return '\n'.join(parts)
+
+# Firma de la gramática (la misma que guarda yacc en sus tablas)
+def yacc_signature(module):
+    pdict = dict((k, getattr(module, k)) for k in dir(module))
+    pinfo = yacc.ParserReflect(pdict)
+    pinfo.get_all()
+    return pinfo.signature()
+
+def writable():
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(cache_dir, os.W_OK)
+
+# Construir el lexer de 'module' leyendo su lextab de la caché (o generándola)
+def build_lexer(module):
+    name = table_name('lextab', lex_signature(module))
+    path = os.path.join(cache_dir, name + '.py')
+    if os.path.exists(path):
+        spec = importlib.util.spec_from_file_location(name, path)
+        lextab = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(lextab)
+        try:
+            return lex.lex(module=module, optimize=1, lextab=lextab)
+        except (ImportError, KeyError, AttributeError):
+            pass # tabla inválida: se vuelve a generar
+
+    lexer = lex.lex(module=module)
+    if writable():
+        try:
+            lexer.writetab(name, cache_dir)
+        except IOError:
+            return lexer
+        clean((name, ), 'lextab_*')
+    return lexer
+
+# Construir el analizador de 'module' leyendo su parsetab de la caché (o generándola)
+def build_parser(module, debug=False):
+    if not writable():
+        return yacc.yacc(module=module, debug=debug, write_tables=False)
+
+    name = table_name('parsetab', yacc_signature(module))
+    picklefile = os.path.join(cache_dir, name + '.pickle')
+    existed = os.path.exists(picklefile)
+    parser = yacc.yacc(module=module, debug=debug, outputdir=cache_dir, picklefile=picklefile)
+    if not existed:
+        clean((name, ), 'parsetab_*') # tablas nuevas: las de otras versiones ya no sirven
+    return parser
+
+# Borrar tablas de otras versiones de las reglas ('pattern': qué archivos revisar)
+def clean(keep, pattern='*tab_*'):
+    for path in glob.glob(os.path.join(cache_dir, pattern)):
+        if os.path.splitext(os.path.basename(path))[0] not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass # otro proceso ya la borró
+
+# Generar la caché desde cero
+def build():
+    import rust_lex
+    import rust_yacc
+
+    keep = (table_name('lextab', lex_signature(rust_lex)),
+            table_name('parsetab', yacc_signature(rust_yacc)))
+    clean(( ))
+    build_lexer(rust_lex)
+    build_parser(rust_yacc, debug=True) # también escribe parser.out en la caché
+    clean(keep)
+    return keep
+
+if __name__ == '__main__':
+    for name in build():
+        print("Tabla generada: %s" % name)
@@ -0,0 +1,734 @@
+# Compilador a bytecode y máquina virtual de pila para los AST de rust_yacc
+#
+# El AST se compila una vez a códigos de operación enteros (array('i')) con una tabla
+# de constantes y las variables resueltas a casillas (locales por función o globales),
+# y luego se ejecuta en un ciclo cerrado. La semántica es la misma que la de rust_eval.
+
+import sys
+if ".." not in sys.path: sys.path.insert(0,"..")
+
+from array import array
+
+import rust_ast
+from rust_eval import RustError, cast, divide, number, op_precedence, reminder
+
+# -- Códigos de operación -- #
+# Los que llevan argumento ocupan dos posiciones en el código
+
+opnames = [
+    'CONST',        # arg: constante -> push
+    'LOAD',         # arg: casilla local -> push
+    'STORE',        # arg: casilla local <- pop
+    'LOAD_GLOBAL',  # arg: casilla global -> push
+    'STORE_GLOBAL', # arg: casilla global <- pop
+    'LOAD_NAME',    # arg: nombre no definido (error al ejecutarse)
+    'POP',
+    'ADD', 'SUB', 'MUL', 'DIV', 'REM', 'AND', 'OR', 'XOR',
+    'EQ', 'NE', 'LT', 'GT', 'LE', 'GE',
+    'JUMP',         # arg: destino
+    'JUMP_IF_FALSE',# arg: destino (pop)
+    'CALL',         # arg: número de argumentos
+    'RETURN',
+    'CAST',         # arg: constante con el tipo
+    'ERROR',        # arg: constante con el mensaje
+]
+(CONST, LOAD, STORE, LOAD_GLOBAL, STORE_GLOBAL, LOAD_NAME, POP,
+ ADD, SUB, MUL, DIV, REM, AND, OR, XOR,
+ EQ, NE, LT, GT, LE, GE,
+ JUMP, JUMP_IF_FALSE, CALL, RETURN, CAST, ERROR) = range(len(opnames))
+has_arg = { CONST, LOAD, STORE, LOAD_GLOBAL, STORE_GLOBAL, LOAD_NAME, JUMP, JUMP_IF_FALSE, CALL, CAST, ERROR }
+
+binary_ops = {
+    '+' : ADD, '-' : SUB, '*' : MUL, '/' : DIV, '%' : REM,
+    '&' : AND, '|' : OR, '^' : XOR,
+    '==' : EQ, '!=' : NE, '<' : LT, '>' : GT, '<=' : LE, '>=' : GE,
+}
+
+# Código compilado de una función (o del programa)
+class Code:
+    def __init__(self, name, nparams=0):
+        self.name = name
+        self.nparams = nparams
+        self.code = array('i')
+        self.consts = [ ]
+        self.nlocals = 0
+
+    def __repr__(self):
+        return "<código %s>" % self.name
+
+# Función en la máquina virtual
+class VMFunction:
+    def __init__(self, code):
+        self.code = code
+
+    def __repr__(self):
+        return "fn %s" % self.code.name
+
+# Listado legible del bytecode
+def disassemble(code, out=sys.stdout):
+    c = code.code
+    pc = 0
+    while pc < len(c):
+        op = c[pc]
+        if op in has_arg:
+            arg = c[pc + 1]
+            extra = ""
+            if op in (CONST, CAST, ERROR, LOAD_NAME):
+                extra = " (%r)" % (code.consts[arg],)
+            out.write("%5d %-14s %d%s\n" % (pc, opnames[op], arg, extra))
+            pc += 2
+        else:
+            out.write("%5d %s\n" % (pc, opnames[op]))
+            pc += 1
+
+# -- Compilador -- #
+
+T = rust_ast.type_id
+EXPR, LITERAL, PAREN_EXPR, ID_LIT, EMPTY, INIT, BINOP, BINOP_EXPR, TYPE = (
+    T('expr'), T('literal'), T('paren_expr'), T('id_lit'), T('empty'), T('init'), T('binop'), T('binop_expr'), T('type'))
+STMT, ITEM, DECL_STMT, FN_ITEM, CONST_ITEM, STATIC_ITEM, LET_DECL = (
+    T('stmt'), T('item'), T('decl_stmt'), T('fn_item'), T('const_item'), T('static_item'), T('let_decl'))
+ASSIGNMENT, COMPOUND_ASSIGNMENT, WHILE, LOOP, IF = (
+    T('assignment'), T('compound_assignment'), T('while'), T('loop'), T('if'))
+BLOCK, BLOCK_A, BLOCK_B, BLOCK_E, ELSE = T('block'), T('block_a'), T('block_b'), T('block_e'), T('else')
+
+# Nodos que se pueden compilar sin dejar valor (reciben value=False)
+statement_types = { WHILE, LOOP, IF, BLOCK, BLOCK_A, BLOCK_B, BLOCK_E, ELSE }
+
+# Alcance de una función durante la compilación: pila de bloques {nombre: casilla}.
+# 'parent' es el alcance de la función que la contiene (si es anidada): de él sólo se
+# ven las funciones, que se conocen al compilar ('functions': casilla -> VMFunction)
+class FunctionScope:
+    def __init__(self, code, parent=None):
+        self.code = code
+        self.parent = parent
+        self.blocks = [ { } ]
+        self.functions = { }
+
+    def lookup(self, name):
+        for block in reversed(self.blocks):
+            if name in block:
+                return block[name]
+        return None
+
+    # Función 'name' de un alcance que rodea a este (como en rust_eval.Items) o None
+    def item(self, name):
+        scope = self.parent
+        while scope is not None:
+            slot = scope.lookup(name)
+            if slot is not None:
+                return scope.functions.get(slot)
+            scope = scope.parent
+        return None
+
+    def declare(self, name):
+        slot = self.code.nlocals
+        self.code.nlocals += 1
+        self.blocks[-1][name] = slot
+        return slot
+
+class Compiler:
+    def __init__(self, ast):
+        a = ast.arena
+        self.ast = ast
+        self.first, self.next, self.types, self.leaves = a.first, a.next, a.types, a.leaves
+        self.globals = { }  # nombre -> casilla global
+        self.scope = None   # None: nivel superior (variables globales)
+        self.loops = [ ]    # ciclos abiertos: (inicio, saltos de break por corregir)
+        self.declared = { } # fn de un bloque ya declarada: nodo -> VMFunction
+        self.table = [ getattr(self, 'c_' + name, self.c_unknown) for name in rust_ast.type_names ]
+
+    def children(self, i):
+        result = [ ]
+        child = self.first[i]
+        while child != -1:
+            result.append(child)
+            child = self.next[child]
+        return result
+
+    # Quitar envolturas de un solo hijo (expr, literal, paren_expr)
+    def unwrap(self, i):
+        while self.types[i] in (EXPR, LITERAL, PAREN_EXPR):
+            i = self.first[i]
+        return i
+
+    # -- Emisión -- #
+
+    def emit(self, op, arg=None):
+        code = self.code.code
+        code.append(op)
+        if arg is not None:
+            code.append(arg)
+        return len(code) - 1 # posición del argumento (para corregir saltos)
+
+    def const(self, value):
+        consts = self.code.consts
+        for k, c in enumerate(consts):
+            if c is value or (type(c) is type(value) and c == value):
+                return self.emit(CONST, k)
+        consts.append(value)
+        return self.emit(CONST, len(consts) - 1)
+
+    def const_index(self, value):
+        self.code.consts.append(value)
+        return len(self.code.consts) - 1
+
+    def here(self):
+        return len(self.code.code)
+
+    def patch(self, pos, target):
+        self.code.code[pos] = target
+
+    # -- Variables -- #
+
+    def load(self, name):
+        if self.scope is not None:
+            slot = self.scope.lookup(name)
+            if slot is not None:
+                return self.emit(LOAD, slot)
+            function = self.scope.item(name)
+            if function is not None:
+                return self.const(function)
+        if name in self.globals:
+            return self.emit(LOAD_GLOBAL, self.globals[name])
+        return self.emit(LOAD_NAME, self.const_index(name))
+
+    def store(self, name):
+        if self.scope is not None:
+            slot = self.scope.lookup(name)
+            if slot is not None:
+                return self.emit(STORE, slot)
+            if self.scope.item(name) is not None:
+                return self.emit(ERROR, self.const_index("No se puede asignar a la función '%s'" % name))
+        if name in self.globals:
+            return self.emit(STORE_GLOBAL, self.globals[name])
+        return self.emit(LOAD_NAME, self.const_index(name)) # asignar a una variable no definida
+
+    def declare(self, name):
+        if self.scope is None:
+            self.emit(STORE_GLOBAL, self.global_slot(name))
+        else:
+            self.emit(STORE, self.scope.declare(name))
+
+    def global_slot(self, name):
+        if name not in self.globals:
+            self.globals[name] = len(self.globals)
+        return self.globals[name]
+
+    # -- Compilación -- #
+
+    # Programa: primero se registran los nombres de nivel superior (para poder
+    # llamar funciones definidas más abajo)
+    def compile(self):
+        self.code = Code('<programa>')
+        for stmt in self.children(self.first[self.ast.index]):
+            decl = self.first[stmt]
+            if decl == -1 or self.types[decl] != DECL_STMT:
+                continue
+            node = self.first[decl]
+            if self.types[node] == ITEM:
+                node = self.first[node]
+            self.global_slot(self.leaves[node])
+        self.effect(self.ast.index)
+        self.const(None)
+        self.emit(RETURN)
+        return self.code
+
+    # Compilar una expresión dejando su valor en la pila
+    def expr(self, i):
+        self.table[self.types[i]](i)
+
+    # Compilar sin dejar valor en la pila
+    def effect(self, i):
+        node = self.unwrap(i)
+        t = self.types[node]
+        if t == BINOP_EXPR and self.next[self.first[node]] == -1:
+            inner = self.first[node]
+            if self.types[inner] == ASSIGNMENT:
+                return self.assignment(inner, False)
+            if self.types[inner] == COMPOUND_ASSIGNMENT:
+                return self.compound(inner, False)
+        if t in statement_types:
+            return self.table[t](node, False)
+        self.expr(node)
+        self.emit(POP)
+
+    # Compilar con o sin valor según 'value'
+    def part(self, i, value):
+        if value:
+            self.expr(i)
+        else:
+            self.effect(i)
+
+    def c_unknown(self, i):
+        raise RustError("No se puede compilar el nodo '%s'" % rust_ast.type_names[self.types[i]])
+
+    def c_single(self, i):
+        self.expr(self.first[i])
+
+    c_expr = c_literal = c_paren_expr = c_single
+
+    def c_block_e(self, i, value=True):
+        self.part(self.first[i], value)
+
+    c_else = c_block_e
+
+    # Sentencias (no dejan valor)
+    def c_program(self, i):
+        self.effect(self.first[i])
+        self.const(None)
+
+    def c_list_stmt(self, i):
+        for child in self.children(i):
+            self.statement(child)
+        self.const(None)
+
+    def statement(self, i):
+        node = self.first[i] # stmt -> decl_stmt | expr_stmt (o nada si es ';')
+        if node == -1:
+            return
+        node = self.first[node]
+        if self.types[node] == ITEM:
+            node = self.first[node]
+        t = self.types[node]
+        if t == FN_ITEM:
+            self.function(node)
+        elif t in (CONST_ITEM, STATIC_ITEM):
+            self.expr(self.children(node)[1])
+            self.declare(self.leaves[node])
+        elif t == LET_DECL:
+            self.let(node)
+        else:
+            self.effect(node)
+
+    def let(self, i):
+        value = None
+        for child in self.children(i):
+            if self.types[child] == INIT:
+                value = self.first[child]
+        if value is None:
+            self.const(None)
+        else:
+            self.expr(value)
+        self.declare(self.leaves[i])
+
+    # Nombres de los parámetros de una función
+    def params(self, i):
+        params = [ ]
+        for expr in self.children(self.first[self.first[i]]):
+            node = self.unwrap(expr)
+            if self.types[node] == EMPTY:
+                continue
+            if self.types[node] != ID_LIT:
+                raise RustError("Parámetro inválido en la función")
+            params.append(self.leaves[node])
+        return params
+
+    def function(self, i):
+        body = self.children(i)[1]
+        name = self.leaves[i]
+        params = self.params(i)
+
+        outer_code, outer_scope, outer_loops = self.code, self.scope, self.loops
+        if outer_scope is None:
+            function = VMFunction(Code(name, len(params)))
+        else:
+            function = self.declared.pop(i) # ya guardada (ver declare_functions)
+        self.code = function.code
+        self.scope = FunctionScope(self.code, outer_scope)
+        self.loops = [ ]
+        for param in params:
+            self.scope.declare(param)
+        self.expr(body)
+        self.emit(RETURN)
+        self.code, self.scope, self.loops = outer_code, outer_scope, outer_loops
+
+        if outer_scope is None:
+            self.const(function)
+            self.emit(STORE_GLOBAL, self.global_slot(name))
+
+    # Las funciones de un bloque se declaran (casilla y VMFunction) y se guardan al entrar
+    # a él, antes de compilar sus sentencias: así se pueden llamar desde antes de su
+    # declaración, a sí mismas o entre ellas (como las globales en compile()); su código
+    # se compila al llegar a su sentencia
+    def declare_functions(self, i):
+        if self.types[i] not in (BLOCK_A, BLOCK_B):
+            return
+        for stmt in self.children(i):
+            node = self.first[stmt] # stmt -> decl_stmt (o nada si es ';')
+            if self.types[stmt] != STMT or node == -1 or self.types[node] != DECL_STMT:
+                continue
+            node = self.first[node]
+            if self.types[node] == ITEM:
+                node = self.first[node]
+            if self.types[node] == FN_ITEM:
+                function = VMFunction(Code(self.leaves[node], len(self.params(node))))
+                slot = self.scope.declare(self.leaves[node])
+                self.scope.functions[slot] = function
+                self.declared[node] = function
+                self.const(function)
+                self.emit(STORE, slot)
+
+    # Bloques
+    def c_block(self, i, value=True):
+        if self.scope is None:
+            # bloque en el nivel superior: sus variables son locales del programa
+            self.scope = FunctionScope(self.code)
+            self.declare_functions(self.first[i])
+            self.part(self.first[i], value)
+            self.scope = None
+            return
+        self.scope.blocks.append({ })
+        self.declare_functions(self.first[i])
+        self.part(self.first[i], value)
+        self.scope.blocks.pop()
+
+    def c_block_a(self, i, value=True):
+        for child in self.children(i):
+            if self.types[child] != EMPTY:
+                self.statement(child)
+        if value:
+            self.const(None)
+
+    def c_block_b(self, i, value=True):
+        children = self.children(i)
+        for child in children[:-1]:
+            self.statement(child)
+        self.part(children[-1], value)
+
+    # Literales
+    def c_string_lit(self, i):
+        self.const(self.leaves[i][1:-1])
+
+    c_char_lit = c_string_lit
+
+    def c_num_lit(self, i):
+        self.const(number(self.leaves[i]))
+
+    def c_bool_lit(self, i):
+        self.const(self.leaves[i] == 'true')
+
+    def c_id_lit(self, i):
+        self.load(self.leaves[i])
+
+    # Operadores
+    def operator(self, i):
+        if self.types[i] == BINOP:
+            i = self.first[i]
+        return self.leaves[i]
+
+    # Operandos y operadores de una cadena ya aplanada, emitidos en orden postfijo
+    # con la precedencia de rust_yacc (igual que rust_eval)
+    def chain(self, operands, ops):
+        self.expr(operands[0])
+        pending = [ ]
+        for op, operand in zip(ops, operands[1:]):
+            while pending and op_precedence[pending[-1]] >= op_precedence[op]:
+                self.emit(binary_ops[pending.pop()])
+            pending.append(op)
+            self.expr(operand)
+        while pending:
+            self.emit(binary_ops[pending.pop()])
+
+    def c_binop_expr(self, i):
+        first, nxt = self.first, self.next
+        if nxt[first[i]] == -1:
+            return self.expr(first[i])
+        operands = [ ]
+        ops = [ ]
+        node = i
+        while True:
+            left, op, right = self.children(node)
+            operands.append(left)
+            ops.append(self.operator(op))
+            inner = first[right]
+            if self.types[inner] == BINOP_EXPR and nxt[first[inner]] != -1:
+                node = inner
+                continue
+            operands.append(right)
+            return self.chain(operands, ops)
+
+    def c_cond_expr(self, i):
+        operands = [ ]
+        ops = [ ]
+        node = i
+        while True:
+            literal, *rest = self.children(node)
+            operands.append(literal)
+            if not rest:
+                break
+            op, node = self.children(rest[0])
+            ops.append(self.operator(op))
+        self.chain(operands, ops)
+
+    def c_type_cast(self, i):
+        self.load(self.leaves[i])
+        self.emit(CAST, self.const_index(self.leaves[self.first[i]]))
+
+    def target(self, i):
+        node = self.unwrap(i)
+        if self.types[node] != ID_LIT:
+            raise RustError("Sólo se puede asignar a variables")
+        return self.leaves[node]
+
+    def assignment(self, i, value=True):
+        left, right = self.children(i)
+        name = self.target(left)
+        self.expr(right)
+        self.store(name)
+        if value:
+            self.const(None)
+
+    def compound(self, i, value=True):
+        left, op, right = self.children(i)
+        name = self.target(left)
+        self.load(name)
+        self.expr(right)
+        self.emit(binary_ops[self.leaves[op]])
+        self.store(name)
+        if value:
+            self.const(None)
+
+    c_assignment = assignment
+    c_compound_assignment = compound
+
+    def c_call_expr(self, i):
+        callee, args = self.children(i)
+        self.expr(callee)
+        count = 0
+        for child in self.children(self.first[args]):
+            if self.types[child] != EMPTY:
+                self.expr(child)
+                count += 1
+        self.emit(CALL, count)
+
+    def c_method_call(self, i):
+        self.emit(ERROR, self.const_index("Método no definido '%s'" % self.leaves[i]))
+
+    # Ciclos: los break se corrigen al terminar el ciclo
+    def c_while(self, i, value=True):
+        cond, body = self.children(i)
+        start = self.here()
+        self.expr(cond)
+        exit_jump = self.emit(JUMP_IF_FALSE, 0)
+        self.loops.append((start, [ ]))
+        self.effect(body)
+        self.emit(JUMP, start)
+        self.end_loop(exit_jump, value)
+
+    def c_loop(self, i, value=True):
+        start = self.here()
+        self.loops.append((start, [ ]))
+        self.effect(self.first[i])
+        self.emit(JUMP, start)
+        self.end_loop(None, value)
+
+    def end_loop(self, exit_jump, value):
+        start, breaks = self.loops.pop()
+        end = self.here()
+        if exit_jump is not None:
+            self.patch(exit_jump, end)
+        for pos in breaks:
+            self.patch(pos, end)
+        if value:
+            self.const(None)
+
+    def c_break(self, i):
+        if not self.loops:
+            return self.emit(ERROR, self.const_index("break fuera de un ciclo"))
+        self.loops[-1][1].append(self.emit(JUMP, 0))
+
+    def c_continue(self, i):
+        if not self.loops:
+            return self.emit(ERROR, self.const_index("continue fuera de un ciclo"))
+        self.emit(JUMP, self.loops[-1][0])
+
+    def c_return(self, i):
+        child = self.first[i]
+        if child == -1:
+            self.const(None)
+        else:
+            self.expr(child)
+        self.emit(RETURN)
+
+    def c_if(self, i, value=True):
+        children = self.children(i)
+        self.expr(children[0])
+        else_jump = self.emit(JUMP_IF_FALSE, 0)
+        self.part(children[1], value)
+        if len(children) == 3 or value:
+            end_jump = self.emit(JUMP, 0)
+            self.patch(else_jump, self.here())
+            if len(children) == 3:
+                self.part(children[2], value)
+            else:
+                self.const(None)
+            self.patch(end_jump, self.here())
+        else:
+            self.patch(else_jump, self.here())
+
+# -- Máquina virtual -- #
+
+class VM:
+    def __init__(self, nglobals):
+        self.globals = [ UNDEFINED ] * nglobals
+
+    # Ejecutar el código de una función con sus argumentos
+    def execute(self, code, args):
+        c = code.code
+        consts = code.consts
+        local = list(args) + [ None ] * (code.nlocals - len(args))
+        glob = self.globals
+        stack = [ ]
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        try:
+            while True:
+                op = c[pc]
+                if op == LOAD:
+                    push(local[c[pc + 1]])
+                    pc += 2
+                elif op == CONST:
+                    push(consts[c[pc + 1]])
+                    pc += 2
+                elif op == STORE:
+                    local[c[pc + 1]] = pop()
+                    pc += 2
+                elif op == ADD:
+                    b = pop()
+                    stack[-1] = stack[-1] + b
+                    pc += 1
+                elif op == JUMP_IF_FALSE:
+                    if pop():
+                        pc += 2
+                    else:
+                        pc = c[pc + 1]
+                elif op == JUMP:
+                    pc = c[pc + 1]
+                elif op == LT:
+                    b = pop()
+                    stack[-1] = stack[-1] < b
+                    pc += 1
+                elif op == GT:
+                    b = pop()
+                    stack[-1] = stack[-1] > b
+                    pc += 1
+                elif op == SUB:
+                    b = pop()
+                    stack[-1] = stack[-1] - b
+                    pc += 1
+                elif op == POP:
+                    pop()
+                    pc += 1
+                elif op == LE:
+                    b = pop()
+                    stack[-1] = stack[-1] <= b
+                    pc += 1
+                elif op == GE:
+                    b = pop()
+                    stack[-1] = stack[-1] >= b
+                    pc += 1
+                elif op == EQ:
+                    b = pop()
+                    stack[-1] = stack[-1] == b
+                    pc += 1
+                elif op == NE:
+                    b = pop()
+                    stack[-1] = stack[-1] != b
+                    pc += 1
+                elif op == MUL:
+                    b = pop()
+                    stack[-1] = stack[-1] * b
+                    pc += 1
+                elif op == REM:
+                    b = pop()
+                    a = stack[-1]
+                    if type(a) is int and type(b) is int and a >= 0 and b > 0:
+                        stack[-1] = a % b
+                    else:
+                        stack[-1] = reminder(a, b)
+                    pc += 1
+                elif op == DIV:
+                    b = pop()
+                    stack[-1] = divide(stack[-1], b)
+                    pc += 1
+                elif op == LOAD_GLOBAL:
+                    value = glob[c[pc + 1]]
+                    if value is UNDEFINED:
+                        raise RustError("Variable no definida")
+                    push(value)
+                    pc += 2
+                elif op == STORE_GLOBAL:
+                    glob[c[pc + 1]] = pop()
+                    pc += 2
+                elif op == CALL:
+                    n = c[pc + 1]
+                    args = stack[len(stack) - n:]
+                    del stack[len(stack) - n:]
+                    stack[-1] = self.call(stack[-1], args)
+                    pc += 2
+                elif op == RETURN:
+                    return pop()
+                elif op == AND:
+                    b = pop()
+                    stack[-1] = stack[-1] & b
+                    pc += 1
+                elif op == OR:
+                    b = pop()
+                    stack[-1] = stack[-1] | b
+                    pc += 1
+                elif op == XOR:
+                    b = pop()
+                    stack[-1] = stack[-1] ^ b
+                    pc += 1
+                elif op == CAST:
+                    stack[-1] = cast(stack[-1], consts[c[pc + 1]])
+                    pc += 2
+                elif op == LOAD_NAME:
+                    raise RustError("Variable no definida '%s'" % consts[c[pc + 1]])
+                elif op == ERROR:
+                    raise RustError(consts[c[pc + 1]])
+                else:
+                    raise RustError("Código de operación inválido %d" % op)
+        except TypeError:
+            raise RustError("Operación '%s' inválida en '%s'" % (opnames[c[pc]], code.name))
+
+    def call(self, function, args):
+        if not isinstance(function, VMFunction):
+            raise RustError("'%r' no es una función" % (function,))
+        code = function.code
+        if len(args) != code.nparams:
+            raise RustError("La función '%s' recibe %d argumentos (%d dados)" % (code.name, code.nparams, len(args)))
+        return self.execute(code, args)
+
+# Valor de una variable global todavía no definida
+class Undefined:
+    def __repr__(self):
+        return "<no definida>"
+
+UNDEFINED = Undefined()
+
+# Programa compilado: código del nivel superior y casillas globales
+class Program:
+    def __init__(self, code, globals):
+        self.code = code
+        self.globals = globals
+
+def compile(ast):
+    compiler = Compiler(ast)
+    code = compiler.compile()
+    return Program(code, compiler.globals)
+
+# Ejecutar un programa compilado; regresa el valor de main (o None)
+def execute(program, entry='main'):
+    vm = VM(len(program.globals))
+    vm.execute(program.code, [ ])
+    slot = program.globals.get(entry)
+    if slot is None or vm.globals[slot] is UNDEFINED:
+        return None
+    return vm.call(vm.globals[slot], [ ])
+
+# Compilar y ejecutar un AST
+def run(ast, entry='main'):
+    return execute(compile(ast), entry)
@@ -1,8 +1,15 @@
 import sys
 if ".." not in sys.path: sys.path.insert(0,"..")
 
-import ply.yacc as yacc
+import copy
+from array import array
+from itertools import repeat
+
+import rust_ast
 import rust_lex
+import rust_scanner
+import rust_tables
+from rust_ast import Node
 
 tokens = rust_lex.tokens
 
@@ -15,54 +22,71 @@ precedence = (
     ('left', 'AND'),
     ('left', 'PLUS', 'MINUS'),
     ('left', 'MULT', 'DIVIDE', 'REMINDER'),
-    ('left', 'DOT'),
+    ('left', 'DOT', 'LPAREN'),
 )
 
-# Clase genérica para un nodo del AST
-class Node:
-    def __init__(self, type, children=None, leaf=None):
-        self.type = type
-        if children:
-            self.children = children
-        else:
-            self.children = [ ]
-        self.leaf = leaf
-
-    def __str__(self, level=0):
-        ret = "\t" * level + repr(self.type)
-        if self.leaf:
-            ret += " => " + self.leaf + "\n"
-        else:
-            ret += "\n"
-        
-        for child in self.children:
-            ret += child.__str__(level+1)
-        return ret
-
-# Clase para agregar nuevos alcances e IDs dentro de estos
-class Table(dict):
-    def __init__(self):
-        self = dict()
-    
+# Tabla de símbolos como cadena de alcances
+# - names: nombre -> pila de valores (el último es el visible, los demás quedan ocultos)
+# - frames: alcances abiertos, cada uno es un diccionario {nombre: valor}
+# Buscar y agregar cuestan O(1) sin importar cuántos bloques se hayan analizado;
+# al cerrar un bloque sólo se recorren los nombres declarados en él.
+class SymbolTable:
+    def __init__(self, keep=False):
+        self.names = { }
+        self.frames = [ ]
+        self.keep = keep    # conservar los alcances cerrados (para imprimirlos)
+        self.closed = { }
+        self.count = 0
+        self.push() # primer alcance (global)
+
+    # Abrir un nuevo alcance
+    def push(self):
+        self.frames.append((self.count, { }))
+        self.count += 1
+
+    # Cerrar el alcance actual y descubrir los nombres que ocultaba
+    def pop(self):
+        number, frame = self.frames.pop()
+        names = self.names
+        for key in frame:
+            stack = names[key]
+            stack.pop()
+            if not stack:
+                del names[key]
+        if self.keep:
+            self.closed[number] = frame
+
+    # Declarar un nombre en el alcance actual (puede ocultar uno de alcances externos)
     def add(self, key, value):
-        self[key] = value
+        frame = self.frames[-1][1]
+        stack = self.names.get(key)
+        if stack is None:
+            self.names[key] = [ value ]
+        elif key in frame:
+            stack[-1] = value # redeclaración en el mismo alcance
+        else:
+            stack.append(value)
+        frame[key] = value
+
+    # Valor visible de un nombre (None si no está declarado)
+    def lookup(self, key):
+        stack = self.names.get(key)
+        if stack:
+            return stack[-1]
+        return None
 
-# Bloques de alcances (diccionarios)
-scopes = Table()
-scope_number = 0
+    def __contains__(self, key):
+        return key in self.names
 
-# Primer alcance
-s = Table()
-scopes.add(scope_number, s)
+    # Alcances numerados por orden de apertura: {número: {nombre: valor}}
+    def scopes(self):
+        result = dict(self.closed)
+        for number, frame in self.frames:
+            result[number] = frame
+        return dict(sorted(result.items()))
 
-# Checar si la llave ya se encuentra en alguna de las tablas de símbolos
-def scope_check(key):
-    for scope in range(0, scope_number + 1):
-        #print('Comprobando ' + str(key) + ' en alcance ' + str(scope))
-        if key in scopes[scope]:
-            return True # ya está registrada en una tabla de símbolos
-    
-    return False # no se encuentra en ninguna tabla de símbolos
+    def __str__(self):
+        return str(self.scopes())
 
 # -- Sintaxis en BNF -- #
 
@@ -70,13 +94,25 @@ def p_program(p):
     '''program : list_stmt '''
     p[0] = Node('program', [ p[1] ], None)
 
+# Lista plana de sentencias (recursión por la izquierda: la pila del analizador
+# no crece con el número de sentencias y cada una se agrega al mismo nodo).
+# Con un 'emit' en el analizador (RustParser.parse(..., emit=f)) cada sentencia de
+# nivel superior se entrega a f al reducirse y no se agrega a la lista.
 def p_list_stmt(p):
-    '''list_stmt : stmt list_stmt
+    '''list_stmt : list_stmt stmt
                  | stmt '''
+    emit = p.parser.emit
     if len(p) == 3:
-        p[0] = Node('list_stmt', [ p[1], p[2] ], None)
-    else:
+        if emit is None:
+            p[1].append(p[2])
+        else:
+            emit(p[2])
+        p[0] = p[1]
+    elif emit is None:
         p[0] = Node('list_stmt', [ p[1] ], None)
+    else:
+        emit(p[1])
+        p[0] = Node('list_stmt', None, None, p.parser.arena)
 
 # Statements
 def p_statement(p):
@@ -84,7 +120,7 @@ def p_statement(p):
             | expr_stmt
             | SEMICOLON '''
     if p[1] == ';':
-        p[0] = Node('stmt', None, ';')
+        p[0] = Node('stmt', None, ';', p.parser.arena)
     else:
         p[0] = Node('stmt', [ p[1] ], None)
 
@@ -114,25 +150,19 @@ def p_fn_item(p):
 # Acción para agregar función dentro de la tabla de símbolos
 def p_add_to_scope(p):
     'add_to_scope :'
-    if not scope_check(p[-1]):
-        current_scope = scopes.get(scope_number)
-        current_scope.add(p[-1], 'fn')
+    p.parser.symbols.add(p[-1], 'fn')
 
 # Constantes
 def p_const_item(p):
     '''const_item : CONST ID COLON type ASSIGN expr SEMICOLON '''
     p[0] = Node('const_item', [ p[4], p[6] ], p[2])
-    if not scope_check(p[2]):
-        current_scope = scopes.get(scope_number)
-        current_scope.add(p[2], p[4].leaf)
+    p.parser.symbols.add(p[2], p[4].leaf)
 
 # Estáticos
 def p_static_item(p):
     '''static_item : STATIC ID COLON type ASSIGN expr SEMICOLON '''
     p[0] = Node('static_item', [ p[4], p[6] ], p[2])
-    if not scope_check(p[2]):
-        current_scope = scopes.get(scope_number)
-        current_scope.add(p[2], p[4].leaf)
+    p.parser.symbols.add(p[2], p[4].leaf)
 
 # Variables
 def p_let_decl(p):
@@ -147,45 +177,29 @@ def p_let_decl(p):
     if p[2] == 'mut':
         if len(p) == 8:
             p[0] = Node('let_decl', [ p[5], p[6] ], p[3])
-            if not scope_check(p[3]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[3], p[5].leaf)
+            p.parser.symbols.add(p[3], p[5].leaf)
         elif len(p) == 7:
             p[0] = Node('let_decl', [ p[5] ], p[3])
-            if not scope_check(p[3]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[3], p[5].leaf)
+            p.parser.symbols.add(p[3], p[5].leaf)
         elif len(p) == 6:
             p[0] = Node('let_decl', [ p[4] ], p[3])
-            if not scope_check(p[3]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[3], 'var')
+            p.parser.symbols.add(p[3], 'var')
         else:
-            p[0] = Node('let_decl', None, p[3])
-            if not scope_check(p[3]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[3], 'var')
+            p[0] = Node('let_decl', None, p[3], p.parser.arena)
+            p.parser.symbols.add(p[3], 'var')
     else:
         if len(p) == 7:
             p[0] = Node('let_decl', [ p[4], p[5] ], p[2])
-            if not scope_check(p[2]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[2], p[4].leaf)
+            p.parser.symbols.add(p[2], p[4].leaf)
         elif len(p) == 6:
             p[0] = Node('let_decl', [ p[4] ], p[2])
-            if not scope_check(p[2]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[2], p[4].leaf)
+            p.parser.symbols.add(p[2], p[4].leaf)
         elif len(p) == 5:
             p[0] = Node('let_decl', [ p[3] ], p[2])
-            if not scope_check(p[2]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[2], 'var')
+            p.parser.symbols.add(p[2], 'var')
         else:
-            p[0] = Node('let_decl', None, p[2])
-            if not scope_check(p[2]):
-                current_scope = scopes.get(scope_number)
-                current_scope.add(p[2], 'var')
+            p[0] = Node('let_decl', None, p[2], p.parser.arena)
+            p.parser.symbols.add(p[2], 'var')
 
 # Inicializar variable
 def p_init(p):
@@ -216,41 +230,41 @@ def p_expr(p):
 def p_block_expr(p):
     '''block_expr : LBRACKET new_scope block_expr_a RBRACKET
                   | LBRACKET new_scope block_expr_b RBRACKET
-                  | LBRACKET new_scope block_expr_c RBRACKET
-                  | LBRACKET new_scope block_expr_d RBRACKET
                   | LBRACKET new_scope block_expr_e RBRACKET '''
     p[0] = Node('block', [ p[3] ], None)
+    p.parser.symbols.pop() # cerrar el alcance del bloque
 
 # Acción para generar un nuevo bloque de alcance
 def p_new_scope(p):
     'new_scope :'
     # Create a new scope for local variables
-    s = Table()
-    global scope_number
-    scope_number += 1
-    scopes.add(scope_number, s)
+    p.parser.symbols.push()
 
 # Expresiones de apoyo para block_expr
+# block_a: sólo sentencias; block_b: sentencias y una expresión final
 def p_block_expr_a(p):
-    '''block_expr_a : stmt block_expr_a
+    '''block_expr_a : stmt_seq
                     | empty '''
-    if len(p) == 3:
-        p[0] = Node('block_a', [ p[1], p[2] ], None)
-    else:
+    if p[1].type == 'empty':
         p[0] = Node('block_a', [ p[1] ], None)
+    else:
+        p[0] = p[1]
 
 def p_block_expr_b(p):
-    '''block_expr_b : stmt block_expr_e
-                    | item block_expr_e '''
-    p[0] = Node('block_b', [ p[1], p[2] ], None)
-
-def p_block_expr_c(p):
-    '''block_expr_c : stmt block_expr_b '''
-    p[0] = Node('block_c', [ p[1], p[2] ], None)
-
-def p_block_expr_d(p):
-    '''block_expr_d : item block_expr_b '''
-    p[0] = Node('block_d', [ p[1], p[2] ], None)
+    '''block_expr_b : stmt_seq block_expr_e '''
+    p[1].type = 'block_b'
+    p[1].append(p[2])
+    p[0] = p[1]
+
+# Sentencias de un bloque como lista plana (recursión por la izquierda)
+def p_stmt_seq(p):
+    '''stmt_seq : stmt_seq stmt
+                | stmt '''
+    if len(p) == 3:
+        p[1].append(p[2])
+        p[0] = p[1]
+    else:
+        p[0] = Node('block_a', [ p[1] ], None)
 
 def p_block_expr_e(p):
     '''block_expr_e : expr '''
@@ -271,20 +285,25 @@ def p_paren_expr_list(p):
     '''paren_expr_list : LPAREN expr_list RPAREN '''
     p[0] = Node('paren_expr_list', [ p[2] ], None)
 
-# Lista de parámetros en una función
+# Lista de parámetros en una función (se permite una coma final)
 def p_expr_list(p):
-    '''expr_list : expr
-                 | expr e_list
+    '''expr_list : expr_seq
+                 | expr_seq COMA
                  | empty '''
-    if len(p) == 3:
-        p[0] = Node('expr_list', [ p[1], p[2] ], None)
-    else:
+    if p[1].type == 'empty':
         p[0] = Node('expr_list', [ p[1] ], None)
+    else:
+        p[0] = p[1]
 
-# Expresión de apoyo para lista de parámetros
-def p_e_list(p):
-    '''e_list : COMA expr_list '''
-    p[0] = Node('e_list', [ p[2] ], p[1])
+# Expresiones separadas por comas como lista plana (recursión por la izquierda)
+def p_expr_seq(p):
+    '''expr_seq : expr_seq COMA expr
+                | expr '''
+    if len(p) == 4:
+        p[1].append(p[3])
+        p[0] = p[1]
+    else:
+        p[0] = Node('expr_list', [ p[1] ], None)
 
 # Operadores binarios
 def p_binop_expr(p):
@@ -315,12 +334,12 @@ def p_loop_expr(p):
 # Break
 def p_break_expr(p):
     'break_expr : BREAK'
-    p[0] = Node('break', None, 'break')
+    p[0] = Node('break', None, 'break', p.parser.arena)
 
 # Continue
 def p_continue_expr(p):
     'continue_expr : CONTINUE'
-    p[0] = Node('continue', None, 'continue')
+    p[0] = Node('continue', None, 'continue', p.parser.arena)
 
 # If
 def p_if_expr(p):
@@ -344,7 +363,7 @@ def p_return_expr(p):
     if len(p) == 3:
         p[0] = Node('return', [ p[2] ], None)
     else:
-        p[0] = Node('return', None, 'return')
+        p[0] = Node('return', None, 'return', p.parser.arena)
 
 # Expresiones para Condicionales y Ciclos
 def p_cond_expr(p):
@@ -372,29 +391,29 @@ def p_literal(p):
 # String
 def p_string_lit(p):
     'string_lit : STRING'
-    p[0] = Node('string_lit', None, p[1])
+    p[0] = Node('string_lit', None, p[1], p.parser.arena)
 
 # Caracteres (char)
 def p_char_lit(p):
     'char_lit : CHAR'
-    p[0] = Node('char_lit', None, p[1])
+    p[0] = Node('char_lit', None, p[1], p.parser.arena)
 
 # Números
 def p_num_lit(p):
     '''num_lit : INTEGER
                | FLOAT '''
-    p[0] = Node('num_lit', None, p[1])
+    p[0] = Node('num_lit', None, p[1], p.parser.arena)
 
 # Booleanos
 def p_bool_lit(p):
     '''bool_lit : TRUE
                 | FALSE '''
-    p[0] = Node('bool_lit', None, p[1])
+    p[0] = Node('bool_lit', None, p[1], p.parser.arena)
 
 # IDs
 def p_id_lit(p):
     'id_lit : ID'
-    p[0] = Node('id_lit', None, p[1])
+    p[0] = Node('id_lit', None, p[1], p.parser.arena)
 
 # Operadores
 def p_binop(p):
@@ -410,14 +429,14 @@ def p_arith_op(p):
                 | MULT
                 | DIVIDE
                 | REMINDER '''
-    p[0] = Node('arith_op', None, p[1])
+    p[0] = Node('arith_op', None, p[1], p.parser.arena)
 
 # Bits
 def p_bitwise_op(p):
     '''bitwise_op : AND
                   | OR
                   | XOR '''
-    p[0] = Node('bitwise_op', None, p[1])
+    p[0] = Node('bitwise_op', None, p[1], p.parser.arena)
 
 # Comparación
 def p_comp_op(p):
@@ -427,7 +446,7 @@ def p_comp_op(p):
                | GT
                | LE
                | GE '''
-    p[0] = Node('comp_op', None, p[1])
+    p[0] = Node('comp_op', None, p[1], p.parser.arena)
 
 # Casting
 def p_type_cast_expr(p):
@@ -452,38 +471,160 @@ def p_type(p):
             | FLOATTYPE
             | BOOLTYPE
             | CHARTYPE '''
-    p[0] = Node('type', None, p[1])
+    p[0] = Node('type', None, p[1], p.parser.arena)
 
 # Expresión vacía
 def p_empty(p):
     'empty :'
-    p[0] = Node('empty', None, None)
+    p[0] = Node('empty', None, None, p.parser.arena)
 
 # -- Termina Sintaxis en BNF -- #
 
-# Manejar errores (modo pánico)
+# Manejar errores
+# Cada RustParser instala su propio manejador (RustParser.error) en su copia del analizador
 def p_error(p):
-    print("Error de sintaxis en '%s' (línea %s)" % (p.value, p.lexer.lineno))
-    if not p:
-        print("EOF")
-        return
-    
-    while True:
-        tok = parser.token() # siguiente token
-        if not tok or tok.type == 'SEMICOLON':
-            break
-    parser.restart()
-
-# Construir analizador
-parser = yacc.yacc()
+    pass
+
+# Construir analizador (tablas LALR compartidas, de sólo lectura, en la caché de rust_tables)
+parser = rust_tables.build_parser(sys.modules[__name__])
+parser.emit = None
+
+# Acción de una regla que además registra dónde empieza cada nodo creado en ella: la
+# posición y la línea del primer símbolo de la regla (ply las propaga con tracking)
+def tracked(func):
+    def reduce(p):
+        func(p)
+        a = p.parser.arena
+        if a.pos is None:
+            a.pos = array('i')
+            a.line = array('i')
+        count = len(a.leaves) - len(a.pos)
+        if count:
+            sym = p.slice[0]
+            a.pos.extend(repeat(sym.lexpos, count))
+            a.line.extend(repeat(sym.lineno, count))
+    return reduce
+
+# Copia de las reglas del analizador con acciones que registran posiciones
+def tracked_productions(productions):
+    result = [ ]
+    for prod in productions:
+        prod = copy.copy(prod)
+        if prod.callable is not None:
+            prod.callable = tracked(prod.callable)
+        result.append(prod)
+    return result
+
+# Tablas de enteros de rust_dense (se crean la primera vez que se piden)
+dense_tables = None
+
+def get_dense_tables():
+    global dense_tables
+    if dense_tables is None:
+        import rust_dense
+        dense_tables = rust_dense.DenseTables(parser, tokens)
+    return dense_tables
+
+# Sesión de análisis: lexer, pilas del analizador y tabla de símbolos propios.
+# Las tablas LALR se comparten entre sesiones; el estado se reinicia en cada parse(),
+# así que una misma sesión puede analizar muchos archivos sin acumular memoria.
+class RustParser:
+    # Con 'dense' se usa el analizador de rust_dense (tablas de enteros, tokens con
+    # el id de su tipo) y con 'generated' el generado por rust_codegen; ninguno de los
+    # dos admite 'positions' ni 'debug'.
+    def __init__(self, verbose=True, lexer=None, dense=False, generated=False):
+        self.verbose = verbose # imprimir errores de sintaxis
+        # lexer compilado de rust_scanner (o el lexer de ply dado, p. ej. rust_lex.lexer)
+        if dense or generated:
+            self.lexer = lexer.clone() if lexer else rust_scanner.Scanner(rust_scanner.get_tables(numbered=True))
+            if generated:
+                import rust_codegen
+                self.parser = rust_codegen.load(sys.modules[__name__]).Parser(sys.modules[__name__])
+            else:
+                import rust_dense
+                self.parser = rust_dense.DenseParser(get_dense_tables())
+        else:
+            self.lexer = (lexer or rust_scanner.lexer).clone()
+            self.parser = copy.copy(parser)
+        self.parser.errorfunc = self.error
+        self.parser.symbols = SymbolTable()
+        self.parser.arena = None    # arena de los nodos del análisis en curso
+        self.keep_scopes = False # conservar todos los alcances aunque no se impriman
+        self.errors = [ ]
+        self.productions = getattr(self.parser, 'productions', None)
+        self.tracked = None     # reglas que registran posiciones (se crean al pedirlas)
+
+    # Manejar errores (modo pánico)
+    def error(self, p):
+        if not p:
+            self.report("Error de sintaxis: fin de archivo inesperado (EOF)")
+            return
+
+        self.report("Error de sintaxis en '%s' (línea %s)" % (p.value, p.lexer.lineno))
+        parser = self.parser
+        while True:
+            tok = parser.token() # siguiente token
+            if not tok or tok.type == 'SEMICOLON':
+                break
+        parser.restart()
+
+    def report(self, msg):
+        self.errors.append(msg)
+        if self.verbose:
+            print(msg)
+
+    # Reiniciar el estado entre análisis
+    def reset(self, scope=False):
+        self.lexer.lineno = 1
+        self.parser.symbols = SymbolTable(scope or self.keep_scopes)
+        self.errors = [ ]
+
+    # Realizar análisis; regresa el AST o None si hubo errores de sintaxis.
+    # 'data' es el texto (str, bytes o mmap) o sus tokens ya calculados (rust_scanner.Tokens).
+    # Con 'lexer' (p. ej. un rust_stream.StreamScanner) los tokens salen de ese lexer.
+    # Los nodos se crean en un arena nuevo, o en 'arena' si se da (rust_incremental).
+    # Con 'positions' los nodos guardan dónde empiezan (Arena.pos y Arena.line); con
+    # 'emit' cada sentencia de nivel superior se entrega a emit(nodo) al reducirse
+    # (rust_json), en lugar de agregarse a la lista del programa.
+    def parse(self, data, debug=0, scope=False, lexer=None, arena=None, positions=False, emit=None):
+        self.reset(scope)
+        # los nodos de este análisis
+        self.parser.arena = rust_ast.Arena() if arena is None else arena
+        if isinstance(data, rust_scanner.Tokens):
+            lexer = data.lexer()
+        parser = self.parser
+        if positions:
+            if self.productions is None:
+                raise ValueError("este analizador no registra posiciones")
+            if self.tracked is None:
+                self.tracked = tracked_productions(self.productions)
+            parser.productions = self.tracked
+        parser.emit = emit
+        try:
+            if lexer is not None:
+                p = parser.parse(None, lexer=lexer, debug=debug, tracking=positions)
+            else:
+                p = parser.parse(data, lexer=self.lexer, debug=debug, tracking=positions)
+        finally:
+            if self.productions is not None:
+                parser.productions = self.productions
+            parser.emit = None
+            # soltar referencias a las pilas y al arena del último análisis
+            parser.statestack = parser.symstack = parser.arena = None
+        if self.errors:
+            return None
+
+        if scope:
+            print(self.parser.symbols)
+        return p
+
+    @property
+    def symbols(self):
+        return self.parser.symbols
+
+# Sesión usada por parse()
+default_parser = RustParser()
 
 # Función para realizar análisis
 def parse(data, debug=0, scope=False):
-    parser.error = 0
-    p = parser.parse(data, debug=debug)
-    if parser.error:
-        return None
-    
-    if scope:
-        print(scopes)
-    return p
+    return default_parser.parse(data, debug, scope)